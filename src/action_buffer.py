@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按键精灵 - 操作缓冲区
+以列式数组紧凑地存储操作序列，供记录器、脚本管理器、播放器和界面共享
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+
+# 操作码
+OP_KEY_PRESS = 0
+OP_KEY_RELEASE = 1
+OP_MOUSE_MOVE = 2
+OP_MOUSE_DOWN = 3
+OP_MOUSE_UP = 4
+OP_MOUSE_SCROLL = 5
+
+# 操作码对应的操作类型名称
+OP_TYPES = ("key_press", "key_release", "mouse_move", "mouse_click", "mouse_click", "mouse_scroll")
+
+# 每种操作码在字典视图中包含的字段
+OP_FIELDS = (
+    ("type", "key", "time"),
+    ("type", "key", "time"),
+    ("type", "x", "y", "time"),
+    ("type", "button", "pressed", "x", "y", "time"),
+    ("type", "button", "pressed", "x", "y", "time"),
+    ("type", "x", "y", "dx", "dy", "time"),
+)
+
+NO_KEY = -1  # 没有按键/按钮名称时的键表索引
+
+MAX_EDIT_LOG = 4096  # 编辑记录的最大条数，超出后视为整体修改
+
+US_PER_SECOND = 1000000  # 缓冲区和二进制脚本中的时间以整数微秒保存
+
+
+def to_us(seconds):
+    """把秒转换为整数微秒（四舍五入）"""
+    return round(seconds * US_PER_SECOND)
+
+
+def to_seconds(us):
+    """把整数微秒转换为秒"""
+    return us / US_PER_SECOND
+
+
+# 操作类型名称到操作码的映射（鼠标点击需再根据pressed区分按下/释放）
+_TYPE_OPS = {
+    "key_press": OP_KEY_PRESS,
+    "key_release": OP_KEY_RELEASE,
+    "mouse_move": OP_MOUSE_MOVE,
+    "mouse_click": OP_MOUSE_DOWN,
+    "mouse_scroll": OP_MOUSE_SCROLL,
+}
+
+
+def action_opcode(action):
+    """获取字典形式操作对应的操作码
+
+    Args:
+        action: 操作字典
+
+    Returns:
+        int: 操作码，未知类型返回None
+    """
+    op = _TYPE_OPS.get(action.get("type", ""))
+    if op == OP_MOUSE_DOWN and not action.get("pressed", False):
+        return OP_MOUSE_UP
+    return op
+
+
+class ActionView(Mapping):
+    """缓冲区中单个操作的只读字典视图，兼容原有的字典式访问"""
+
+    __slots__ = ("_buffer", "_index")
+
+    def __init__(self, buffer, index):
+        self._buffer = buffer
+        self._index = index
+
+    def __getitem__(self, name):
+        buffer = self._buffer
+        i = self._index
+        op = buffer.ops[i]
+        if name not in OP_FIELDS[op]:
+            raise KeyError(name)
+        if name == "type":
+            return OP_TYPES[op]
+        if name == "time":
+            return buffer.times[i] / US_PER_SECOND
+        if name == "key" or name == "button":
+            return buffer.key_name(buffer.key_ids[i])
+        if name == "pressed":
+            return op == OP_MOUSE_DOWN
+        return getattr(buffer, name + "s")[i]
+
+    def __iter__(self):
+        return iter(OP_FIELDS[self._buffer.ops[self._index]])
+
+    def __len__(self):
+        return len(OP_FIELDS[self._buffer.ops[self._index]])
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class ActionBuffer:
+    """列式操作缓冲区
+
+    每个字段保存在一个独立的array中（时间为int64微秒，坐标和滚动量为int），
+    操作类型保存为小整数操作码，按键和按钮名称保存在去重的键表中。
+    字典视图中的time仍然是秒（浮点数），与微秒之间的转换没有误差。
+
+    delete、replace和insert_sorted会记录在edits中（位置、删除行数、插入行数），
+    依赖行号的派生数据（如播放器的已编译步骤）据此只更新被编辑的行；
+    清空、重新排序等整体修改会增加generation并清空编辑记录。
+    """
+
+    def __init__(self, actions=None):
+        """初始化缓冲区
+
+        Args:
+            actions: 可选的初始操作序列（字典或视图）
+        """
+        self.generation = 0
+        self.clear()
+        if actions:
+            self.extend(actions)
+
+    def clear(self):
+        """清空缓冲区"""
+        self.ops = array("b")
+        self.times = array("q")
+        self.xs = array("i")
+        self.ys = array("i")
+        self.dxs = array("i")
+        self.dys = array("i")
+        self.key_ids = array("i")
+        self.keys = []
+        self._key_index = {}
+        self._reset_edits()
+
+    def _reset_edits(self):
+        """整体修改：派生数据需要全部重建"""
+        self.generation += 1
+        self.edits = []
+
+    def _log_edit(self, index, removed, inserted):
+        """记录一次按行的修改（追加到末尾的行不记录，由长度变化体现）"""
+        if len(self.edits) >= MAX_EDIT_LOG:
+            self._reset_edits()
+        else:
+            self.edits.append((index, removed, inserted))
+
+    def intern_key(self, name):
+        """获取按键/按钮名称在键表中的索引，不存在时加入键表
+
+        Args:
+            name: 按键或按钮名称
+
+        Returns:
+            int: 键表索引
+        """
+        index = self._key_index.get(name)
+        if index is None:
+            index = len(self.keys)
+            self.keys.append(name)
+            self._key_index[name] = index
+        return index
+
+    def key_name(self, key_id):
+        """根据键表索引获取名称"""
+        return self.keys[key_id] if key_id != NO_KEY else ""
+
+    def append_row(self, op, time_us, key_id=NO_KEY, x=0, y=0, dx=0, dy=0):
+        """直接追加一行列数据
+
+        Args:
+            op: 操作码
+            time_us: 操作时间（整数微秒）
+            key_id: 键表索引
+            x, y: 鼠标坐标
+            dx, dy: 滚动量
+        """
+        self.ops.append(op)
+        self.times.append(time_us)
+        self.key_ids.append(key_id)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.dxs.append(dx)
+        self.dys.append(dy)
+
+    def append(self, action):
+        """追加一个字典形式的操作，未知类型的操作将被忽略
+
+        Args:
+            action: 操作字典或视图
+        """
+        op = action_opcode(action)
+        if op is None:
+            return
+
+        time_us = round(action.get("time", 0) * US_PER_SECOND)
+        if op == OP_MOUSE_MOVE:
+            # 鼠标移动占绝大多数，单独处理以减少字段查找
+            self.append_row(op, time_us, NO_KEY,
+                            int(action.get("x", 0)), int(action.get("y", 0)))
+        elif op == OP_KEY_PRESS or op == OP_KEY_RELEASE:
+            self.append_row(op, time_us, self.intern_key(action.get("key", "")))
+        elif op == OP_MOUSE_DOWN or op == OP_MOUSE_UP:
+            self.append_row(op, time_us, self.intern_key(action.get("button", "left")),
+                            int(action.get("x", 0)), int(action.get("y", 0)))
+        else:
+            self.append_row(op, time_us, NO_KEY,
+                            int(action.get("x", 0)), int(action.get("y", 0)),
+                            int(action.get("dx", 0)), int(action.get("dy", 0)))
+
+    def delete(self, index):
+        """删除指定位置的操作"""
+        if index < 0:
+            index += len(self)
+        for column in self._columns():
+            column.pop(index)
+        self._log_edit(index, 1, 0)
+
+    def replace(self, index, action):
+        """替换指定位置的操作，新的时间越过相邻的操作时按时间移动到新位置
+
+        Args:
+            index: 要替换的位置
+            action: 新的操作字典或视图
+
+        Returns:
+            int: 替换后的位置，未知类型的操作返回None（原操作保持不变）
+        """
+        if action_opcode(action) is None:
+            return None
+        if index < 0:
+            index += len(self)
+        times = self.times
+        time_us = to_us(action.get("time", 0))
+        if ((index == 0 or times[index - 1] <= time_us)
+                and (index == len(self) - 1 or time_us <= times[index + 1])):
+            # 仍在原位置：原地替换，记录为一次替换而不是删除加插入
+            self.append(action)
+            for column in self._columns():
+                column[index] = column.pop()
+            self._log_edit(index, 1, 1)
+            return index
+        self.delete(index)
+        return self.insert_sorted(action, index)
+
+    def insert_sorted(self, action, hint=None):
+        """按时间插入一个操作
+
+        Args:
+            action: 操作字典或视图
+            hint: 希望插入的位置。时间仍不早于前一个、不晚于后一个操作时插入到该位置
+                （编辑一行后放回原处，不改变同一时间的操作的先后顺序），否则插入到同一时间的操作之前；
+                None表示插入到同一时间的操作之后
+
+        Returns:
+            int: 插入的位置，未知类型的操作返回None
+        """
+        times = self.times
+        time_us = to_us(action.get("time", 0))
+        count = len(self)
+        if hint is None:
+            index = bisect_right(times, time_us)
+        elif (0 <= hint <= count and (hint == 0 or times[hint - 1] <= time_us)
+              and (hint == count or time_us <= times[hint])):
+            index = hint
+        else:
+            index = bisect_left(times, time_us)
+        self.append(action)
+        if len(self) == count:
+            return None
+        if index < count:
+            # 追加到末尾后移动到目标位置
+            for column in self._columns():
+                column.insert(index, column.pop())
+        self._log_edit(index, 0, 1)
+        return index
+
+    def index_at_time(self, time):
+        """查找第一个时间不早于time（秒）的操作位置（按时间排序时有效）"""
+        return bisect_left(self.times, to_us(time))
+
+    def time_at(self, index):
+        """获取指定操作的时间（秒）"""
+        return self.times[index] / US_PER_SECOND
+
+    def duration(self):
+        """第一个到最后一个操作的时长（秒）"""
+        return (self.times[-1] - self.times[0]) / US_PER_SECOND if self.times else 0.0
+
+    def _columns(self):
+        """所有列数组"""
+        return (self.ops, self.times, self.xs, self.ys, self.dxs, self.dys, self.key_ids)
+
+    def extend(self, actions):
+        """追加多个操作"""
+        for action in actions:
+            self.append(action)
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ActionBuffer(ActionView(self, i) for i in range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ActionBuffer index out of range")
+        return ActionView(self, index)
+
+    def __iter__(self):
+        for i in range(len(self.ops)):
+            yield ActionView(self, i)
+
+    def copy(self):
+        """复制缓冲区（直接复制列数组，不逐个创建操作）"""
+        buffer = ActionBuffer()
+        for name in ("ops", "times", "xs", "ys", "dxs", "dys", "key_ids"):
+            setattr(buffer, name, array(getattr(self, name).typecode, getattr(self, name)))
+        buffer.keys = list(self.keys)
+        buffer._key_index = dict(self._key_index)
+        return buffer
+
+    def get_action(self, index):
+        """获取指定操作的独立字典副本"""
+        return dict(self[index])
+
+    def to_dicts(self):
+        """转换为字典列表"""
+        return [dict(view) for view in self]
+
+    def is_sorted(self):
+        """检查操作是否已按时间排序"""
+        times = self.times
+        return all(times[i] <= times[i + 1] for i in range(len(times) - 1))
+
+    def sort_by_time(self):
+        """按时间稳定排序，已有序时不做任何操作"""
+        if self.is_sorted():
+            return
+        order = sorted(range(len(self.times)), key=self.times.__getitem__)
+        for name in ("ops", "times", "xs", "ys", "dxs", "dys", "key_ids"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, [column[i] for i in order]))
+        self._reset_edits()
+
+    def nbytes(self):
+        """估算各列数组占用的字节数（不含键表）"""
+        return sum(column.itemsize * len(column) for column in self._columns())
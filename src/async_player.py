@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按键精灵 - asyncio播放器
+在事件循环中播放脚本：等待截止时间时让出事件循环，停止时唤醒正在等待的定时器，
+一个事件循环可以同时运行许多条时间线
+"""
+
+import time
+import heapq
+import asyncio
+import itertools
+import weakref
+from player import Player
+from scheduler import Scheduler
+from action_buffer import OP_MOUSE_MOVE
+
+
+class LoopTimer:
+    """一个事件循环中所有时间线共享的精确定时器
+
+    截止时间放在一个堆中，只有一个驱动协程负责等待：距最早的截止时间较远时用call_later睡眠，
+    最后一小段用asyncio.sleep(0)轮询（期间事件循环仍可以运行其他任务）。
+    时间线再多也只有一个协程在轮询，开销不随时间线数量增长。
+    """
+
+    def __init__(self, spin_threshold=0.002):
+        """初始化定时器
+
+        Args:
+            spin_threshold: 截止时间前改为轮询的时间（秒）
+        """
+        self.spin_threshold = spin_threshold
+        self._heap = []  # (截止时间, 序号, future)
+        self._counter = itertools.count()
+        self._driver = None
+        self._wake = None  # 驱动协程睡眠时等待的future，有更早的截止时间时提前唤醒
+
+    async def sleep_until(self, deadline):
+        """等待到perf_counter时间轴上的截止时间（取消任务即可中断等待）
+
+        Args:
+            deadline: 截止时间
+        """
+        future = self.schedule(deadline)
+        if future is not None:
+            await future
+
+    def schedule(self, deadline):
+        """登记一个截止时间
+
+        Args:
+            deadline: perf_counter时间轴上的截止时间
+
+        Returns:
+            asyncio.Future: 到达截止时间时完成的future，已经到达时返回None；
+                提前完成或取消这个future即可结束等待，驱动协程会丢弃它
+        """
+        if deadline <= time.perf_counter():
+            return None
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._heap, (deadline, next(self._counter), future))
+        if self._driver is None:
+            self._driver = loop.create_task(self._run())
+        elif self._heap[0][2] is future and self._wake is not None and not self._wake.done():
+            self._wake.set_result(None)
+        return future
+
+    async def _run(self):
+        """驱动协程：依次完成到期的future，堆为空时退出"""
+        loop = asyncio.get_running_loop()
+        heap = self._heap
+        try:
+            while heap:
+                deadline, _, future = heap[0]
+                if future.done():
+                    # 等待的任务已被取消或已被提前唤醒
+                    heapq.heappop(heap)
+                    continue
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    heapq.heappop(heap)
+                    future.set_result(None)
+                elif remaining > self.spin_threshold:
+                    self._wake = loop.create_future()
+                    handle = loop.call_later(remaining - self.spin_threshold, _resolve, self._wake)
+                    await self._wake
+                    handle.cancel()
+                else:
+                    await asyncio.sleep(0)
+        finally:
+            self._driver = None
+            self._wake = None
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+# 每个事件循环一个共享定时器
+_timers = weakref.WeakKeyDictionary()
+
+
+def loop_timer(spin_threshold=0.002):
+    """获取当前事件循环的共享定时器
+
+    Args:
+        spin_threshold: 第一次创建时使用的轮询时间（秒）
+
+    Returns:
+        LoopTimer: 定时器
+    """
+    loop = asyncio.get_running_loop()
+    timer = _timers.get(loop)
+    if timer is None:
+        timer = _timers[loop] = LoopTimer(spin_threshold)
+    return timer
+
+
+class AsyncScheduler(Scheduler):
+    """协程版调度器
+
+    截止时间的计算和迟到策略与Scheduler相同，等待交给事件循环的共享定时器，
+    等待期间其他时间线可以继续执行。设置停止事件后调用wake即可中断等待，不需要取消任务。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._waiter = None  # 正在等待的future，wake时提前完成
+
+    async def wait(self, action_time, skippable=False):
+        """等待到操作的截止时间
+
+        Args:
+            action_time: 操作在脚本中的时间
+            skippable: 该操作在迟到时是否允许被跳过
+
+        Returns:
+            bool: True表示应执行该操作，False表示应跳过（或已被停止）
+        """
+        deadline = self.deadline(action_time)
+        await self._await(loop_timer(self.spin_threshold).schedule(deadline))
+        if self.stop_event.is_set():
+            return False
+        return self._arrived(deadline, skippable)
+
+    async def sleep(self, seconds):
+        """等待一段时间（开始前的等待、重复之间的间隔），可被wake提前结束
+
+        Args:
+            seconds: 等待时间（秒）
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        handle = loop.call_later(seconds, _resolve, future)
+        try:
+            await self._await(future)
+        finally:
+            handle.cancel()
+
+    async def _await(self, future):
+        """等待future完成，已被停止时不再等待"""
+        if future is None or self.stop_event.is_set():
+            return
+        self._waiter = future
+        try:
+            await future
+        finally:
+            self._waiter = None
+
+    def wake(self):
+        """提前结束正在进行的等待（只能在事件循环线程中调用）"""
+        if self._waiter is not None:
+            _resolve(self._waiter)
+
+
+class AsyncPlayer(Player):
+    """协程版播放器，编译、分派和注入与Player相同
+
+    stop_playing只唤醒本播放器正在等待的定时器，play在当前组执行完后正常返回，
+    调用方的任务不会被取消；也可以直接取消运行play的任务。
+    注入调用本身是同步的，建议使用低延迟模式或不会暂停的后端，避免阻塞事件循环。
+    """
+
+    scheduler_class = AsyncScheduler
+
+    def __init__(self, config_manager=None, backend=None):
+        """初始化播放器
+
+        Args:
+            config_manager: 配置管理器
+            backend: 输入后端，None表示在第一次播放时按配置创建
+        """
+        super().__init__(config_manager, backend)
+        self._loop = None  # 正在播放的事件循环
+
+    async def play(self, script, repeat=1, interval=0.1, start_delay=0.0, start=None, end=None, speed=None):
+        """播放脚本
+
+        Args:
+            script: 要播放的脚本（操作列表、ActionBuffer、CompiledScript，或可重复迭代的脚本源）
+            repeat: 重复次数
+            interval: 每次重复之间的间隔（秒）
+            start_delay: 开始播放前的等待时间（秒）
+            start, end: 只播放该时间范围内的操作，见Player.play
+            speed: 播放倍速，None表示使用配置中的倍速
+        """
+        if not script:
+            return
+
+        if repeat > 1 and iter(script) is script:
+            raise ValueError("单次迭代器无法重复播放，请传入可重复迭代的脚本源")
+
+        if self.backend is None:
+            self.backend = self._create_backend()
+
+        # 先编译并创建调度器，出错时不改变播放状态
+        compiled = self._compile_for_play(script, start, end)
+        scheduler = self._create_scheduler(speed)
+
+        self._loop = asyncio.get_running_loop()
+        self.playing = True
+        self.stop_event.clear()
+        self.failsafe_triggered = False
+        self.scheduler = scheduler
+        self.batch_stats.reset()
+        try:
+            if start_delay > 0:
+                await self.scheduler.sleep(start_delay)
+
+            for i in range(repeat):
+                if self.stop_event.is_set():
+                    break
+                if compiled is not None:
+                    steps = compiled
+                elif start is not None or end is not None:
+                    steps = self._seek_stream(self.iter_steps(script), start, end)
+                else:
+                    steps = self.iter_steps(script)
+                await self._play_once_async(steps)
+
+                if i < repeat - 1 and not self.stop_event.is_set():
+                    await self.scheduler.sleep(interval)
+        finally:
+            self.playing = False
+            self._loop = None
+            self.last_stats = self.scheduler.stats.summary()
+            self.last_rate = self.scheduler.effective_rate()
+            if self.low_latency:
+                self.last_batch_stats = self.batch_stats.summary()
+
+    async def _play_once_async(self, steps):
+        """执行一次脚本，每组步骤之前等待截止时间"""
+        scheduler = self.scheduler
+        for group, group_time in self._groups(steps):
+            skippable = all(step[1] == OP_MOUSE_MOVE for step in group)
+            if await scheduler.wait(group_time, skippable=skippable):
+                if self.tracer is None:
+                    self._dispatch(group)
+                else:
+                    self._traced_dispatch(group)
+            elif self.tracer is not None:
+                self._trace_skip(group)
+
+    def stop_playing(self):
+        """停止播放：唤醒正在等待的定时器，play正常返回，不取消调用方的任务
+
+        可以在任何线程中调用：不在播放所在的事件循环线程中时，通过call_soon_threadsafe唤醒
+        """
+        self.stop_event.set()
+        loop = self._loop
+        scheduler = self.scheduler
+        if loop is None or scheduler is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            scheduler.wake()
+        else:
+            try:
+                loop.call_soon_threadsafe(scheduler.wake)
+            except RuntimeError:
+                # 事件循环已关闭，播放已经结束
+                pass
+
+
+async def play_all(players_and_scripts, **kwargs):
+    """在同一个事件循环中同时播放多条时间线
+
+    Args:
+        players_and_scripts: (AsyncPlayer, 脚本) 的序列
+        **kwargs: 传给每个AsyncPlayer.play的参数
+
+    Returns:
+        list: 每个play的结果或异常
+    """
+    return await asyncio.gather(*(player.play(script, **kwargs) for player, script in players_and_scripts),
+                                return_exceptions=True)
@@ -0,0 +1,1549 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按键精灵 - 性能基准
+不依赖图形界面和真实输入设备的基准测试，用法: python benchmarks.py [名称 ...]
+"""
+
+import os
+import sys
+import gc
+import json
+import math
+import time
+import bisect
+import random
+import asyncio
+import shutil
+import subprocess
+import tempfile
+import threading
+import tracemalloc
+from array import array
+from action_buffer import ActionBuffer, OP_KEY_PRESS, OP_KEY_RELEASE, to_us
+from binary_script import HEADER, RECORD, RECORDS, KEY_COUNT, MAGIC, BinaryScriptReader
+from script_manager import ScriptManager, remap_extra_lines
+from move_filter import MoveFilter, _segment_distance
+from player import Player, HeldState, CompiledScript
+from scheduler import JitterStats
+from input_backend import InputBackend, FakeBackend, create_backend
+from script_cache import ScriptCache
+from multi_player import MultiPlayer
+from async_player import AsyncPlayer, play_all
+from recorder import Recorder, EventRing
+from tracing import Tracer, TRACE_PLAY, TRACE_RECORD
+
+
+def generate_actions(count, seed=0):
+    """生成以鼠标移动为主的合成操作序列
+
+    Args:
+        count: 操作数量
+        seed: 随机种子
+
+    Returns:
+        list: 按时间排序的操作字典列表
+    """
+    rng = random.Random(seed)
+    actions = []
+    t = 0.0
+    x, y = 500, 300
+    keys = "abcdefghijklmnopqrstuvwxyz"
+    while len(actions) < count:
+        t += rng.uniform(0.001, 0.02)
+        roll = rng.random()
+        if roll < 0.85:
+            x += rng.randint(-5, 5)
+            y += rng.randint(-5, 5)
+            actions.append({"type": "mouse_move", "x": x, "y": y, "time": round(t, 3)})
+        elif roll < 0.93:
+            key = rng.choice(keys)
+            actions.append({"type": "key_press", "key": key, "time": round(t, 3)})
+            t += 0.05
+            actions.append({"type": "key_release", "key": key, "time": round(t, 3)})
+        elif roll < 0.98:
+            for pressed in (True, False):
+                actions.append({"type": "mouse_click", "button": "left", "pressed": pressed,
+                                "x": x, "y": y, "time": round(t, 3)})
+                t += 0.08
+        else:
+            dy = rng.choice((1, -1))
+            actions.append({"type": "mouse_scroll", "x": x, "y": y, "dx": 0, "dy": dy,
+                            "time": round(t, 3)})
+    return actions[:count]
+
+
+def _measure_memory(build):
+    """测量构建函数返回的对象所占用的内存
+
+    Returns:
+        tuple: (对象, 占用字节数)
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+
+def bench_memory(count=200000):
+    """比较字典列表与ActionBuffer的内存占用"""
+    count = int(count)
+    source = generate_actions(count)
+    text = [dict(action) for action in source]
+
+    def build_dicts():
+        # 模拟解析脚本时为每个操作创建独立的字典和浮点数对象
+        return [{k: (float(repr(v)) if isinstance(v, float) else v) for k, v in a.items()}
+                for a in text]
+
+    dicts, dict_bytes = _measure_memory(build_dicts)
+    buffer, buffer_bytes = _measure_memory(lambda: ActionBuffer(dicts))
+    del dicts, buffer
+
+    print(f"操作数: {count}")
+    print(f"字典列表:     {dict_bytes / 1024 / 1024:8.2f} MB ({dict_bytes / count:.0f} B/操作)")
+    print(f"ActionBuffer: {buffer_bytes / 1024 / 1024:8.2f} MB ({buffer_bytes / count:.0f} B/操作)")
+    print(f"减少: {(1 - buffer_bytes / dict_bytes) * 100:.1f}%")
+
+
+def legacy_parse_script(script_text):
+    """原有的逐行find/split解析实现，作为解析器基准的对照组
+
+    Args:
+        script_text: 要解析的脚本文本
+
+    Returns:
+        list: 操作序列
+    """
+    if not script_text:
+        return []
+
+    actions = []
+    lines = script_text.strip().split("\n")
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+
+        try:
+            # 解析时间戳
+            time_start = line.find("[") + 1
+            time_end = line.find("]")
+            if time_start <= 0 or time_end <= 0:
+                continue
+
+            time_str = line[time_start:time_end].strip()
+            action_time = float(time_str)
+
+            # 解析操作类型和参数
+            action_part = line[time_end + 1:].strip()
+            if not action_part:
+                continue
+
+            # 分割操作类型和参数
+            parts = action_part.split(":", 1)
+            if len(parts) != 2:
+                continue
+
+            action_type = parts[0].strip()
+            params_str = parts[1].strip()
+
+            # 根据操作类型解析参数
+            if action_type == "KEY_PRESS":
+                key = params_str
+                actions.append({
+                    "type": "key_press",
+                    "key": key,
+                    "time": action_time
+                })
+
+            elif action_type == "KEY_RELEASE":
+                key = params_str
+                actions.append({
+                    "type": "key_release",
+                    "key": key,
+                    "time": action_time
+                })
+
+            elif action_type == "MOUSE_MOVE":
+                coords = params_str.split(",")
+                if len(coords) == 2:
+                    x = int(float(coords[0].strip()))
+                    y = int(float(coords[1].strip()))
+                    actions.append({
+                        "type": "mouse_move",
+                        "x": x,
+                        "y": y,
+                        "time": action_time
+                    })
+
+            elif action_type in ["MOUSE_DOWN", "MOUSE_UP"]:
+                # 格式: MOUSE_DOWN: left at 100, 200
+                parts = params_str.split(" at ")
+                if len(parts) == 2:
+                    button = parts[0].strip()
+                    coords = parts[1].split(",")
+                    if len(coords) == 2:
+                        x = int(float(coords[0].strip()))
+                        y = int(float(coords[1].strip()))
+                        actions.append({
+                            "type": "mouse_click",
+                            "button": button,
+                            "pressed": action_type == "MOUSE_DOWN",
+                            "x": x,
+                            "y": y,
+                            "time": action_time
+                        })
+
+            elif action_type in ["MOUSE_SCROLL_UP", "MOUSE_SCROLL_DOWN"]:
+                # 格式: MOUSE_SCROLL_UP: at 100, 200
+                parts = params_str.split(" at ")
+                if len(parts) == 2:
+                    coords = parts[1].split(",")
+                    if len(coords) == 2:
+                        x = int(float(coords[0].strip()))
+                        y = int(float(coords[1].strip()))
+                        dy = 1 if action_type == "MOUSE_SCROLL_UP" else -1
+                        actions.append({
+                            "type": "mouse_scroll",
+                            "x": x,
+                            "y": y,
+                            "dx": 0,
+                            "dy": dy,
+                            "time": action_time
+                        })
+        except Exception as e:
+            print(f"解析行错误: {line} - {str(e)}")
+
+    # 按时间排序
+    actions.sort(key=lambda x: x.get("time", 0))
+
+    return actions
+
+
+def _best_time(func, repeat):
+    """多次运行取最短耗时（秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_parser(*sizes):
+    """比较单遍正则解析器与原有解析器在合成脚本上的耗时
+
+    分别比较解析为字典列表，以及解析到ActionBuffer（界面和命令行载入脚本的路径）两种用法
+    """
+    manager = ScriptManager()
+    manager.cache = None
+    for size in map(int, sizes or (10000, 100000, 1000000)):
+        text = "\n".join(manager.format_action(a) for a in generate_actions(size)) + "\n"
+        repeat = 5 if size <= 100000 else 2
+
+        def legacy_buffer():
+            buffer = ActionBuffer(legacy_parse_script(text))
+            buffer.sort_by_time()
+
+        legacy_time = _best_time(lambda: legacy_parse_script(text), repeat)
+        new_time = _best_time(lambda: manager.parse_script(text), repeat)
+        legacy_buffer_time = _best_time(legacy_buffer, repeat)
+        buffer_time = _best_time(lambda: manager.parse_to_buffer(text), repeat)
+
+        # 原解析器无法解析滚轮行，只比较两者都能解析的部分
+        actions = manager.parse_script(text)
+        assert [a for a in actions if a["type"] != "mouse_scroll"] == legacy_parse_script(text)
+        # 直接填充各列的结果与逐个追加字典的结果相同
+        buffer = manager.parse_to_buffer(text)
+        assert buffer.to_dicts() == ActionBuffer(actions).to_dicts()
+        print(f"{size:>8} 行: 字典列表 原 {legacy_time:7.3f}s 新 {new_time:7.3f}s ({legacy_time / new_time:4.1f}x)  "
+              f"缓冲区 原 {legacy_buffer_time:7.3f}s 新 {buffer_time:7.3f}s ({legacy_buffer_time / buffer_time:4.1f}x)")
+        del actions, buffer
+
+    # 注释和无法解析的行在保存时原样写回原来的位置
+    text = "# 说明\n[0.500] KEY_PRESS: a\n无法解析的行\n  # 缩进的注释\n[0.700] KEY_RELEASE: a\n# 结尾\n"
+    work_dir = tempfile.mkdtemp(prefix="anjian_parse_")
+    try:
+        path = os.path.join(work_dir, "comments.ajs")
+        manager.save_script(path, text)
+        buffer = manager.load_actions(path)
+        manager.save_actions(path, buffer, extra_lines=manager.last_report.extra_lines)
+        assert manager.load_script(path) == text, "保存后丢失了注释或无法解析的行"
+
+        # 非有限的时间戳报告为无效的时间戳，而不是参数格式错误
+        manager.parse_to_buffer("[inf] KEY_PRESS: a\n[1e999] MOUSE_MOVE: 1, 2\n")
+        assert all(error.message.startswith("无效的时间戳") for error in manager.last_errors), manager.last_errors
+
+        # 编辑后注释随相邻的操作移动：原地修改不影响，删除的行之后的注释移到删除位置
+        text = "[1.000] KEY_PRESS: ctrl_l\n# 复制\n[1.000] KEY_PRESS: c\n[1.100] KEY_RELEASE: c\n# 结尾\n"
+        buffer = manager.parse_to_buffer(text)
+        extra_lines = manager.last_report.extra_lines
+        edit_pos = len(buffer.edits)
+        assert buffer.replace(0, buffer.get_action(0)) == 0, "时间未变的行被移动"
+        buffer.delete(2)
+        buffer.insert_sorted({"type": "key_release", "key": "ctrl_l", "time": 1.2}, len(buffer))
+        manager.save_actions(path, buffer, extra_lines=remap_extra_lines(extra_lines, buffer.edits[edit_pos:]))
+        assert manager.load_script(path) == ("[1.000] KEY_PRESS: ctrl_l\n# 复制\n[1.000] KEY_PRESS: c\n# 结尾\n"
+                                             "[1.200] KEY_RELEASE: ctrl_l\n"), manager.load_script(path)
+
+        # 带小数的坐标、多余的空白、错误行和乱序的行在两种解析路径中结果一致
+        text = ("[0.5] MOUSE_MOVE: 1.5, 2.7\n坏行\n[ 0.3 ]  MOUSE_DOWN : left at 3 , 4 \r\n"
+                "[0.2] MOUSE_SCROLL_DOWN: 3 at 1, 2\n[0.1] KEY_RELEASE:  shift  \n[0.1] MOUSE_UP: right at 1.2, 3\n")
+        actions = manager.parse_script(text)
+        report = manager.last_report
+        buffer = manager.parse_to_buffer(text)
+        assert buffer.to_dicts() == ActionBuffer(actions).to_dicts()
+        assert manager.last_report.errors == report.errors and manager.last_report.extra_lines == report.extra_lines
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def generate_mouse_path(seconds=10, rate=1000, seed=0):
+    """生成高回报率鼠标的原始移动轨迹（曲线、直线和带抖动的停顿）
+
+    Returns:
+        list: (x, y, t)点列表
+    """
+    rng = random.Random(seed)
+    points = []
+    x, y = 800.0, 450.0
+    t = 0.0
+    while t < seconds:
+        kind = rng.random()
+        duration = rng.uniform(0.2, 1.0)
+        steps = int(duration * rate)
+        if kind < 0.4:
+            # 圆弧
+            radius = rng.uniform(50, 300)
+            speed = rng.uniform(1, 6) * rng.choice((1, -1))
+            cx, cy = x - radius, y
+            for i in range(steps):
+                angle = speed * i / rate
+                points.append((int(cx + radius * math.cos(angle)), int(cy + radius * math.sin(angle)), t))
+                t += 1 / rate
+            x, y = points[-1][0], points[-1][1]
+        elif kind < 0.8:
+            # 直线
+            vx, vy = rng.uniform(-800, 800), rng.uniform(-800, 800)
+            for i in range(steps):
+                x += vx / rate
+                y += vy / rate
+                points.append((int(x), int(y), t))
+                t += 1 / rate
+        else:
+            # 停顿：原地轻微抖动
+            for i in range(steps // 10):
+                points.append((int(x) + rng.randint(-1, 1), int(y) + rng.randint(-1, 1), t))
+                t += 10 / rate
+    return points
+
+
+def _path_error(raw, kept):
+    """计算原始轨迹各点到精简轨迹折线的最大距离"""
+    times = [p[2] for p in kept]
+    worst = 0.0
+    for x, y, t in raw:
+        i = bisect.bisect_right(times, t)
+        best = float("inf")
+        for j in range(max(0, i - 2), min(len(kept) - 1, i + 1)):
+            a, b = kept[j], kept[j + 1]
+            best = min(best, _segment_distance(x, y, a[0], a[1], b[0], b[1]))
+        if len(kept) == 1:
+            best = math.hypot(x - kept[0][0], y - kept[0][1])
+        worst = max(worst, best)
+    return worst
+
+
+def bench_move_filter():
+    """鼠标移动过滤器的精简率和回放保真度（位置误差必须在阈值之内）"""
+    raw = generate_mouse_path()
+    move_filter = MoveFilter()
+    kept = []
+    start = time.perf_counter()
+    for x, y, t in raw:
+        kept.extend(move_filter.add(x, y, t))
+    kept.extend(move_filter.flush())
+    elapsed = time.perf_counter() - start
+
+    error = _path_error(raw, kept)
+    bound = move_filter.rdp_epsilon + move_filter.min_distance
+    stats = move_filter.stats
+    print(f"原始事件: {len(raw)}  输出事件: {len(kept)}  精简: {(1 - len(kept) / len(raw)) * 100:.1f}%")
+    print(f"丢弃统计: 距离 {stats['dropped_distance']} / 时间 {stats['dropped_interval']} / "
+          f"RDP {stats['dropped_rdp']} / 停顿合并 {stats['coalesced']}")
+    print(f"最大位置误差: {error:.2f}px（上限 {bound:.2f}px）  每事件耗时 {elapsed / len(raw) * 1e6:.1f}us")
+    assert kept[-1][:2] == raw[-1][:2], "最终光标位置丢失"
+    assert error <= bound, "位置误差超出上限"
+
+
+class TimedPlayer(Player):
+    """记录每个操作执行完成时刻的播放器"""
+
+    def __init__(self, backend):
+        super().__init__(backend=backend)
+        self.done_times = array("d")
+
+    def _dispatch(self, group):
+        super()._dispatch(group)
+        done = time.perf_counter()
+        for _ in group:
+            self.done_times.append(done)
+
+
+def measure_backend(backend, count=5000, spacing=0.0, low_latency=False):
+    """用指定后端播放合成脚本
+
+    Args:
+        backend: 输入后端
+        count: 操作数量
+        spacing: 相邻操作的时间间隔（秒），0表示尽快注入以测量吞吐量
+        low_latency: 是否使用播放器的低延迟模式
+
+    Returns:
+        tuple: (每秒执行的操作数, 完成时刻相对截止时间的误差统计)
+    """
+    actions = generate_actions(count)
+    for i, action in enumerate(actions):
+        action["time"] = i * spacing
+    script = ActionBuffer(actions)
+
+    player = TimedPlayer(backend)
+    player.low_latency = low_latency
+    start = time.perf_counter()
+    player.play(script, start_delay=0)
+    elapsed = time.perf_counter() - start
+
+    scheduler = player.scheduler
+    errors = JitterStats()
+    for i, done in enumerate(player.done_times):
+        errors.add(done - (scheduler.origin + script.time_at(i) - scheduler.base_time))
+    return len(player.done_times) / elapsed, errors.summary()
+
+
+def bench_backends(*names):
+    """各输入后端的注入吞吐量和定时误差
+
+    默认只测试不需要显示器的fake后端；真实后端会实际移动鼠标和按键，
+    需要显式指定，例如: python benchmarks.py backends:fake,sendinput
+    """
+    for name in names or ("fake",):
+        for low_latency in (False, True):
+            label = f"{name}{'(低延迟)' if low_latency else ''}"
+            try:
+                backend = create_backend(name, low_latency=low_latency)
+            except Exception as e:
+                print(f"{label:>16}: 不可用 ({str(e)})")
+                break
+            rate, _ = measure_backend(backend, count=5000, low_latency=low_latency)
+            _, errors = measure_backend(backend, count=1000, spacing=0.001, low_latency=low_latency)
+            backend.close()
+            print(f"{label:>16}: 吞吐量 {rate:10.0f} 操作/秒  "
+                  f"1ms间隔定时误差 p50 {errors['p50'] * 1000:.3f}ms / p99 {errors['p99'] * 1000:.3f}ms / "
+                  f"最大 {errors['max'] * 1000:.3f}ms")
+
+
+def generate_chords(groups=2000, seed=0):
+    """生成成组出现的操作：同一时刻的组合键、点击前的移动、连续的鼠标移动
+
+    Returns:
+        list: 按时间排序的操作字典列表
+    """
+    rng = random.Random(seed)
+    actions = []
+    t = 0.0
+    x, y = 500, 300
+    for _ in range(groups):
+        t += 0.002
+        roll = rng.random()
+        if roll < 0.4:
+            for key in rng.sample("asdfqwer", rng.randint(2, 4)):
+                actions.append({"type": "key_press", "key": key, "time": t})
+        elif roll < 0.7:
+            x += rng.randint(-20, 20)
+            y += rng.randint(-20, 20)
+            actions.append({"type": "mouse_move", "x": x, "y": y, "time": t})
+            actions.append({"type": "mouse_click", "button": "left", "pressed": True,
+                            "x": x, "y": y, "time": t + 0.0002})
+        else:
+            x += rng.randint(-5, 5)
+            y += rng.randint(-5, 5)
+            actions.append({"type": "mouse_move", "x": x, "y": y, "time": t})
+    return actions
+
+
+def bench_batching():
+    """批量注入：把截止时间相近的操作合并为一次注入调用（fake后端）"""
+    script = ActionBuffer(generate_chords())
+    expected = None
+    for window in (None, 0.0, 0.001):
+        backend = create_backend("fake", low_latency=True)
+        player = TimedPlayer(backend)
+        player.low_latency = True
+        player.batch_window = window
+        player.play(script, start_delay=0)
+        stats = player.last_batch_stats
+        events = [event[1:] for event in backend.events]
+        expected = expected or events
+        assert events == expected, "批量注入改变了事件内容或顺序"
+        assert backend.calls == stats["batches"], "每批应只有一次注入调用"
+        label = "不合并" if window is None else f"窗口 {window * 1000:.1f}ms"
+        print(f"{label:>10}: 操作 {len(script)}  注入调用 {backend.calls}  "
+              f"每批操作数 {stats['histogram']}  注入耗时 p50 {stats['p50'] * 1e6:.1f}us / "
+              f"p99 {stats['p99'] * 1e6:.1f}us")
+
+
+def legacy_execute_action(backend, action):
+    """原有的逐个比较操作类型字符串的执行实现，作为分派基准的对照组
+
+    Args:
+        backend: 输入后端
+        action: 要执行的操作
+    """
+    action_type = action.get("type", "")
+
+    if action_type == "key_press":
+        key = action.get("key", "")
+        if key:
+            try:
+                backend.key_down(key)
+            except Exception as e:
+                print(f"按键按下错误: {key} - {str(e)}")
+
+    elif action_type == "key_release":
+        key = action.get("key", "")
+        if key:
+            try:
+                backend.key_up(key)
+            except Exception as e:
+                print(f"按键释放错误: {key} - {str(e)}")
+
+    elif action_type == "mouse_move":
+        x = action.get("x", 0)
+        y = action.get("y", 0)
+        try:
+            current_x, current_y = backend.position()
+            dx = x - current_x
+            dy = y - current_y
+            if dx != 0 or dy != 0:
+                backend.move_rel(dx, dy)
+        except Exception as e:
+            print(f"鼠标移动错误: {x},{y} - {str(e)}")
+
+    elif action_type == "mouse_click":
+        x = action.get("x", 0)
+        y = action.get("y", 0)
+        button = action.get("button", "left")
+        pressed = action.get("pressed", False)
+
+        if button == "left":
+            button_name = "left"
+        elif button == "right":
+            button_name = "right"
+        elif button == "middle":
+            button_name = "middle"
+        else:
+            button_name = "left"
+
+        try:
+            backend.move_to(x, y)
+            if pressed:
+                backend.mouse_down(button_name)
+            else:
+                backend.mouse_up(button_name)
+        except Exception as e:
+            print(f"鼠标点击错误: {x},{y},{button},{pressed} - {str(e)}")
+
+    elif action_type == "mouse_scroll":
+        x = action.get("x", 0)
+        y = action.get("y", 0)
+        dx = action.get("dx", 0)
+        dy = action.get("dy", 0)
+        try:
+            backend.move_to(x, y)
+            backend.scroll(dx, dy)
+        except Exception as e:
+            print(f"鼠标滚轮错误: {x},{y},{dx},{dy} - {str(e)}")
+
+
+class NullBackend(InputBackend):
+    """什么也不做的后端，用于只测量播放器自身的分派开销"""
+
+    name = "null"
+
+    def key_down(self, key):
+        pass
+
+    def key_up(self, key):
+        pass
+
+    def mouse_down(self, button):
+        pass
+
+    def mouse_up(self, button):
+        pass
+
+    def move_to(self, x, y):
+        pass
+
+    def move_rel(self, dx, dy):
+        pass
+
+    def scroll(self, dx, dy):
+        pass
+
+    def position(self):
+        return 0, 0
+
+
+def bench_dispatch(count=200000, repeat=5):
+    """每个操作的分派耗时：原有的if/elif字符串比较与预编译的分派表（不含等待和注入本身）"""
+    count, repeat = int(count), int(repeat)
+    actions = generate_actions(count)
+    buffer = ActionBuffer(actions)
+
+    # 先用fake后端确认两种实现注入的事件完全一致
+    legacy_backend = create_backend("fake")
+    for action in actions:
+        legacy_execute_action(legacy_backend, action)
+    player = Player(backend=create_backend("fake"))
+    player._dispatch(player.compile(buffer))
+    assert ([event[1:] for event in player.backend.events]
+            == [event[1:] for event in legacy_backend.events]), "分派结果与原实现不一致"
+
+    backend = NullBackend()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for action in actions:
+            legacy_execute_action(backend, action)
+    legacy_time = (time.perf_counter() - start) / (count * repeat)
+
+    player = Player(backend=backend)
+    start = time.perf_counter()
+    steps = player.compile(buffer)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        # 与Player._dispatch中的循环相同：每个步骤直接调用绑定的处理方法
+        for step in steps:
+            step[2](step)
+    compiled_time = (time.perf_counter() - start) / (count * repeat)
+
+    print(f"操作数 {count} × {repeat} 次重复")
+    print(f"原实现:   {legacy_time * 1e9:7.0f} ns/操作")
+    print(f"分派表:   {compiled_time * 1e9:7.0f} ns/操作 ({legacy_time / compiled_time:.1f}x)，"
+          f"编译一次 {compile_time * 1000:.1f}ms（{compile_time / count * 1e9:.0f} ns/操作）")
+
+
+def bench_tracing(count=200000, repeat=3):
+    """追踪层：未启用/启用时每组操作的播放开销（截止时间都已到达，不含等待），
+    环形缓冲区覆盖、Chrome追踪导出和记录器事件追踪"""
+    count = int(count)
+    repeat = int(repeat)
+    # 所有操作的时间相同，截止时间都已到达，测到的只有调度、分派和追踪本身的开销
+    steps = [{"type": "key_press" if i % 2 == 0 else "key_release", "key": "a", "time": 0.0}
+             for i in range(count)]
+    player = Player(backend=NullBackend())
+    compiled = CompiledScript(player.compile(steps))
+
+    def per_step(tracer):
+        player.tracer = tracer
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            player.play(compiled, start_delay=0)
+            elapsed = (time.perf_counter() - start) / count
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    disabled = per_step(None)
+    tracer = Tracer(capacity=count // 2)
+    enabled = per_step(tracer)
+    s = tracer.summary()
+    assert len(tracer) == count // 2 and tracer.dropped == count * repeat - count // 2
+    assert s["lateness"]["count"] == count // 2 and s["lateness"]["p50"] >= 0
+
+    # 环形缓冲区按记录顺序返回最新的事件
+    small = Tracer(capacity=3)
+    for i in range(5):
+        small.record(TRACE_PLAY, "key_press", i, i + 0.001, 0.0001, size=1)
+    assert [event[2] for event in small.events()] == [2, 3, 4] and small.dropped == 2
+
+    # 多个线程同时记录时计数不会丢失
+    shared = Tracer(capacity=1000)
+
+    def record_many():
+        for i in range(20000):
+            shared.record(TRACE_PLAY, "key_press", i, i, 0.0, size=1)
+
+    threads = [threading.Thread(target=record_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert shared.dropped == 4 * 20000 - 1000 and len(shared.events()) == 1000
+
+    # 记录器：直接调用包装后的事件处理函数（不启动pynput监听器）
+    recorder = Recorder()
+    recorder.tracer = Tracer()
+    recorder.recording = True
+    recorder.start_ns = time.perf_counter_ns()
+    recorder.move_filter = None
+    recorded = []
+    recorder.callback = recorded.append
+    handlers = recorder._listener_handlers()
+    for i in range(1000):
+        handlers["mouse_move"](i, i)
+    recorder.drain()
+    assert len(recorded) == 1000 and recorder.tracer.summary()["record"]["count"] == 1000
+
+    # 导出的Chrome追踪可以重新解析，事件数与缓冲区一致
+    trace_dir = tempfile.mkdtemp(prefix="anjian_trace_")
+    try:
+        path = f"{trace_dir}/trace.json"
+        start = time.perf_counter()
+        tracer.save_chrome_trace(path)
+        export_time = time.perf_counter() - start
+        with open(path, encoding="utf-8") as f:
+            trace = json.load(f)
+        assert len(trace["traceEvents"]) == len(tracer)
+        assert all(event["ph"] == "X" and event["cat"] == TRACE_PLAY for event in trace["traceEvents"])
+        # 播放事件记录组内操作数，队列深度只用于记录事件
+        assert all(event["args"]["size"] == 1 and "depth" not in event["args"] for event in trace["traceEvents"])
+        recorder.tracer.save_chrome_trace(path)
+        with open(path, encoding="utf-8") as f:
+            events = json.load(f)["traceEvents"]
+        # 每个记录事件之外还有一个队列深度计数器事件
+        assert len(events) == 2000 and all(event["cat"] == TRACE_RECORD for event in events if event["ph"] == "X")
+    finally:
+        shutil.rmtree(trace_dir, ignore_errors=True)
+
+    print(f"{count} 组 × {repeat} 次: 未启用 {disabled * 1e9:6.0f} ns/组  启用 {enabled * 1e9:6.0f} ns/组  "
+          f"(追踪开销 {(enabled - disabled) * 1e9:.0f} ns/组)")
+    print(f"导出 {len(tracer)} 个事件 {export_time * 1000:.1f}ms")
+
+    # 按实际间隔播放1秒（fake后端），迟到时间才有意义
+    player = Player(backend=create_backend("fake"))
+    player.tracer = Tracer()
+    player.play(_key_script(1.0, 0.001), start_delay=0)
+    print(player.tracer.format_summary())
+    print(recorder.tracer.format_summary())
+
+
+class _FakeKey:
+    """模拟pynput的字符键"""
+
+    def __init__(self, char, vk=None):
+        self.char = char
+        self.vk = vk
+
+
+def _hook_latency(recorder, moves, keys):
+    """模拟键盘和鼠标两个钩子线程同时调用事件处理方法，返回每次调用的耗时"""
+    key_samples = array("d")
+    move_samples = array("d")
+
+    def mouse_hook():
+        for i in range(moves):
+            start = time.perf_counter()
+            recorder._on_mouse_move(i, i)
+            move_samples.append(time.perf_counter() - start)
+
+    def keyboard_hook():
+        for i in range(keys):
+            key = _FakeKey(chr(ord("a") + i % 26))
+            start = time.perf_counter()
+            recorder._on_key_press(key)
+            recorder._on_key_release(key)
+            key_samples.append(time.perf_counter() - start)
+            if i % 100 == 0:
+                time.sleep(0.0005)
+
+    threads = [threading.Thread(target=mouse_hook), threading.Thread(target=keyboard_hook)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return move_samples, key_samples
+
+
+def _latency_summary(samples):
+    stats = JitterStats()
+    stats.samples = samples
+    s = stats.summary()
+    return f"p50 {s['p50'] * 1e6:6.1f}us  p99 {s['p99'] * 1e6:7.1f}us  最大 {s['max'] * 1000:7.2f}ms"
+
+
+def bench_recorder(moves=100000, keys=5000):
+    """记录器压力测试：回调很慢时钩子线程中事件处理方法的耗时（队列+消费者线程与原来的同步回调对比），
+    操作不丢失、不乱序，以及队列溢出计数"""
+    moves = int(moves)
+    keys = int(keys)
+    delivered = []
+
+    def slow_callback(action):
+        # 模拟界面插入：每100个操作卡顿1毫秒
+        delivered.append(action)
+        if len(delivered) % 100 == 0:
+            time.sleep(0.001)
+
+    def make_recorder():
+        recorder = Recorder()
+        recorder.recording = True
+        recorder.start_ns = time.perf_counter_ns()
+        recorder.callback = slow_callback
+        recorder.move_filter = None
+        recorder.stop_key = "F9"
+        recorder.events = EventRing(moves + 2 * keys)
+        return recorder
+
+    # 原来的方式：钩子线程中直接处理并调用回调
+    recorder = make_recorder()
+    recorder.events.put = recorder._process
+    sync_moves, sync_keys = _hook_latency(recorder, moves, keys)
+    assert len(delivered) == moves + 2 * keys
+    delivered.clear()
+
+    # 队列+消费者线程
+    recorder = make_recorder()
+    recorder._start_consumer()
+    start = time.perf_counter()
+    ring_moves, ring_keys = _hook_latency(recorder, moves, keys)
+    hook_time = time.perf_counter() - start
+    recorder._stop_consumer()
+    drain_time = time.perf_counter() - start
+    stats = recorder.event_stats
+    assert stats["overflow"] == 0 and len(delivered) == moves + 2 * keys
+    # 同一个钩子线程的事件保持顺序
+    xs = [action["x"] for action in delivered if action["type"] == "mouse_move"]
+    assert xs == list(range(moves))
+    presses = [action for action in delivered if action["type"].startswith("key")]
+    assert all(a["type"] == "key_press" and b["type"] == "key_release" and a["key"] == b["key"]
+               for a, b in zip(presses[::2], presses[1::2]))
+
+    print(f"{moves} 次鼠标移动 + {keys} 次按键，回调每100个操作卡顿1ms")
+    print(f"同步回调   移动 {_latency_summary(sync_moves)}   按键 {_latency_summary(sync_keys)}")
+    print(f"事件队列   移动 {_latency_summary(ring_moves)}   按键 {_latency_summary(ring_keys)}")
+    print(f"钩子结束 {hook_time:.2f}s, 全部处理完 {drain_time:.2f}s, 最大积压 {stats['max_depth']} 个事件")
+
+    # 队列容量不足且消费者停止时，超出的事件被丢弃并计数
+    delivered.clear()
+    recorder = make_recorder()
+    recorder.events = EventRing(1000)
+    for i in range(1500):
+        recorder._on_mouse_move(i, i)
+    recorder._stop_consumer()
+    assert recorder.event_stats == {"received": 1500, "overflow": 500, "max_depth": 1000}
+    assert [action["x"] for action in delivered] == list(range(1000))
+    print(f"容量1000的队列放入1500个事件: 溢出 {recorder.event_stats['overflow']} 个")
+
+
+def _typing_events(rate, seconds, rng):
+    """生成快速打字的按键事件流
+
+    按键间隔1/rate秒，每个键按住40到120毫秒（与后面的键交叠）；每2秒按住一个键0.8秒，
+    按住0.5秒后系统以30次/秒自动重复按下事件；偶尔按住Shift后按下'a'、释放时字符变为'A'。
+
+    Returns:
+        tuple: (按时间排序的(操作码, 时间（微秒）, 键)列表, 应记录的(操作类型, 键名, 时间（微秒）)列表)
+    """
+    events = []
+    expected = []
+    held_until = {}  # 字符 -> 释放时间
+    step = 1 / rate
+    for i in range(int(rate * seconds)):
+        t = i * step
+        if i % int(rate * 2) == 0:
+            # 长按：首次按下之后是自动重复的按下事件
+            char = "w"
+            release = t + 0.8
+            repeats = [t + 0.5 + j / 30 for j in range(int(0.3 * 30))]
+        else:
+            char = rng.choice([c for c in "abcdefghijklmnopqrstuvxyz" if held_until.get(c, -1) < t])
+            release = t + rng.uniform(0.04, 0.12)
+            repeats = []
+        held_until[char] = release
+        vk = ord(char.upper())
+        release_char = char.upper() if char == "a" else char
+        press_us, release_us = to_us(t), to_us(release)
+        events.append((OP_KEY_PRESS, press_us, _FakeKey(char, vk)))
+        events.extend((OP_KEY_PRESS, to_us(r), _FakeKey(char, vk)) for r in repeats)
+        events.append((OP_KEY_RELEASE, release_us, _FakeKey(release_char, vk)))
+        expected.append(("key_press", char, press_us))
+        expected.append(("key_release", char, release_us))
+    events.sort(key=lambda event: event[1])
+    expected.sort(key=lambda action: action[2])
+    return events, expected
+
+
+def bench_keys(rate=30, seconds=60):
+    """按键状态机：快速打字（交叠按键、自动重复、Shift改变字符）不丢失按下/释放，
+    与原来所有键共用50ms去抖的对比，以及回放（fake后端）后没有卡住的按键"""
+    rate = float(rate)
+    seconds = float(seconds)
+    events, expected = _typing_events(rate, seconds, random.Random(4))
+
+    # 原来的方式：所有键的按下和释放共用一个50ms的间隔阈值
+    last = -1e9
+    legacy = 0
+    for op, t, key in events:
+        if t / 1e6 - last >= 0.05:
+            last = t / 1e6
+            legacy += 1
+
+    recorded = []
+    recorder = Recorder()
+    recorder.recording = True
+    recorder.callback = recorded.append
+    recorder.move_filter = None
+    recorder.stop_key = "F9"
+    recorder.events = EventRing(len(events) + 2)
+    for event in events:
+        recorder.events.put(event)
+    start = time.perf_counter()
+    recorder.drain()
+    elapsed = time.perf_counter() - start
+    stats = recorder.key_state.stats
+    assert [(a["type"], a["key"], to_us(a["time"])) for a in recorded] == expected, "记录的按键与输入不一致"
+    assert not recorder.key_state.held
+
+    print(f"{len(events)} 个按键事件 ({rate:.0f}键/秒, {seconds:.0f}s, 其中自动重复 {stats['repeats']} 个)")
+    print(f"原来的50ms去抖: 保留 {legacy} / 应保留 {len(expected)}，丢失 {len(expected) - legacy} 个")
+    print(f"逐键状态机: 保留 {len(recorded)}，丢失 0 个，每个事件 {elapsed / len(events) * 1e6:.1f}us")
+
+    # 回放：每个按下都有对应的释放，结束时没有按住的键
+    backend = create_backend("fake")
+    player = Player(backend=backend)
+    player.play(ActionBuffer(recorded), start_delay=0, speed=20)
+    downs = {}
+    for event in backend.events:
+        if event[1] == "key_down":
+            downs[event[2]] = downs.get(event[2], 0) + 1
+        elif event[1] == "key_up":
+            downs[event[2]] -= 1
+    assert sum(1 for event in backend.events if event[1] == "key_down") == len(expected) // 2
+    assert not any(downs.values()), "回放后有按键卡住"
+    print(f"20倍速回放: {len(expected) // 2} 次按下全部释放")
+
+    # 停止记录时仍按住的键补上释放
+    recorded.clear()
+    recorder.start_ns = time.perf_counter_ns()
+    recorder.events.put((OP_KEY_PRESS, 0, _FakeKey("q", 81)))
+    recorder.events.put((OP_KEY_PRESS, 10, _FakeKey("F9", 120)))
+    recorder.stop_recording()
+    assert [(a["type"], a["key"]) for a in recorded] == [("key_press", "q"), ("key_release", "q")]
+    assert recorder.key_stats["auto_released"] == 1
+
+
+def bench_binary(count=200000):
+    """二进制脚本：与文本脚本的保存/加载耗时对比，截断或损坏的文件和超出范围的数值报告ValueError"""
+    count = int(count)
+    buffer = ActionBuffer(generate_actions(count))
+    manager = ScriptManager()
+    work_dir = tempfile.mkdtemp(prefix="anjian_binary_")
+    try:
+        text_path = os.path.join(work_dir, "script.ajs")
+        binary_path = os.path.join(work_dir, "script.ajsb")
+        timings = {}
+        for label, path in (("文本", text_path), ("二进制", binary_path)):
+            start = time.perf_counter()
+            if manager.is_binary_script(path):
+                manager.save_binary(path, buffer)
+            else:
+                manager.save_actions(path, buffer)
+            saved = time.perf_counter() - start
+            start = time.perf_counter()
+            loaded = manager.load_actions(path)
+            timings[label] = (saved, time.perf_counter() - start, os.path.getsize(path))
+            assert _columns_equal(loaded, buffer), f"{label}脚本往返结果不一致"
+        for label, (saved, loaded, size) in timings.items():
+            print(f"{label:<4} 保存 {saved * 1000:7.1f}ms  加载 {loaded * 1000:7.1f}ms  文件 {size / 1024:8.1f}KB")
+
+        # 截断或损坏的文件在打开或读取时报告ValueError，不会在播放中途出现struct.error或IndexError
+        small = ActionBuffer([{"type": "key_press", "key": "a", "time": 0.1},
+                              {"type": "mouse_scroll", "x": 1, "y": 2, "dx": 0, "dy": 3, "time": 0.2}])
+        manager.save_binary(binary_path, small)
+        with open(binary_path, "rb") as f:
+            data = f.read()
+        bad_op = bytearray(data)
+        bad_op[HEADER.size + 8] = 9  # 第一条记录的操作码
+        bad_key = bytearray(data)
+        bad_key[HEADER.size + 9] = 7  # 第一条记录的键表索引
+        corrupted = {"键名被截断": data[:-1], "缺少键表": data[:HEADER.size + RECORD.size * 2 + 2],
+                     "记录区被截断": data[:HEADER.size + 5], "未知的操作码": bytes(bad_op),
+                     "键表索引越界": bytes(bad_key)}
+        for label, content in corrupted.items():
+            with open(binary_path, "wb") as f:
+                f.write(content)
+            try:
+                with BinaryScriptReader(binary_path) as reader:
+                    reader.to_buffer()
+            except ValueError as e:
+                print(f"{label}: {e}")
+            else:
+                raise AssertionError(f"{label}的文件没有报告错误")
+
+        # 超出记录字段范围的数值在写入之前报告ValueError
+        try:
+            manager.save_binary(binary_path, [{"type": "mouse_scroll", "x": 0, "y": 0, "dx": 0, "dy": 40000,
+                                               "time": 0.0}])
+        except ValueError as e:
+            print(f"滚动量超出范围: {e}")
+        else:
+            raise AssertionError("超出范围的滚动量没有报告错误")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _write_binary_v1(file_path, buffer):
+    """按版本1（时间为秒的double）写入二进制脚本，用于检查旧文件的兼容性"""
+    record = RECORDS[1]
+    with open(file_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 1, record.size, len(buffer), HEADER.size + len(buffer) * record.size))
+        for i in range(len(buffer)):
+            key_id = buffer.key_ids[i] if buffer.key_ids[i] >= 0 else 0xFFFF
+            f.write(record.pack(buffer.time_at(i), buffer.ops[i], key_id,
+                                buffer.xs[i], buffer.ys[i], buffer.dxs[i], buffer.dys[i]))
+        f.write(KEY_COUNT.pack(0))
+
+
+def bench_timestamps(count=2000, spacing_us=250):
+    """微秒时间戳：记录器时间的分辨率，文本/二进制脚本的往返精度和旧格式兼容，亚毫秒间隔的播放误差（fake后端）"""
+    count = int(count)
+    spacing_us = int(spacing_us)
+
+    # 记录器：钩子中取得的时间为单调的整数微秒
+    recorder = Recorder()
+    recorder.recording = True
+    recorder.start_ns = time.perf_counter_ns()
+    recorder.move_filter = None
+    recorded = []
+    recorder.callback = recorded.append
+    for i in range(count):
+        recorder._on_mouse_move(i, i)
+    recorder.drain()
+    stamps = [to_us(action["time"]) for action in recorded]
+    assert all(a <= b for a, b in zip(stamps, stamps[1:]))
+    gaps = [b - a for a, b in zip(stamps, stamps[1:]) if b > a]
+    print(f"记录器: {count} 个事件用时 {stamps[-1] - stamps[0]}us, {len(set(stamps))} 个不同的时间戳, "
+          f"最小间隔 {min(gaps) if gaps else 0}us")
+
+    # 亚毫秒间隔的脚本在文本和二进制格式中往返不丢失精度
+    buffer = ActionBuffer({"type": "mouse_move", "x": i, "y": 0, "time": i * spacing_us / 1e6}
+                          for i in range(count))
+    buffer.append({"type": "key_press", "key": "a", "time": 1.5})
+    manager = ScriptManager()
+    text = "\n".join(manager.format_action(action) for action in buffer)
+    assert "[0.000250] MOUSE_MOVE" in text and "[1.500] KEY_PRESS: a" in text
+    assert manager.parse_to_buffer(text).times == buffer.times
+    # 原有的3位小数格式仍然可以读取
+    assert manager.parse_to_buffer("[0.500] KEY_PRESS: a\n").times.tolist() == [500000]
+
+    work_dir = tempfile.mkdtemp(prefix="anjian_time_")
+    try:
+        manager.save_binary(f"{work_dir}/v2.ajsb", buffer)
+        assert manager.load_actions(f"{work_dir}/v2.ajsb").times == buffer.times
+        # 版本1的二进制脚本（时间为秒）仍然可以读取和流式播放
+        old = ActionBuffer({"type": "mouse_move", "x": i, "y": 0, "time": round(i * 0.001, 3)} for i in range(100))
+        _write_binary_v1(f"{work_dir}/v1.ajsb", old)
+        assert manager.load_actions(f"{work_dir}/v1.ajsb").times == old.times
+        with manager.load_binary(f"{work_dir}/v1.ajsb") as reader:
+            assert reader.version == 1 and [a["time"] for a in reader] == [a["time"] for a in old]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    # 按微秒时间戳播放：相对各自截止时间的误差
+    player = TimedPlayer(create_backend("fake"))
+    player.play(buffer[:count], start_delay=0)
+    scheduler = player.scheduler
+    errors = JitterStats()
+    for i, done in enumerate(player.done_times):
+        errors.add(done - (scheduler.origin + buffer.time_at(i) - scheduler.base_time))
+    s = errors.summary()
+    print(f"{count} 个间隔 {spacing_us}us 的操作: 执行完成时刻误差 p50 {s['p50'] * 1e6:.1f}us  "
+          f"p99 {s['p99'] * 1e6:.1f}us  最大 {s['max'] * 1e6:.1f}us")
+
+
+def bench_incremental(count=100000, rounds=50):
+    """编辑后再播放：逐行增量编译与整体重新编译的耗时，并确认两者结果一致"""
+    count = int(count)
+    rng = random.Random(1)
+    buffer = ActionBuffer(generate_actions(count))
+    player = Player(backend=create_backend("fake"))
+
+    start = time.perf_counter()
+    player.compile_buffer(buffer)
+    first_time = time.perf_counter() - start
+
+    full_time = 0.0
+    incremental_time = 0.0
+    for i in range(int(rounds)):
+        # 模拟编辑区的操作：修改一行（删除后按时间插回）、插入、删除、记录时追加
+        for _ in range(rng.randint(1, 3)):
+            roll = rng.random()
+            index = rng.randrange(len(buffer))
+            if roll < 0.5:
+                # 修改一行：时间变化较小时原地替换，否则移动到新位置
+                action = buffer.get_action(index)
+                action["time"] = round(action["time"] + rng.choice((0, 0.001, 1)) * rng.uniform(-1, 1), 3)
+                buffer.replace(index, action)
+            elif roll < 0.7:
+                # 键名为空的行无法编译，检查占位是否正确
+                buffer.insert_sorted({"type": "key_press", "key": rng.choice(("a", "")),
+                                      "time": buffer.time_at(index)})
+            elif roll < 0.9:
+                buffer.delete(index)
+            else:
+                buffer.append({"type": "mouse_move", "x": i, "y": i, "time": buffer.time_at(-1) + 0.01})
+
+        start = time.perf_counter()
+        compiled = player.compile_buffer(buffer)
+        incremental_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = player.compile(buffer)
+        full_time += time.perf_counter() - start
+        assert compiled.steps == expected, "增量编译结果与整体编译不一致"
+
+    rounds = int(rounds)
+    print(f"{count} 个操作: 首次编译 {first_time * 1000:.1f}ms，编辑后整体重新编译 "
+          f"{full_time / rounds * 1000:.1f}ms，增量编译 {incremental_time / rounds * 1000:.2f}ms "
+          f"({full_time / incremental_time:.0f}x)")
+
+
+def bench_seek(count=1000000, seeks=20):
+    """部分播放：二分查找开始位置并重建按键状态的耗时，确认播放后没有卡住的按键"""
+    count = int(count)
+    rng = random.Random(2)
+    buffer = ActionBuffer(generate_actions(count))
+    player = Player(backend=create_backend("fake"))
+    steps = player.compile(buffer)
+    duration = buffer.time_at(-1)
+
+    elapsed = 0.0
+    for _ in range(int(seeks)):
+        start = rng.uniform(0, duration)
+        end = start + rng.uniform(1, 60)
+        begin = time.perf_counter()
+        ranged = player.seek(steps, start, end)
+        elapsed += time.perf_counter() - begin
+        assert ranged == list(player._seek_stream(iter(steps), start, end)), "流式截取结果不一致"
+
+        # 截取结果中每个按下的按键和按钮都在结尾被释放
+        held = HeldState()
+        for step in ranged:
+            held.update(step)
+        assert not held.keys and not held.buttons, "部分播放后仍有按键处于按下状态"
+
+    print(f"{count} 个操作: 平均每次截取 {elapsed / int(seeks) * 1000:.1f}ms")
+
+    # 从拖动中间开始播放：先在按下的位置按下按钮，光标最后停在拖动中最后记录的位置
+    drag = [{"type": "mouse_click", "button": "left", "pressed": True, "x": 10, "y": 10, "time": 0.0},
+            {"type": "mouse_move", "x": 30, "y": 40, "time": 0.01},
+            {"type": "mouse_move", "x": 50, "y": 60, "time": 0.02},
+            {"type": "mouse_move", "x": 70, "y": 80, "time": 0.03},
+            {"type": "mouse_click", "button": "left", "pressed": False, "x": 70, "y": 80, "time": 0.04}]
+    backend = FakeBackend()
+    player = Player(backend=backend)
+    player.play(drag, start_delay=0, start=0.025)
+    events = [event[1:] for event in backend.events]
+    assert events[:3] == [("move_to", 10, 10), ("mouse_down", "left"), ("move_rel", 40, 50)], \
+        "恢复按下状态后光标没有回到最后记录的位置"
+    assert events[-1] == ("mouse_up", "left") and backend.position() == (70, 80)
+    print(f"从拖动中间开始播放: {events[:3]}")
+
+
+def bench_speed(seconds=5):
+    """倍速和最大间隔：实际耗时、实际倍速，以及按倍速换算后的定时误差（fake后端）"""
+    seconds = float(seconds)
+    # 每10毫秒一个移动，中间有一段长时间空闲
+    actions = [{"type": "mouse_move", "x": 100 + i % 50, "y": 100, "time": round(i * 0.01, 3)}
+               for i in range(int(seconds * 100))]
+    for action in actions[len(actions) // 2:]:
+        action["time"] = round(action["time"] + seconds, 3)
+    duration = actions[-1]["time"]
+
+    for speed, max_gap in ((10, None), (50, None), (10, 0.05)):
+        player = Player(backend=create_backend("fake"))
+        player.max_gap = max_gap
+        start = time.perf_counter()
+        player.play(actions, start_delay=0, speed=speed)
+        elapsed = time.perf_counter() - start
+        expected = duration / speed
+        if max_gap is not None:
+            expected -= seconds / speed - max_gap
+        assert abs(elapsed - expected) < 0.05 + expected * 0.05, "实际耗时与倍速不符"
+        print(f"倍速 {speed:>4}x 最大间隔 {max_gap}: 脚本 {duration:.2f}s，实际耗时 {elapsed:.3f}s "
+              f"(预期 {expected:.3f}s)，实际倍速 {player.last_rate:.2f}x，"
+              f"抖动 p99 {player.last_stats['p99'] * 1000:.2f}ms")
+
+
+def _key_script(seconds, spacing, key="a"):
+    """只用键盘的脚本：按固定间隔按下/释放同一个键"""
+    actions = []
+    for i in range(int(seconds / spacing / 2)):
+        actions.append({"type": "key_press", "key": key, "time": round(2 * i * spacing, 4)})
+        actions.append({"type": "key_release", "key": key, "time": round((2 * i + 1) * spacing, 4)})
+    return actions
+
+
+def _mouse_script(seconds, spacing, offset=0):
+    """只用鼠标的脚本：按固定间隔移动"""
+    return [{"type": "mouse_move", "x": 100 + offset + i % 100, "y": 100, "time": round(i * spacing, 4)}
+            for i in range(int(seconds / spacing))]
+
+
+class SlowFakeBackend(FakeBackend):
+    """每次鼠标注入耗时约0.3毫秒的内存后端，并记录同时进行的鼠标注入数"""
+
+    def __init__(self):
+        super().__init__()
+        self.active = 0
+        self.max_active = 0
+
+    def move_rel(self, dx, dy):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        time.sleep(0.0003)
+        super().move_rel(dx, dy)
+        self.active -= 1
+
+
+def bench_multi(seconds=1.0):
+    """多脚本并行播放：键盘脚本与鼠标脚本并行、两个鼠标脚本经仲裁器串行注入、单独停止一个脚本（fake后端）"""
+    seconds = float(seconds)
+
+    # 键盘脚本和鼠标脚本使用不同的设备，总耗时接近单个脚本的时长
+    engine = MultiPlayer(backend=create_backend("fake"))
+    keys = engine.add(_key_script(seconds, 0.005), name="键盘")
+    mouse = engine.add(_mouse_script(seconds, 0.002), name="鼠标")
+    summary = engine.play(start_delay=0)
+    assert keys.player.action_count == len(keys.script) and mouse.player.action_count == len(mouse.script)
+    assert sum(event[1] == "key_down" for event in engine.backend.events) == len(keys.script) // 2
+    assert summary["elapsed"] < seconds * 1.5, "键盘和鼠标脚本没有并行执行"
+    print(engine.format_summary())
+
+    # 两个鼠标脚本争用鼠标，由仲裁器串行注入（同时进行的鼠标注入不超过一个）
+    engine = MultiPlayer(backend=SlowFakeBackend())
+    low = engine.add(_mouse_script(seconds, 0.001), name="低优先级", priority=0)
+    high = engine.add(_mouse_script(seconds, 0.001, offset=500), name="高优先级", priority=10)
+    summary = engine.play(start_delay=0)
+    assert summary["actions"] == len(low.script) + len(high.script)
+    assert engine.backend.max_active == 1, "鼠标注入没有被串行化"
+    print(engine.format_summary())
+    print(f"抖动 p99: 高优先级 {high.player.last_stats['p99'] * 1000:.2f}ms / "
+          f"低优先级 {low.player.last_stats['p99'] * 1000:.2f}ms")
+
+    # 低延迟模式下两个交错的鼠标脚本共享一个光标：每次相对位移后光标都落在某个脚本的目标点上
+    backend = FakeBackend(100, 100)
+    engine = MultiPlayer(backend=backend)
+    first = [{"type": "mouse_move", "x": 100 + i, "y": 100, "time": i * 0.002} for i in range(50)]
+    second = [{"type": "mouse_move", "x": 500, "y": 500 + i, "time": i * 0.002 + 0.001} for i in range(50)]
+    for script in (first, second):
+        job = engine.add(script)
+        job.player.low_latency = True
+        job.player.failsafe_interval = 3600  # 不用真实光标位置校正，只依靠共享的光标状态
+    engine.play(start_delay=0)
+    targets = {(action["x"], action["y"]) for action in first + second}
+    x, y = 100, 100
+    for event in backend.events:
+        if event[1] == "move_rel":
+            x, y = x + event[2], y + event[3]
+        elif event[1] == "move_to":
+            x, y = event[2], event[3]
+        assert (x, y) in targets, f"共享后端的光标偏离了脚本中的位置: {(x, y)}"
+    assert backend.position() in ((149, 100), (500, 549))
+    print(f"低延迟模式交错播放两个鼠标脚本: 最终光标 {backend.position()}")
+
+    # 按住的键一直占用键盘：另一个键盘脚本不会在Shift按下和释放之间注入
+    engine = MultiPlayer(backend=create_backend("fake"))
+    engine.add([{"type": "key_press", "key": "shift", "time": 0.01}, {"type": "key_press", "key": "a", "time": 0.03},
+                {"type": "key_release", "key": "a", "time": 0.04}, {"type": "key_release", "key": "shift", "time": 0.06}])
+    engine.add(_key_script(0.1, 0.002, key="b"))
+    engine.play(start_delay=0)
+    keys = [event[2] for event in engine.backend.events]
+    shift_down, shift_up = keys.index("shift"), len(keys) - 1 - keys[::-1].index("shift")
+    assert "b" not in keys[shift_down:shift_up], "另一个脚本在按住Shift期间注入了按键"
+    print(f"按住Shift期间另一个键盘脚本等待: {keys[shift_down:shift_up + 1]}")
+
+    # 两个脚本各按住一个设备又需要对方的设备时不会死锁
+    engine = MultiPlayer(backend=create_backend("fake"))
+    engine.add([{"type": "key_press", "key": "shift", "time": 0}, {"type": "mouse_move", "x": 1, "y": 1, "time": 0.02},
+                {"type": "key_release", "key": "shift", "time": 0.04}])
+    engine.add([{"type": "mouse_click", "button": "left", "pressed": True, "x": 5, "y": 5, "time": 0.01},
+                {"type": "key_press", "key": "a", "time": 0.03}, {"type": "key_release", "key": "a", "time": 0.035},
+                {"type": "mouse_click", "button": "left", "pressed": False, "x": 5, "y": 5, "time": 0.05}])
+    engine.start(start_delay=0)
+    assert engine.wait(timeout=5), "互相等待对方按住的设备时死锁"
+    assert engine.summary()["actions"] == 7
+
+    # 停止其中一个脚本不影响另一个
+    engine = MultiPlayer(backend=create_backend("fake"))
+    stopped = engine.add(_mouse_script(seconds, 0.002), name="被停止")
+    kept = engine.add(_key_script(seconds, 0.005), name="继续")
+    engine.start(start_delay=0)
+    time.sleep(seconds / 4)
+    engine.stop("被停止")
+    engine.wait()
+    assert stopped.player.action_count < len(stopped.script)
+    assert kept.player.action_count == len(kept.script)
+    print(f"单独停止: {stopped.player.action_count}/{len(stopped.script)} 个操作后停止，"
+          f"另一个脚本完整执行 {kept.player.action_count} 个操作")
+
+
+class YieldingPlayer(Player):
+    """忙等待时让出GIL的线程播放器（多个播放线程并行时使用）"""
+
+    def _create_scheduler(self, speed=None):
+        scheduler = super()._create_scheduler(speed)
+        scheduler.yield_spin = True
+        return scheduler
+
+
+def _merged_jitter(players):
+    """合并多个播放器最近一次播放的抖动样本"""
+    stats = JitterStats()
+    for player in players:
+        stats.samples.extend(player.scheduler.stats.samples)
+    return stats.summary()
+
+
+def bench_async(seconds=1.0, *counts):
+    """线程调度与asyncio调度的抖动和CPU占用：同时运行不同数量的时间线（fake后端）"""
+    seconds = float(seconds)
+    counts = [int(count) for count in counts] or [1, 10, 50]
+    spacing = 0.005
+
+    def script(offset):
+        return [{"type": "mouse_move", "x": 100 + i % 100, "y": 100, "time": round(offset + i * spacing, 4)}
+                for i in range(int(seconds / spacing))]
+
+    def compiled(players, scripts):
+        # 预先编译，避免各时间线开始时的编译耗时计入其他时间线的抖动
+        return [CompiledScript(player.compile(s)) for player, s in zip(players, scripts)]
+
+    for count in counts:
+        actions = [script(i * spacing / count) for i in range(count)]
+        for label, player_class in (("线程(忙等待)", Player), ("线程(让出GIL)", YieldingPlayer)):
+            players = [player_class(backend=create_backend("fake")) for _ in range(count)]
+            scripts = compiled(players, actions)
+            threads = [threading.Thread(target=player.play, args=(s,), kwargs={"start_delay": 0})
+                       for player, s in zip(players, scripts)]
+            cpu = time.process_time()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            cpu = time.process_time() - cpu
+            s = _merged_jitter(players)
+            print(f"{count:>4} 条时间线 {label:<10} 抖动 p50 {s['p50'] * 1000:6.2f}ms  "
+                  f"p99 {s['p99'] * 1000:6.2f}ms  最大 {s['max'] * 1000:6.2f}ms  CPU {cpu:5.2f}s")
+
+        players = [AsyncPlayer(backend=create_backend("fake")) for _ in range(count)]
+        scripts = compiled(players, actions)
+        cpu = time.process_time()
+        results = asyncio.run(play_all(list(zip(players, scripts))))
+        cpu = time.process_time() - cpu
+        assert not any(results), results
+        assert all(player.last_stats["count"] == len(scripts[0]) for player in players)
+        s = _merged_jitter(players)
+        print(f"{count:>4} 条时间线 {'asyncio':<10} 抖动 p50 {s['p50'] * 1000:6.2f}ms  "
+              f"p99 {s['p99'] * 1000:6.2f}ms  最大 {s['max'] * 1000:6.2f}ms  CPU {cpu:5.2f}s")
+
+    # stop_playing只结束播放，await play的调用方继续执行；在其他线程中调用也可以
+    async def orchestrate(player, stop):
+        steps = []
+        stopper = asyncio.get_running_loop().call_later(0.1, stop)
+        await player.play(script(0), repeat=3, interval=1.0)
+        stopper.cancel()
+        steps.append("继续执行")
+        return steps
+
+    for label, make_stop in (("事件循环线程", lambda p: p.stop_playing),
+                             ("其他线程", lambda p: lambda: threading.Thread(target=p.stop_playing).start())):
+        player = AsyncPlayer(backend=create_backend("fake"))
+        start = time.perf_counter()
+        assert asyncio.run(orchestrate(player, make_stop(player))) == ["继续执行"]
+        elapsed = time.perf_counter() - start
+        assert elapsed < seconds / 2 + 0.2 and not player.playing
+        print(f"从{label}停止: {elapsed * 1000:.0f}ms 后play返回，调用方的任务没有被取消")
+
+
+def _columns_equal(a, b):
+    """比较两个缓冲区的各列和键表是否相同"""
+    return a.keys == b.keys and all(x == y for x, y in zip(a._columns(), b._columns()))
+
+
+def bench_cache(count=500000):
+    """脚本缓存：首次解析、内存缓存命中、磁盘缓存命中（新进程重新打开同一文件）的耗时"""
+    count = int(count)
+    cache_dir = tempfile.mkdtemp(prefix="anjian_cache_")
+    try:
+        path = f"{cache_dir}/script.ajs"
+        writer = ScriptManager()
+        writer.save_actions(path, ActionBuffer(generate_actions(count)))
+
+        manager = ScriptManager(ScriptCache(cache_dir=f"{cache_dir}/cache"))
+        start = time.perf_counter()
+        parsed = manager.load_actions(path)
+        parse_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        memory_hit = manager.load_actions(path)
+        memory_time = time.perf_counter() - start
+
+        # 新的缓存实例模拟重新启动程序后打开同一文件
+        reopened = ScriptManager(ScriptCache(cache_dir=f"{cache_dir}/cache"))
+        start = time.perf_counter()
+        disk_hit = reopened.load_actions(path)
+        disk_time = time.perf_counter() - start
+
+        assert _columns_equal(parsed, memory_hit) and _columns_equal(parsed, disk_hit)
+        assert manager.cache.stats()["hits"] == 1 and reopened.cache.stats()["disk_hits"] == 1
+
+        # 返回的是副本，修改不影响缓存
+        memory_hit.delete(0)
+        assert len(manager.load_actions(path)) == len(parsed)
+
+        # 乱序的脚本不缓存，再次打开时仍能报告乱序（界面据此决定能否直接从文件流式播放）
+        unsorted = f"{cache_dir}/unsorted.ajs"
+        manager.save_script(unsorted, "[0.200] KEY_PRESS: a\n[0.100] KEY_RELEASE: a\n")
+        for _ in range(2):
+            manager.load_actions(unsorted)
+            assert not manager.last_report.monotonic, "命中缓存时丢失了乱序信息"
+
+        # 内存容量只够一个脚本时按LRU淘汰
+        small = ScriptCache(max_bytes=int(parsed.nbytes() * 1.5))
+        small.put("a", parsed)
+        small.put("b", parsed)
+        assert small.get("a") is None and small.get("b") is not None and small.evictions == 1
+
+        print(f"{count} 个操作: 首次解析 {parse_time * 1000:8.1f}ms  内存命中 {memory_time * 1000:6.1f}ms "
+              f"({parse_time / memory_time:.0f}x)  磁盘命中 {disk_time * 1000:6.1f}ms "
+              f"({parse_time / disk_time:.0f}x)")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+# 冷启动导入预算（毫秒，-X importtime报告的累计导入时间），超出视为启动性能回退
+STARTUP_BUDGETS = {
+    "main": 100,
+    "cli": 150,
+    "player": 120,
+    "recorder": 60,
+    "script_manager": 100,
+    "gui": 1000,  # 包括customtkinter
+}
+
+# 启动时不应导入的输入库，只在第一次播放、记录或绑定全局热键时加载
+DEFERRED_MODULES = ("pyautogui", "pynput", "keyboard", "pyscreeze", "pymsgbox")
+
+
+def measure_import(module, runs=3):
+    """在新进程中用-X importtime测量导入模块的耗时
+
+    Args:
+        module: 模块名
+        runs: 运行次数，取最小值
+
+    Returns:
+        tuple: (累计导入时间（秒）, 进程总耗时（秒）, 导入的所有模块名集合)，导入失败时抛出RuntimeError
+    """
+    best_import = best_total = None
+    imported = set()
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True)
+        total = time.perf_counter() - start
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        cumulative = None
+        for line in result.stderr.splitlines():
+            # 格式: "import time: 自身微秒 | 累计微秒 | 模块名"，子模块的名称前有缩进
+            if not line.startswith("import time:"):
+                continue
+            _, cumulative_us, name = line.split("|")
+            imported.add(name.strip())
+            if name == " " + module:
+                cumulative = int(cumulative_us) / 1e6
+        best_import = cumulative if best_import is None else min(best_import, cumulative)
+        best_total = total if best_total is None else min(best_total, total)
+    return best_import, best_total, imported
+
+
+def bench_startup(*modules):
+    """冷启动：各入口模块的导入耗时（新进程，-X importtime），检查预算和输入库是否被推迟加载"""
+    failed = []
+    for module in modules or STARTUP_BUDGETS:
+        try:
+            import_time, total, imported = measure_import(module)
+        except RuntimeError as e:
+            print(f"{module:<16} 跳过: {str(e)}")
+            continue
+        budget = STARTUP_BUDGETS.get(module)
+        eager = sorted(name for name in imported if name.split(".")[0] in DEFERRED_MODULES)
+        over = budget is not None and import_time * 1000 > budget
+        print(f"{module:<16} 导入 {import_time * 1000:7.1f}ms  进程 {total * 1000:7.1f}ms  "
+              f"预算 {budget if budget is not None else '-':>5}ms  导入模块 {len(imported)}"
+              + ("  超出预算" if over else "")
+              + (f"  启动时导入了: {', '.join(eager)}" if eager else ""))
+        if over or eager:
+            failed.append(module)
+    assert not failed, f"启动性能回退: {', '.join(failed)}"
+
+
+# 名称到基准函数的映射
+BENCHMARKS = {
+    "memory": bench_memory,
+    "parser": bench_parser,
+    "move_filter": bench_move_filter,
+    "backends": bench_backends,
+    "batching": bench_batching,
+    "dispatch": bench_dispatch,
+    "cache": bench_cache,
+    "incremental": bench_incremental,
+    "seek": bench_seek,
+    "speed": bench_speed,
+    "multi": bench_multi,
+    "async": bench_async,
+    "startup": bench_startup,
+    "tracing": bench_tracing,
+    "recorder": bench_recorder,
+    "timestamps": bench_timestamps,
+    "binary": bench_binary,
+    "keys": bench_keys,
+}
+
+
+def main(argv=None):
+    """运行指定的基准测试（默认全部）
+
+    名称后可以用冒号附加逗号分隔的参数，例如 backends:fake,pynput
+    """
+    names = (argv if argv is not None else sys.argv[1:]) or list(BENCHMARKS)
+    for item in names:
+        name, _, args = item.partition(":")
+        bench = BENCHMARKS.get(name)
+        if bench is None:
+            print(f"未知的基准测试: {name}（可用: {', '.join(BENCHMARKS)}）")
+            continue
+        print(f"== {item} ==")
+        start = time.perf_counter()
+        bench(*(args.split(",") if args else ()))
+        print(f"耗时 {time.perf_counter() - start:.2f}s\n")
+
+
+if __name__ == "__main__":
+    main()
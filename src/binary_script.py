@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按键精灵 - 二进制脚本格式(.ajsb)
+定长小端记录 + 文件头 + 键名字符串表，通过mmap按需解码，便于边读边播放
+
+文件布局:
+    文件头   magic(4s) 版本(H) 记录长度(H) 记录数(I) 键表偏移(Q)
+    记录区   记录数 × 定长记录: 时间(q) 操作码(B) 键表索引(H) x(i) y(i) dx(h) dy(h)
+    键表     键名数(I)，之后每项为 长度(H) + UTF-8字节
+
+版本2的时间为整数微秒(q)；版本1的时间为秒(d)，仍然可以读取
+"""
+
+import mmap
+import struct
+from action_buffer import (
+    ActionBuffer, NO_KEY, OP_KEY_PRESS, OP_KEY_RELEASE, OP_MOUSE_MOVE, OP_MOUSE_DOWN, OP_MOUSE_UP,
+    OP_MOUSE_SCROLL, US_PER_SECOND, to_us
+)
+
+MAGIC = b"AJSB"
+VERSION = 2
+
+HEADER = struct.Struct("<4sHHIQ")
+RECORD = struct.Struct("<qBHiihh")
+# 各版本的记录格式
+RECORDS = {
+    1: struct.Struct("<dBHiihh"),  # 时间为秒
+    2: RECORD,  # 时间为整数微秒
+}
+NO_KEY_ID = 0xFFFF  # 记录中表示没有键名的索引
+KEY_COUNT = struct.Struct("<I")
+KEY_LENGTH = struct.Struct("<H")
+
+# 记录中各字段能表示的范围
+INT16_MIN, INT16_MAX = -0x8000, 0x7FFF
+INT32_MIN, INT32_MAX = -0x80000000, 0x7FFFFFFF
+MAX_KEYS = NO_KEY_ID  # 键表索引0xFFFF保留给"没有键名"
+
+
+def _record_to_action(keys, time, op, key_id, x, y, dx, dy):
+    """将一条记录转换为操作字典（time为秒）"""
+    if op == OP_KEY_PRESS or op == OP_KEY_RELEASE:
+        return {
+            "type": "key_press" if op == OP_KEY_PRESS else "key_release",
+            "key": keys[key_id] if key_id != NO_KEY_ID else "",
+            "time": time
+        }
+    elif op == OP_MOUSE_MOVE:
+        return {"type": "mouse_move", "x": x, "y": y, "time": time}
+    elif op == OP_MOUSE_DOWN or op == OP_MOUSE_UP:
+        return {
+            "type": "mouse_click",
+            "button": keys[key_id] if key_id != NO_KEY_ID else "left",
+            "pressed": op == OP_MOUSE_DOWN,
+            "x": x,
+            "y": y,
+            "time": time
+        }
+    return {"type": "mouse_scroll", "x": x, "y": y, "dx": dx, "dy": dy, "time": time}
+
+
+def _check_range(name, column, low, high):
+    """检查一列数值都在记录字段能表示的范围内
+
+    Raises:
+        ValueError: 有超出范围的值
+    """
+    if column and (min(column) < low or max(column) > high):
+        raise ValueError(f"{name}超出二进制脚本能表示的范围({low}到{high})")
+
+
+def _check_writable(buffer):
+    """写入之前检查缓冲区能否用定长记录表示，避免写到一半才失败留下不完整的文件
+
+    Raises:
+        ValueError: 坐标、滚动量、键表大小或键名长度超出记录字段的范围
+    """
+    _check_range("x坐标", buffer.xs, INT32_MIN, INT32_MAX)
+    _check_range("y坐标", buffer.ys, INT32_MIN, INT32_MAX)
+    _check_range("水平滚动量", buffer.dxs, INT16_MIN, INT16_MAX)
+    _check_range("垂直滚动量", buffer.dys, INT16_MIN, INT16_MAX)
+    if len(buffer.keys) > MAX_KEYS:
+        raise ValueError(f"不同的键名超过{MAX_KEYS}个，无法保存为二进制脚本")
+    for name in buffer.keys:
+        if len(name.encode("utf-8")) > 0xFFFF:
+            raise ValueError(f"键名过长，无法保存为二进制脚本: {name[:20]}...")
+
+
+def write_binary(file_path, actions):
+    """将操作序列写入二进制脚本文件
+
+    Args:
+        file_path: 文件路径
+        actions: ActionBuffer或操作字典序列
+
+    Raises:
+        ValueError: 操作中的数值超出二进制记录字段的范围
+    """
+    buffer = actions if isinstance(actions, ActionBuffer) else ActionBuffer(actions)
+    _check_writable(buffer)
+    count = len(buffer)
+    key_table_offset = HEADER.size + count * RECORD.size
+
+    with open(file_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, count, key_table_offset))
+
+        pack = RECORD.pack
+        ops, times, key_ids = buffer.ops, buffer.times, buffer.key_ids
+        xs, ys, dxs, dys = buffer.xs, buffer.ys, buffer.dxs, buffer.dys
+        f.write(b"".join(
+            pack(times[i], ops[i], key_ids[i] if key_ids[i] != NO_KEY else NO_KEY_ID,
+                 xs[i], ys[i], dxs[i], dys[i])
+            for i in range(count)
+        ))
+
+        f.write(KEY_COUNT.pack(len(buffer.keys)))
+        for name in buffer.keys:
+            data = name.encode("utf-8")
+            f.write(KEY_LENGTH.pack(len(data)))
+            f.write(data)
+
+
+class BinaryScriptReader:
+    """通过mmap读取二进制脚本，记录在迭代时才被解码
+
+    可重复迭代，每次迭代都从头开始，因此可以直接交给Player重复播放。
+    """
+
+    def __init__(self, file_path):
+        """打开二进制脚本文件
+
+        Args:
+            file_path: 文件路径
+
+        Raises:
+            ValueError: 文件不是有效的二进制脚本
+        """
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError("二进制脚本文件为空")
+
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_header(self):
+        """解析文件头和键表"""
+        if len(self._mmap) < HEADER.size:
+            raise ValueError("二进制脚本文件头不完整")
+
+        magic, version, record_size, count, key_table_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError("不是有效的按键精灵二进制脚本")
+        record = RECORDS.get(version)
+        if record is None or record_size != record.size:
+            raise ValueError(f"不支持的二进制脚本版本: {version}")
+        if key_table_offset != HEADER.size + count * record_size:
+            raise ValueError("二进制脚本记录区长度不正确")
+
+        self.version = version
+        self.count = count
+        self._record = record
+        self._time_scale = US_PER_SECOND if version >= 2 else 1  # 记录中的时间除以该值得到秒
+
+        # 键表很小，打开时一次性读取
+        self.keys = []
+        size = len(self._mmap)
+        if key_table_offset > size:
+            raise ValueError(f"二进制脚本不完整：记录区被截断（应有{count}条记录）")
+        offset = key_table_offset
+        if offset + KEY_COUNT.size > size:
+            raise ValueError("二进制脚本不完整：缺少键表")
+        (key_count,) = KEY_COUNT.unpack_from(self._mmap, offset)
+        offset += KEY_COUNT.size
+        if key_count > MAX_KEYS:
+            raise ValueError(f"二进制脚本键表无效：键名数 {key_count}")
+        for i in range(key_count):
+            if offset + KEY_LENGTH.size > size:
+                raise ValueError(f"二进制脚本键表不完整：缺少第{i + 1}个键名")
+            (length,) = KEY_LENGTH.unpack_from(self._mmap, offset)
+            offset += KEY_LENGTH.size
+            if offset + length > size:
+                raise ValueError(f"二进制脚本键表不完整：第{i + 1}个键名被截断")
+            try:
+                self.keys.append(bytes(self._mmap[offset:offset + length]).decode("utf-8"))
+            except UnicodeDecodeError:
+                raise ValueError(f"二进制脚本键表无效：第{i + 1}个键名不是UTF-8")
+            offset += length
+
+    def close(self):
+        """关闭文件"""
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("BinaryScriptReader index out of range")
+        offset = HEADER.size + index * self._record.size
+        time, op, key_id, x, y, dx, dy = self._record.unpack_from(self._mmap, offset)
+        self._check_record(index, op, key_id)
+        return _record_to_action(self.keys, time / self._time_scale, op, key_id, x, y, dx, dy)
+
+    def __iter__(self):
+        keys = self.keys
+        scale = self._time_scale
+        for time, op, key_id, x, y, dx, dy in self._iter_records():
+            yield _record_to_action(keys, time / scale, op, key_id, x, y, dx, dy)
+
+    def _iter_records(self):
+        """逐条解码记录，操作码或键表索引无效时抛出ValueError"""
+        record = self._record
+        unpack_from = record.unpack_from
+        mm = self._mmap
+        key_count = len(self.keys)
+        offset = HEADER.size
+        for index in range(self.count):
+            fields = unpack_from(mm, offset)
+            op = fields[1]
+            key_id = fields[2]
+            if op > OP_MOUSE_SCROLL or (key_id >= key_count and key_id != NO_KEY_ID):
+                self._check_record(index, op, key_id)
+            yield fields
+            offset += record.size
+
+    def _check_record(self, index, op, key_id):
+        """检查一条记录的操作码和键表索引
+
+        Raises:
+            ValueError: 记录无效（文件已损坏）
+        """
+        if op > OP_MOUSE_SCROLL:
+            raise ValueError(f"二进制脚本第{index + 1}条记录无效：未知的操作码 {op}")
+        if key_id >= len(self.keys) and key_id != NO_KEY_ID:
+            raise ValueError(f"二进制脚本第{index + 1}条记录无效：键表索引 {key_id} 超出键表（{len(self.keys)}项）")
+
+    def to_buffer(self):
+        """一次性解码全部记录为ActionBuffer
+
+        Returns:
+            ActionBuffer: 操作缓冲区
+        """
+        buffer = ActionBuffer()
+        for name in self.keys:
+            buffer.intern_key(name)
+        version = self.version
+        for time, op, key_id, x, y, dx, dy in self._iter_records():
+            if version < 2:
+                time = to_us(time)
+            buffer.append_row(op, time, key_id if key_id != NO_KEY_ID else NO_KEY, x, y, dx, dy)
+        return buffer
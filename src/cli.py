@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按键精灵 - 命令行工具
+不启动图形界面、不导入Tk，适合批量播放和转换脚本，用法（在src目录下）:
+    python -m cli play 脚本.ajs [脚本2.ajs ...] [--repeat N] [--speed X] [--start 秒] [--end 秒] [--trace 追踪.json]
+    python -m cli convert 输入.ajs 输出.ajsb
+    python -m cli optimize 输入.ajs [-o 输出.ajs] [--max-idle 秒]
+    python -m cli stats 脚本.ajs [...]
+    python -m cli bench [名称 ...]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from collections import Counter
+from config_manager import ConfigManager
+from script_manager import ScriptManager
+from action_buffer import ActionBuffer, OP_TYPES, OP_MOUSE_DOWN
+
+
+def _load(manager, path):
+    """加载脚本并报告解析错误
+
+    Args:
+        manager: ScriptManager
+        path: 脚本路径
+
+    Returns:
+        ActionBuffer: 操作缓冲区
+    """
+    buffer = manager.load_actions(path)
+    _report_errors(path, manager.last_errors)
+    return buffer
+
+
+def _report_errors(path, errors):
+    """报告解析时忽略的行"""
+    if errors:
+        print(f"{path}: 已忽略{len(errors)}行无法解析的内容 (第{errors[0].line_no}行: {errors[0].message})")
+
+
+def _has_actions(stream):
+    """只解析脚本开头，检查是否至少有一个操作"""
+    actions = iter(stream)
+    try:
+        return next(actions, None) is not None
+    finally:
+        actions.close()
+
+
+def _save(manager, path, buffer):
+    """按扩展名保存为文本或二进制脚本"""
+    if manager.is_binary_script(path):
+        manager.save_binary(path, buffer)
+    else:
+        manager.save_actions(path, buffer)
+
+
+def cmd_play(args, config_manager):
+    """依次播放一个或多个脚本"""
+    from player import Player
+    from input_backend import create_backend
+
+    low_latency = args.low_latency or bool(config_manager.get_playback_setting("low_latency"))
+    backend = None
+    if args.backend:
+        backend = create_backend(args.backend, low_latency=low_latency)
+    player = Player(config_manager, backend)
+    player.low_latency = low_latency
+    if args.trace:
+        from tracing import Tracer
+        player.tracer = Tracer()
+    try:
+        return _play_scripts(args, player)
+    finally:
+        if player.tracer is not None:
+            player.tracer.save_chrome_trace(args.trace)
+            print(player.tracer.format_summary())
+            print(f"追踪已保存: {args.trace}")
+
+
+def _play_scripts(args, player):
+    """依次播放各个脚本，返回退出码
+    
+    脚本边读边播放，不预先载入和编译整个文件，内存占用与脚本长度无关
+    """
+    manager = ScriptManager()
+    for path in args.scripts:
+        script = manager.open_stream(path)
+        if not _has_actions(script):
+            print(f"{path}: 没有可播放的操作")
+            continue
+        print(f"播放 {path}")
+
+        # 在后台线程中播放，主线程等待并响应Ctrl+C；播放线程中的异常交给主线程报告
+        failure = []
+
+        def run():
+            try:
+                player.play(script, args.repeat, args.interval, start_delay=args.delay,
+                            start=args.start, end=args.end, speed=args.speed)
+            except Exception as e:
+                failure.append(e)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            while thread.is_alive():
+                thread.join(0.1)
+        except KeyboardInterrupt:
+            player.stop_playing()
+            thread.join()
+            print("播放已停止")
+            return 1
+        if failure:
+            print(f"错误: {path}: 播放失败: {str(failure[0])}")
+            return 1
+        _report_errors(path, script.report.errors)
+        if not script.report.monotonic:
+            print(f"{path}: 脚本中的操作未按时间排序，已按文件中的顺序播放（在界面中打开并保存即可排序）")
+        if player.failsafe_triggered:
+            print("鼠标位于屏幕左上角，播放已安全停止")
+            return 1
+        args.delay = 0  # 连续播放多个脚本时只在第一个之前等待
+    return 0
+
+
+def cmd_convert(args, config_manager):
+    """在文本脚本和二进制脚本之间转换（按扩展名判断格式）"""
+    manager = ScriptManager()
+    start = time.perf_counter()
+    buffer = _load(manager, args.input)
+    _save(manager, args.output, buffer)
+    print(f"{args.input} -> {args.output}: {len(buffer)} 个操作, 耗时 {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def cmd_optimize(args, config_manager):
+    """离线优化脚本并保存"""
+    from script_optimizer import ScriptOptimizer
+
+    manager = ScriptManager()
+    buffer = _load(manager, args.input)
+    optimizer = ScriptOptimizer(scroll_merge_gap=args.scroll_merge_gap, max_idle=args.max_idle)
+    optimized = ActionBuffer(optimizer.optimize(buffer.to_dicts()))
+    output = args.output
+    if not output:
+        name, ext = os.path.splitext(args.input)
+        output = f"{name}_optimized{ext}"
+    _save(manager, output, optimized)
+    print(f"已保存: {output}")
+    return 0
+
+
+def cmd_stats(args, config_manager):
+    """输出脚本的操作统计"""
+    manager = ScriptManager()
+    for path in args.scripts:
+        buffer = _load(manager, path)
+        counts = Counter(buffer.ops)
+        duration = buffer.duration()
+        print(f"{path}: {len(buffer)} 个操作, 时长 {duration:.3f}s, 文件 {os.path.getsize(path) / 1024:.1f}KB, "
+              f"内存 {buffer.nbytes() / 1024:.1f}KB")
+        for op, count in sorted(counts.items()):
+            name = OP_TYPES[op]
+            if name == "mouse_click":
+                name += " (按下)" if op == OP_MOUSE_DOWN else " (释放)"
+            print(f"  {name:<22} {count}")
+        if buffer.keys:
+            print(f"  按键/按钮: {', '.join(buffer.keys)}")
+    return 0
+
+
+def cmd_bench(args, config_manager):
+    """运行性能基准测试"""
+    import benchmarks
+    benchmarks.main(args.names)
+    return 0
+
+
+def build_parser():
+    """构建命令行参数解析器
+
+    Returns:
+        argparse.ArgumentParser: 解析器
+    """
+    parser = argparse.ArgumentParser(prog="python -m cli", description="按键精灵命令行工具（不启动图形界面）")
+    parser.add_argument("--config", default="config.json", help="配置文件路径（默认 config.json）")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    play = commands.add_parser("play", help="依次播放一个或多个脚本")
+    play.add_argument("scripts", nargs="+", help="脚本文件（.ajs / .ajsb）")
+    play.add_argument("--repeat", type=int, default=1, help="每个脚本的重复次数")
+    play.add_argument("--interval", type=float, default=0.1, help="重复之间的间隔（秒）")
+    play.add_argument("--speed", type=float, default=None, help="播放倍速（0.1到50，默认使用配置）")
+    play.add_argument("--start", type=float, default=None, help="从该时间开始播放（脚本时间，秒）")
+    play.add_argument("--end", type=float, default=None, help="播放到该时间为止（脚本时间，秒）")
+    play.add_argument("--delay", type=float, default=1.0, help="开始播放前的等待时间（秒）")
+    play.add_argument("--backend", default=None, help="输入后端（pyautogui / pynput / sendinput / fake，默认使用配置）")
+    play.add_argument("--low-latency", action="store_true", help="启用低延迟模式")
+    play.add_argument("--trace", default=None, metavar="文件",
+                      help="记录每组操作的截止时间和执行耗时，导出为Chrome追踪JSON（chrome://tracing 或 Perfetto 打开）")
+    play.set_defaults(func=cmd_play)
+
+    convert = commands.add_parser("convert", help="在文本脚本和二进制脚本之间转换")
+    convert.add_argument("input", help="输入文件")
+    convert.add_argument("output", help="输出文件（.ajsb 为二进制，其他为文本）")
+    convert.set_defaults(func=cmd_convert)
+
+    optimize = commands.add_parser("optimize", help="离线优化脚本")
+    optimize.add_argument("input", help="输入文件")
+    optimize.add_argument("-o", "--output", default=None, help="输出文件（默认在文件名后加 _optimized）")
+    optimize.add_argument("--max-idle", type=float, default=None, help="压缩超过该值的空闲时间（秒）")
+    optimize.add_argument("--scroll-merge-gap", type=float, default=0.1, help="合并连续滚动的最大间隔（秒）")
+    optimize.set_defaults(func=cmd_optimize)
+
+    stats = commands.add_parser("stats", help="输出脚本的操作统计")
+    stats.add_argument("scripts", nargs="+", help="脚本文件")
+    stats.set_defaults(func=cmd_stats)
+
+    bench = commands.add_parser("bench", help="运行性能基准测试（见 benchmarks.py）")
+    bench.add_argument("names", nargs="*", help="基准名称，可附加参数，如 backends:fake")
+    bench.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    """命令行入口
+
+    Args:
+        argv: 参数列表，None表示使用sys.argv
+
+    Returns:
+        int: 退出码
+    """
+    args = build_parser().parse_args(argv)
+    config_manager = ConfigManager(args.config)
+    try:
+        return args.func(args, config_manager)
+    except (OSError, ValueError) as e:
+        print(f"错误: {str(e)}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
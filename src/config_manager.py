@@ -20,7 +20,33 @@ DEFAULT_CONFIG = {
         "save_as_script": "Control-Shift-s",
         "stop_all": "Escape"
     },
-    "global_hotkeys": True  # 是否启用全局热键
+    "global_hotkeys": True,  # 是否启用全局热键
+    "playback": {
+        "lateness_policy": "catch_up",  # 迟到处理策略: catch_up / skip / stretch
+        "spin_threshold": 0.002,  # 截止时间前改为忙等待的时间（秒）
+        "skip_threshold": 0.05,  # skip策略下允许的最大迟到时间（秒）
+        "backend": "pyautogui",  # 输入后端: pyautogui / pynput / sendinput / fake
+        "low_latency": False,  # 低延迟模式：不暂停、本地维护光标位置、直接发送相对移动
+        "failsafe_interval": 0.05,  # 低延迟模式下检查屏幕左上角安全停止的间隔（秒）
+        "batch_window": 0.001,  # 低延迟模式下截止时间相差不超过该值的操作合并为一次注入（秒），null表示不合并
+        "speed": 1.0,  # 播放倍速（0.1到50）
+        "max_gap": None  # 按倍速换算后两个操作之间的最大等待时间（秒），null表示不限制
+    },
+    "recording": {
+        "move_filter": True,  # 是否在记录时精简鼠标移动
+        "min_move_distance": 2,  # 与上一个保留点的最小距离（像素）
+        "min_move_interval": 0.0,  # 与上一个保留点的最小时间间隔（秒）
+        "rdp_epsilon": 1.0,  # 轨迹简化允许的最大偏离（像素）
+        "rdp_window": 32,  # 轨迹简化的滑动窗口点数
+        "idle_time": 0.2,  # 超过该时间没有移动视为停顿（秒）
+        "event_buffer_size": 65536  # 系统钩子与处理线程之间的事件队列容量，队列满时新事件被丢弃并计数
+    },
+    "cache": {
+        "max_memory_mb": 256,  # 解析结果内存缓存的最大容量（MB）
+        "disk_cache": False,  # 是否把解析结果持久化到磁盘缓存目录
+        "cache_dir": "",  # 磁盘缓存目录，留空时使用用户目录下的 .anjian_cache
+        "max_disk_mb": 1024  # 磁盘缓存目录的最大容量（MB）
+    }
 }
 
 class ConfigManager:
@@ -81,6 +107,39 @@ class ConfigManager:
         """
         return self.config["hotkeys"].get(action, DEFAULT_CONFIG["hotkeys"].get(action, ""))
         
+    def get_playback_setting(self, name):
+        """获取播放设置
+
+        Args:
+            name: 设置名称
+
+        Returns:
+            设置值
+        """
+        return self.config.get("playback", {}).get(name, DEFAULT_CONFIG["playback"].get(name))
+        
+    def get_recording_setting(self, name):
+        """获取记录设置
+
+        Args:
+            name: 设置名称
+
+        Returns:
+            设置值
+        """
+        return self.config.get("recording", {}).get(name, DEFAULT_CONFIG["recording"].get(name))
+        
+    def get_cache_setting(self, name):
+        """获取脚本缓存设置
+
+        Args:
+            name: 设置名称
+
+        Returns:
+            设置值
+        """
+        return self.config.get("cache", {}).get(name, DEFAULT_CONFIG["cache"].get(name))
+        
     def set_hotkey(self, action, hotkey):
         """设置指定操作的快捷键
         
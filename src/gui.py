@@ -8,15 +8,23 @@
 
 import os
 import time
+import queue
 import threading
 import tkinter as tk
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
-import keyboard  # 导入keyboard库用于全局热键
 from recorder import Recorder
 from player import Player
-from script_manager import ScriptManager
+from script_manager import ScriptManager, remap_extra_lines
 from config_manager import ConfigManager, DEFAULT_CONFIG
+from scheduler import MIN_SPEED, MAX_SPEED, clamp_speed
+from action_buffer import ActionBuffer
+from script_optimizer import ScriptOptimizer
+from script_view import ScriptView
+from script_cache import ScriptCache
+
+# 记录时刷新编辑区的间隔（毫秒）
+RECORD_TICK_MS = 50
 
 class AnJianApp(ctk.CTk):
     """按键精灵主应用程序类"""
@@ -32,16 +40,31 @@ class AnJianApp(ctk.CTk):
         # 创建组件
         self.recorder = Recorder(config_manager)
         self.player = Player(config_manager)
-        self.script_manager = ScriptManager()
         self.config_manager = config_manager or ConfigManager()
+        self.script_manager = ScriptManager(self.create_script_cache())
         
         # 状态变量
         self.is_recording = False
         self.is_playing = False
-        self.current_script = []
+        self.current_script = ActionBuffer()
         self.current_file = None
+        self.current_extra_lines = []  # 打开的脚本中的注释和无法解析的行，保存时写回
+        self.extra_lines_generation = None  # 按缓冲区的编辑记录更新上述行的位置
+        self.extra_lines_edit_pos = 0
+        self.stream_source = None  # 已按时间排序的脚本文件: (路径, 修改时间)，未修改时直接从文件流式播放
+        self.streaming_file = None  # 正在流式播放的文件，播放期间不能覆盖
         self.play_thread = None
         
+        # 记录器线程与界面之间的队列，由界面定时批量取出
+        self.record_queue = queue.SimpleQueue()
+        self.record_tick_id = None
+        self.record_stats = {}
+        
+        # 全局热键使用的keyboard库在第一次需要时于后台线程中加载，不推迟窗口显示
+        # None表示尚未加载，False表示加载失败
+        self.keyboard = None
+        self.keyboard_loading = False
+        
         # 创建界面
         self.create_ui()
         
@@ -51,6 +74,22 @@ class AnJianApp(ctk.CTk):
         # 当前正在录制的热键
         self.current_hotkey_action = None
         
+    def create_script_cache(self):
+        """根据配置创建脚本解析结果缓存
+        
+        Returns:
+            ScriptCache: 脚本缓存
+        """
+        get = self.config_manager.get_cache_setting
+        cache_dir = None
+        if get("disk_cache"):
+            cache_dir = get("cache_dir") or os.path.join(os.path.expanduser("~"), ".anjian_cache")
+        return ScriptCache(
+            max_bytes=int(get("max_memory_mb") * 1024 * 1024),
+            cache_dir=cache_dir,
+            max_disk_bytes=int(get("max_disk_mb") * 1024 * 1024)
+        )
+        
     def create_ui(self):
         """创建用户界面"""
         # 创建主框架
@@ -96,6 +135,16 @@ class AnJianApp(ctk.CTk):
         btn_play.pack(padx=10, pady=5)
         self.btn_play = btn_play
         
+        btn_play_cursor = ctk.CTkButton(
+            left_panel, 
+            text="从选中行播放", 
+            command=lambda: self.toggle_playing(from_cursor=True),
+            fg_color="#2ECC71",
+            hover_color="#27AE60",
+            width=180
+        )
+        btn_play_cursor.pack(padx=10, pady=5)
+        
         # 分隔线
         separator1 = ctk.CTkFrame(left_panel, height=1, fg_color="gray70")
         separator1.pack(fill="x", padx=15, pady=10)
@@ -137,6 +186,14 @@ class AnJianApp(ctk.CTk):
         )
         btn_save_as.pack(padx=10, pady=5)
         
+        btn_optimize = ctk.CTkButton(
+            left_panel, 
+            text="优化脚本", 
+            command=self.optimize_script,
+            width=180
+        )
+        btn_optimize.pack(padx=10, pady=5)
+        
         # 分隔线
         separator2 = ctk.CTkFrame(left_panel, height=1, fg_color="gray70")
         separator2.pack(fill="x", padx=15, pady=10)
@@ -161,6 +218,29 @@ class AnJianApp(ctk.CTk):
         interval_entry = ctk.CTkEntry(settings_frame, width=50, textvariable=self.interval_var)
         interval_entry.grid(row=1, column=1, padx=5, pady=2)
         
+        # 倍速设置
+        speed_label = ctk.CTkLabel(settings_frame, text="倍速:")
+        speed_label.grid(row=2, column=0, padx=5, pady=2, sticky="w")
+        
+        self.speed_var = tk.StringVar(value=f"{clamp_speed(self.config_manager.get_playback_setting('speed')):g}")
+        speed_entry = ctk.CTkEntry(settings_frame, width=50, textvariable=self.speed_var)
+        speed_entry.grid(row=2, column=1, padx=5, pady=2)
+        
+        # 播放范围设置（脚本时间，留空表示从头开始/播放到结尾）
+        start_label = ctk.CTkLabel(settings_frame, text="开始(秒):")
+        start_label.grid(row=3, column=0, padx=5, pady=2, sticky="w")
+        
+        self.start_var = tk.StringVar(value="")
+        start_entry = ctk.CTkEntry(settings_frame, width=50, textvariable=self.start_var)
+        start_entry.grid(row=3, column=1, padx=5, pady=2)
+        
+        end_label = ctk.CTkLabel(settings_frame, text="结束(秒):")
+        end_label.grid(row=4, column=0, padx=5, pady=2, sticky="w")
+        
+        self.end_var = tk.StringVar(value="")
+        end_entry = ctk.CTkEntry(settings_frame, width=50, textvariable=self.end_var)
+        end_entry.grid(row=4, column=1, padx=5, pady=2)
+        
         # 分隔线
         separator3 = ctk.CTkFrame(left_panel, height=1, fg_color="gray70")
         separator3.pack(fill="x", padx=15, pady=10)
@@ -180,18 +260,27 @@ class AnJianApp(ctk.CTk):
         right_panel.grid_columnconfigure(0, weight=1)
         right_panel.grid_rowconfigure(0, weight=1)
         
-        # 脚本编辑区标题
-        script_title = ctk.CTkLabel(right_panel, text="脚本编辑区", font=("Arial", 14))
-        script_title.pack(pady=(10, 5), anchor="w")
+        # 脚本编辑区标题和跳转到时间
+        title_frame = ctk.CTkFrame(right_panel, fg_color="transparent")
+        title_frame.pack(fill="x", padx=10, pady=(10, 5))
+        
+        script_title = ctk.CTkLabel(title_frame, text="脚本编辑区", font=("Arial", 14))
+        script_title.pack(side="left")
         
-        # 脚本编辑框
-        script_frame = ctk.CTkFrame(right_panel)
-        script_frame.pack(fill="both", expand=True, padx=10, pady=10)
-        script_frame.grid_columnconfigure(0, weight=1)
-        script_frame.grid_rowconfigure(0, weight=1)
+        btn_jump = ctk.CTkButton(title_frame, text="跳转", width=50, command=self.jump_to_time)
+        btn_jump.pack(side="right", padx=(5, 0))
         
-        self.script_text = ctk.CTkTextbox(script_frame, wrap="none", font=("Consolas", 12))
-        self.script_text.grid(row=0, column=0, padx=5, pady=5, sticky="nsew")
+        self.jump_var = tk.StringVar()
+        jump_entry = ctk.CTkEntry(title_frame, width=80, textvariable=self.jump_var,
+                                  placeholder_text="时间(秒)")
+        jump_entry.pack(side="right")
+        jump_entry.bind("<Return>", lambda e: self.jump_to_time())
+        
+        # 脚本编辑框：只绘制可见行，双击编辑单行
+        self.script_view = ScriptView(right_panel, self.script_manager, font=("Consolas", 12))
+        self.script_view.pack(fill="both", expand=True, padx=10, pady=10)
+        self.script_view.set_buffer(self.current_script)
+        self.script_view.on_change = self.sync_extra_lines
         
         # 状态栏
         self.status_var = tk.StringVar(value="就绪")
@@ -216,12 +305,23 @@ class AnJianApp(ctk.CTk):
         use_global_hotkeys = self.config_manager.is_global_hotkeys_enabled()
         
         # 解除所有已注册的全局热键
-        try:
-            keyboard.unhook_all()
-        except:
-            pass
+        if self.keyboard:
+            try:
+                self.keyboard.unhook_all()
+            except:
+                pass
+        
+        if use_global_hotkeys and self.keyboard is None:
+            # keyboard库加载完成后会再次调用bind_hotkeys
+            self.load_keyboard()
+            return
+        
+        if use_global_hotkeys and self.keyboard is False:
+            # keyboard库加载失败，回退到应用内热键
+            use_global_hotkeys = False
         
         if use_global_hotkeys:
+            keyboard = self.keyboard
             # 注册全局热键
             try:
                 # 将Tkinter热键格式转换为keyboard库格式
@@ -258,6 +358,32 @@ class AnJianApp(ctk.CTk):
             self.bind(f"<{hotkeys.get('save_as_script', 'Control-Shift-s')}>", lambda e: self.save_script_as())
             self.bind(f"<{hotkeys.get('stop_all', 'Escape')}>", lambda e: self.stop_all())
         
+    def load_keyboard(self):
+        """在后台线程中加载keyboard库，完成后在界面线程中绑定全局热键"""
+        if self.keyboard_loading:
+            return
+        self.keyboard_loading = True
+        self.status_var.set("正在加载全局热键...")
+        
+        def load():
+            error = None
+            try:
+                import keyboard
+            except Exception as e:
+                keyboard = False
+                error = str(e)
+            
+            def loaded():
+                self.keyboard = keyboard
+                self.keyboard_loading = False
+                if error:
+                    messagebox.showerror("错误", f"加载全局热键失败，已改用应用内热键: {error}")
+                self.bind_hotkeys()
+            
+            self.after(0, loaded)
+        
+        threading.Thread(target=load, daemon=True).start()
+        
     def stop_all(self):
         """停止所有操作"""
         if self.is_recording:
@@ -279,11 +405,16 @@ class AnJianApp(ctk.CTk):
             self.status_var.set("正在记录...")
             
             # 清空当前脚本
-            self.current_script = []
-            self.script_text.delete("1.0", "end")
+            self.current_script = ActionBuffer()
+            self.set_extra_lines([])
+            self.stream_source = None
+            self.script_view.set_buffer(self.current_script)
+            self.record_queue = queue.SimpleQueue()
+            self.record_stats = {"consumed": 0, "max_batch": 0}
             
             # 启动记录器
             self.recorder.start_recording(callback=self.on_action_recorded)
+            self.record_tick_id = self.after(RECORD_TICK_MS, self.drain_record_queue)
         else:
             # 停止记录
             self.is_recording = False
@@ -293,28 +424,46 @@ class AnJianApp(ctk.CTk):
             # 停止记录器
             self.recorder.stop_recording()
             
-    def toggle_playing(self):
-        """切换播放状态"""
+            # 取出剩余的操作
+            if self.record_tick_id is not None:
+                self.after_cancel(self.record_tick_id)
+                self.record_tick_id = None
+            self.drain_record_queue()
+            self.script_view.modified = bool(self.current_script)
+            
+            # 界面队列不限长度且在停止后取空，只有记录器的事件队列溢出时才会丢失事件：
+            # 处理线程跟不上系统钩子，队列已满时新事件被丢弃
+            event_stats = self.recorder.event_stats
+            lost = event_stats["overflow"] if event_stats else 0
+            status = f"记录已停止 (共 {self.record_stats['consumed']} 个操作, 事件队列溢出丢失 {lost}"
+            
+            # 显示鼠标移动过滤的精简情况
+            move_stats = self.recorder.move_filter_stats
+            if move_stats and move_stats["received"]:
+                status += (f", 鼠标移动 {move_stats['received']} → {move_stats['emitted']}")
+            
+            # 按住不放时被过滤的自动重复按键
+            key_stats = self.recorder.key_stats
+            if key_stats and key_stats["repeats"]:
+                status += f", 过滤自动重复按键 {key_stats['repeats']}"
+            self.status_var.set(status + ")")
+            
+    def toggle_playing(self, from_cursor=False):
+        """切换播放状态
+        
+        Args:
+            from_cursor: 是否从编辑区选中的行开始播放
+        """
         if self.is_recording:
             messagebox.showwarning("警告", "请先停止记录")
             return
             
         if not self.is_playing:
-            # 获取脚本内容
-            script_text = self.script_text.get("1.0", "end").strip()
-            if not script_text:
+            # 编辑区直接显示已解析的操作缓冲区，播放时无需再读取和解析文本
+            if not self.current_script:
                 messagebox.showwarning("警告", "没有可播放的脚本")
                 return
                 
-            # 解析脚本
-            try:
-                script = self.script_manager.parse_script(script_text)
-                if not script:
-                    raise ValueError("脚本解析失败")
-            except Exception as e:
-                messagebox.showerror("错误", f"脚本格式错误: {str(e)}")
-                return
-                
             # 获取重复次数和间隔
             try:
                 repeat = int(self.repeat_var.get())
@@ -327,16 +476,55 @@ class AnJianApp(ctk.CTk):
                 messagebox.showerror("错误", "请输入有效的执行次数和间隔")
                 return
                 
+            try:
+                speed = float(self.speed_var.get())
+            except ValueError:
+                messagebox.showerror("错误", "请输入有效的倍速")
+                return
+            if not MIN_SPEED <= speed <= MAX_SPEED:
+                messagebox.showerror("错误", f"倍速应在{MIN_SPEED:g}到{MAX_SPEED:g}之间")
+                return
+                
+            # 播放范围：选中行的时间优先于输入的开始时间
+            try:
+                start = float(self.start_var.get()) if self.start_var.get().strip() else None
+                end = float(self.end_var.get()) if self.end_var.get().strip() else None
+            except ValueError:
+                messagebox.showerror("错误", "请输入有效的开始和结束时间")
+                return
+            if from_cursor:
+                if self.script_view.selected is None:
+                    messagebox.showwarning("警告", "请先在脚本编辑区选中一行")
+                    return
+                start = self.current_script.time_at(self.script_view.selected)
+                
+            # 未修改的脚本直接从文件流式播放，不需要编译整个脚本；
+            # 编辑过的脚本只重新编译上次播放之后被编辑的行，编译结果是独立的步骤列表，
+            # 播放期间继续编辑不会影响正在播放的脚本
+            if self.player.config_manager is None:
+                self.player.config_manager = self.config_manager
+            script = self.open_play_stream()
+            self.streaming_file = script.file_path if script is not None else None
+            if script is None:
+                try:
+                    script = self.player.compile_buffer(self.current_script)
+                except Exception as e:
+                    messagebox.showerror("播放错误", str(e))
+                    return
+                
             # 开始播放
             self.is_playing = True
             play_hotkey = self.config_manager.get_hotkey("play_toggle")
             self.btn_play.configure(text=f"停止播放 [{play_hotkey}]")
-            self.status_var.set(f"正在播放... (重复: {repeat}, 间隔: {interval}秒)")
+            status = f"正在播放... (重复: {repeat}, 间隔: {interval}秒, 倍速: {speed:g}x"
+            if start is not None or end is not None:
+                status += f", 范围: {start if start is not None else '开头'} - {end if end is not None else '结尾'}"
+            self.status_var.set(status + ")")
             
             # 在新线程中播放，避免阻塞UI
             self.play_thread = threading.Thread(
                 target=self.play_script,
-                args=(script, repeat, interval),
+                args=(script, repeat, interval, start, end, speed),
                 daemon=True
             )
             self.play_thread.start()
@@ -350,7 +538,23 @@ class AnJianApp(ctk.CTk):
             # 停止播放器
             self.player.stop_playing()
             
-    def play_script(self, script, repeat, interval):
+    def open_play_stream(self):
+        """脚本未修改且文件未被改动时，打开文件作为流式脚本源
+        
+        Returns:
+            ScriptStream: 流式脚本源，需要播放缓冲区时返回None
+        """
+        if self.stream_source is None or self.script_view.modified:
+            return None
+        file_path, mtime = self.stream_source
+        try:
+            if os.path.getmtime(file_path) != mtime:
+                return None
+        except OSError:
+            return None
+        return self.script_manager.open_stream(file_path)
+        
+    def play_script(self, script, repeat, interval, start=None, end=None, speed=None):
         """播放脚本"""
         try:
             # 传递配置管理器给播放器，并启用录制停止快捷键
@@ -358,7 +562,8 @@ class AnJianApp(ctk.CTk):
                 self.player.config_manager = self.config_manager
             
             # 播放脚本，并在最后录制停止快捷键
-            self.player.play(script, repeat, interval, record_stop_key=True)
+            self.player.play(script, repeat, interval, record_stop_key=True,
+                             start=start, end=end, speed=speed)
         except Exception as e:
             # 在UI线程中显示错误
             self.after(0, lambda: messagebox.showerror("播放错误", str(e)))
@@ -371,20 +576,52 @@ class AnJianApp(ctk.CTk):
         self.is_playing = False
         play_hotkey = self.config_manager.get_hotkey("play_toggle")
         self.btn_play.configure(text=f"开始播放 [{play_hotkey}]")
-        self.status_var.set("播放完成")
+        stats = self.player.last_stats
+        if self.player.failsafe_triggered:
+            self.status_var.set("鼠标移到了屏幕左上角，播放已安全停止")
+        elif stats and stats["count"]:
+            status = (f"播放完成 (抖动 p50 {stats['p50'] * 1000:.1f}ms, "
+                      f"p99 {stats['p99'] * 1000:.1f}ms, 最大 {stats['max'] * 1000:.1f}ms")
+            if self.player.last_rate:
+                status += f", 实际倍速 {self.player.last_rate:.2f}x"
+            batch_stats = self.player.last_batch_stats
+            if self.player.low_latency and batch_stats and batch_stats["batches"]:
+                status += (f", {batch_stats['actions']} 个操作分 {batch_stats['batches']} 批注入, "
+                           f"注入耗时 p99 {batch_stats['p99'] * 1e6:.0f}us")
+            self.status_var.set(status + ")")
+        else:
+            self.status_var.set("播放完成")
         
         # 播放结束后重新绑定热键，确保全局热键在游戏中仍然有效
         self.after(500, self.bind_hotkeys)  # 延迟500毫秒后重新绑定
             
     def on_action_recorded(self, action):
-        """记录动作的回调"""
-        # 添加到当前脚本
-        self.current_script.append(action)
+        """记录动作的回调
         
-        # 更新文本显示
-        action_str = self.script_manager.format_action(action)
-        self.script_text.insert("end", action_str + "\n")
-        self.script_text.see("end")
+        在记录器的监听线程中调用，不能直接操作Tk控件，只把操作放入队列。
+        """
+        self.record_queue.put(action)
+        
+    def drain_record_queue(self):
+        """在界面线程中批量取出记录的操作，追加到脚本并刷新编辑区末尾"""
+        count = 0
+        try:
+            while True:
+                self.current_script.append(self.record_queue.get_nowait())
+                count += 1
+        except queue.Empty:
+            pass
+            
+        if count:
+            stats = self.record_stats
+            stats["consumed"] += count
+            stats["max_batch"] = max(stats["max_batch"], count)
+            
+            # 编辑区只绘制可见行，刷新开销与脚本长度无关
+            self.script_view.refresh(follow_end=True)
+            
+        if self.is_recording:
+            self.record_tick_id = self.after(RECORD_TICK_MS, self.drain_record_queue)
             
     def new_script(self):
         """新建脚本"""
@@ -393,13 +630,15 @@ class AnJianApp(ctk.CTk):
             return
             
         # 检查是否需要保存当前脚本
-        if self.script_text.get("1.0", "end").strip():
+        if self.script_view.modified and self.current_script:
             if messagebox.askyesno("确认", "当前脚本未保存，是否保存?"):
                 self.save_script()
                 
         # 清空当前脚本
-        self.script_text.delete("1.0", "end")
-        self.current_script = []
+        self.current_script = ActionBuffer()
+        self.set_extra_lines([])
+        self.stream_source = None
+        self.script_view.set_buffer(self.current_script)
         self.current_file = None
         self.status_var.set("新建脚本")
             
@@ -412,50 +651,146 @@ class AnJianApp(ctk.CTk):
         # 打开文件对话框
         file_path = filedialog.askopenfilename(
             title="打开脚本",
-            filetypes=[("按键精灵脚本", "*.ajs"), ("文本文件", "*.txt"), ("所有文件", "*.*")]
+            filetypes=[("按键精灵脚本", "*.ajs"), ("按键精灵二进制脚本", "*.ajsb"), ("文本文件", "*.txt"), ("所有文件", "*.*")]
         )
         
         if file_path:
             try:
-                # 加载脚本
-                script_text = self.script_manager.load_script(file_path)
+                # 加载脚本，直接解析为操作缓冲区
+                self.current_script = self.script_manager.load_actions(file_path)
+                self.set_extra_lines(self.script_manager.last_report.extra_lines)
+                # 乱序的文本脚本在编辑区中已排序，流式播放会按文件顺序执行，因此只播放缓冲区
+                self.stream_source = None
+                if self.script_manager.last_report.monotonic:
+                    self.stream_source = (file_path, os.path.getmtime(file_path))
                 
                 # 更新UI
-                self.script_text.delete("1.0", "end")
-                self.script_text.insert("1.0", script_text)
+                self.script_view.set_buffer(self.current_script)
                 self.current_file = file_path
-                self.status_var.set(f"已加载: {os.path.basename(file_path)}")
+                status = f"已加载: {os.path.basename(file_path)} ({len(self.current_script)} 个操作)"
+                errors = self.script_manager.last_errors
+                if errors:
+                    status += f" 已忽略{len(errors)}行无法解析的内容 (第{errors[0].line_no}行: {errors[0].message})"
+                self.status_var.set(status)
             except Exception as e:
                 messagebox.showerror("错误", f"无法打开文件: {str(e)}")
             
     def save_script(self):
-        """保存脚本"""
+        """保存脚本
+        
+        Returns:
+            bool: 是否已保存
+        """
         if not self.current_file:
-            self.save_script_as()
+            return self.save_script_as()
+        elif self.is_playing and self.streaming_file == self.current_file:
+            messagebox.showwarning("警告", "正在从该文件播放脚本，请先停止播放")
+            return False
         else:
             try:
-                # 获取脚本内容
-                script_text = self.script_text.get("1.0", "end")
-                
-                # 保存脚本
-                self.script_manager.save_script(self.current_file, script_text)
+                # 直接从操作缓冲区保存，文本脚本中的注释和无法解析的行原样写回
+                self.sync_extra_lines()
+                if self.script_manager.is_binary_script(self.current_file):
+                    if self.current_extra_lines and not messagebox.askyesno(
+                            "确认", f"二进制脚本只保存操作，{len(self.current_extra_lines)}行注释或无法解析的内容"
+                                    f"不会保存，是否继续?"):
+                        return False
+                    self.script_manager.save_binary(self.current_file, self.current_script)
+                else:
+                    self.script_manager.save_actions(self.current_file, self.current_script,
+                                                     extra_lines=self.current_extra_lines)
+                self.script_view.modified = False
+                self.stream_source = (self.current_file, os.path.getmtime(self.current_file))
                 self.status_var.set(f"已保存: {os.path.basename(self.current_file)}")
+                return True
             except Exception as e:
                 messagebox.showerror("错误", f"无法保存文件: {str(e)}")
+                return False
             
     def save_script_as(self):
-        """另存为脚本"""
+        """另存为脚本
+        
+        Returns:
+            bool: 是否已保存
+        """
         # 打开保存文件对话框
         file_path = filedialog.asksaveasfilename(
             title="保存脚本",
             defaultextension=".ajs",
-            filetypes=[("按键精灵脚本", "*.ajs"), ("文本文件", "*.txt"), ("所有文件", "*.*")]
+            filetypes=[("按键精灵脚本", "*.ajs"), ("按键精灵二进制脚本", "*.ajsb"), ("文本文件", "*.txt"), ("所有文件", "*.*")]
         )
         
-        if file_path:
-            self.current_file = file_path
-            self.save_script()
+        if not file_path:
+            return False
+        previous = self.current_file
+        self.current_file = file_path
+        if not self.save_script():
+            # 取消或保存失败时仍指向原来的文件
+            self.current_file = previous
+            return False
+        return True
+            
+    def optimize_script(self):
+        """优化当前脚本：去除冗余操作并合并连续滚动"""
+        if self.is_recording or self.is_playing:
+            messagebox.showwarning("警告", "请先停止当前操作")
+            return
             
+        if not self.current_script:
+            messagebox.showwarning("警告", "没有可优化的脚本")
+            return
+            
+        optimizer = ScriptOptimizer()
+        optimized = optimizer.optimize(self.current_script.to_dicts())
+        
+        # 更新UI
+        self.current_script = ActionBuffer(optimized)
+        self.script_view.set_buffer(self.current_script)
+        self.script_view.modified = True
+        status = f"优化完成: {optimizer.format_report()}"
+        if self.current_extra_lines:
+            # 优化后重建了整个脚本，无法确定注释对应的位置
+            status += f"；{len(self.current_extra_lines)}行注释或无法解析的内容已丢弃"
+        self.set_extra_lines([])
+        self.status_var.set(status)
+        
+    def set_extra_lines(self, extra_lines):
+        """设置当前脚本中要写回的注释和无法解析的行，并从现在起跟踪它们的位置
+        
+        Args:
+            extra_lines: (之前的操作数, 行内容)列表
+        """
+        self.current_extra_lines = list(extra_lines)
+        self.extra_lines_generation = self.current_script.generation
+        self.extra_lines_edit_pos = len(self.current_script.edits)
+        
+    def sync_extra_lines(self):
+        """按脚本的编辑记录更新注释和无法解析的行的位置（插入、删除或移动行之后）"""
+        if not self.current_extra_lines:
+            return
+        buffer = self.current_script
+        if buffer.generation != self.extra_lines_generation:
+            # 脚本被整体修改（如重新排序），原来的位置已失效
+            count = len(self.current_extra_lines)
+            self.set_extra_lines([])
+            self.status_var.set(f"脚本已整体修改，{count}行注释或无法解析的内容无法确定位置，已丢弃")
+            return
+        self.current_extra_lines = remap_extra_lines(self.current_extra_lines,
+                                                     buffer.edits[self.extra_lines_edit_pos:])
+        self.extra_lines_edit_pos = len(buffer.edits)
+        
+    def jump_to_time(self):
+        """选中并滚动到第一个不早于输入时间的操作"""
+        try:
+            target = float(self.jump_var.get())
+        except ValueError:
+            messagebox.showerror("错误", "请输入有效的时间")
+            return
+        index = self.script_view.jump_to_time(target)
+        if index is not None:
+            time_str = self.script_manager.format_time(self.current_script.time_at(index))
+            self.status_var.set(f"第{index + 1}行 [{time_str}]")
+        
     def open_hotkey_settings(self):
         """打开快捷键设置对话框"""
         if self.is_recording or self.is_playing:
@@ -0,0 +1,540 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按键精灵 - 输入后端
+播放器通过统一的InputBackend接口注入键盘和鼠标事件，可选pyautogui、pynput、
+Windows原生SendInput，以及不依赖显示器、只在内存中记录事件的FakeBackend（用于测试和基准）
+"""
+
+import time
+import ctypes
+
+# 快捷键配置中的修饰键名称到后端键名的映射
+_HOTKEY_NAMES = {
+    "control": "ctrl",
+    "escape": "esc",
+    "return": "enter",
+}
+
+
+class InputBackend:
+    """输入后端接口
+
+    按键名称使用记录器产生的名称（pynput风格，如 a、shift、ctrl_l、f9），
+    按钮名称为 left / right / middle，滚动量以滚轮格数为单位。
+    key_down/key_up和mouse_down/mouse_up既接受名称，也接受resolve_key/resolve_button
+    预先解析出的后端对象（播放器编译脚本时对每个按键只解析一次）。
+    """
+
+    name = "base"
+    low_latency = False  # 是否去掉后端自带的暂停和拖拽等额外开销
+
+    def resolve_key(self, key):
+        """把按键名称解析为后端可以直接注入的对象，默认为名称本身"""
+        return key
+
+    def resolve_button(self, button):
+        """把按钮名称解析为后端可以直接注入的对象，未知按钮视为左键"""
+        return button if button in ("left", "right", "middle") else "left"
+
+    def key_down(self, key):
+        """按下按键"""
+        raise NotImplementedError
+
+    def key_up(self, key):
+        """释放按键"""
+        raise NotImplementedError
+
+    def mouse_down(self, button):
+        """在当前位置按下鼠标按钮"""
+        raise NotImplementedError
+
+    def mouse_up(self, button):
+        """在当前位置释放鼠标按钮"""
+        raise NotImplementedError
+
+    def move_to(self, x, y):
+        """移动鼠标到绝对坐标"""
+        raise NotImplementedError
+
+    def move_rel(self, dx, dy):
+        """相对移动鼠标"""
+        raise NotImplementedError
+
+    def scroll(self, dx, dy):
+        """滚动鼠标滚轮（格数，正值向上/向右）"""
+        raise NotImplementedError
+
+    def position(self):
+        """获取当前鼠标位置
+
+        Returns:
+            tuple: (x, y)
+        """
+        raise NotImplementedError
+
+    def send_batch(self, events):
+        """一次注入一批事件
+
+        默认逐个调用对应的方法；支持批量注入的后端（SendInput）在一次系统调用中注入全部事件。
+
+        Args:
+            events: (方法名, 参数...) 元组列表，如 ("key_down", "a")、("move_rel", 3, -2)
+        """
+        for name, *args in events:
+            getattr(self, name)(*args)
+
+    def press_hotkey(self, hotkey):
+        """按下并释放组合键
+
+        Args:
+            hotkey: 快捷键配置格式的组合键，如 Control-Shift-s
+        """
+        keys = [_HOTKEY_NAMES.get(part.lower(), part.lower()) for part in hotkey.split("-") if part]
+        for key in keys:
+            self.key_down(key)
+        for key in reversed(keys):
+            self.key_up(key)
+
+    def close(self):
+        """释放后端占用的资源"""
+
+
+class PyAutoGUIBackend(InputBackend):
+    """基于pyautogui的后端（原有的播放实现）
+
+    低延迟模式下不再在每次调用后暂停，也不再检查安全角（由播放器定期检查），
+    相对移动直接使用moveRel而不是带0.01秒拖拽的dragRel。
+    pyautogui的FAILSAFE和PAUSE是进程级的全局设置，本后端在每次调用前设置为自己的值，
+    创建多个不同模式的后端时互不影响；但不同线程中同时使用不同模式的后端时仍可能互相覆盖。
+    """
+
+    name = "pyautogui"
+
+    def __init__(self, low_latency=False):
+        import pyautogui
+        self.low_latency = low_latency
+        self.pyautogui = pyautogui
+        # pyautogui的安全特性，在每次调用前应用（见_api）
+        self.failsafe = not low_latency  # 将鼠标移动到屏幕左上角将中断程序
+        self.pause = 0 if low_latency else 0.01  # 每次PyAutoGUI函数调用后暂停的秒数
+
+    def _api(self):
+        """把本后端的FAILSAFE和PAUSE设置到pyautogui的全局变量，返回pyautogui模块"""
+        pyautogui = self.pyautogui
+        pyautogui.FAILSAFE = self.failsafe
+        pyautogui.PAUSE = self.pause
+        return pyautogui
+
+    def key_down(self, key):
+        self._api().keyDown(key)
+
+    def key_up(self, key):
+        self._api().keyUp(key)
+
+    def mouse_down(self, button):
+        self._api().mouseDown(button=button)
+
+    def mouse_up(self, button):
+        self._api().mouseUp(button=button)
+
+    def move_to(self, x, y):
+        self._api().moveTo(x, y)
+
+    def move_rel(self, dx, dy):
+        if self.low_latency:
+            self._api().moveRel(dx, dy)
+        else:
+            # 使用dragRel模拟鼠标拖拽，这在游戏中更有效
+            self._api().dragRel(dx, dy, duration=0.01, button='middle')
+
+    def scroll(self, dx, dy):
+        # pyautogui的scroll函数正值向上滚动，乘以一个系数使滚动更明显
+        self._api().scroll(int(dy * 10))
+
+    def position(self):
+        return self.pyautogui.position()
+
+    def press_hotkey(self, hotkey):
+        # 使用keyboard库模拟按键，因为它支持组合键
+        import keyboard
+        keyboard.press_and_release(hotkey.replace("-", "+").lower())
+
+
+class PynputBackend(InputBackend):
+    """基于pynput控制器的后端，与记录器使用同一套按键名称"""
+
+    name = "pynput"
+
+    def __init__(self, low_latency=False):
+        from pynput import keyboard, mouse
+        self.low_latency = low_latency
+        self._keyboard_module = keyboard
+        self._buttons = mouse.Button
+        self.keyboard = keyboard.Controller()
+        self.mouse = mouse.Controller()
+        self._key_cache = {}
+
+    def resolve_key(self, key):
+        """将记录的按键名称转换为pynput的按键对象"""
+        resolved = self._key_cache.get(key)
+        if resolved is None:
+            keyboard = self._keyboard_module
+            if len(key) == 1:
+                resolved = key
+            elif key.startswith("<") and key.endswith(">") and key[1:-1].isdigit():
+                # 记录器对没有字符的按键记录为 <虚拟键码>
+                resolved = keyboard.KeyCode.from_vk(int(key[1:-1]))
+            else:
+                resolved = getattr(keyboard.Key, key, None) or key
+            self._key_cache[key] = resolved
+        return resolved
+
+    def resolve_button(self, button):
+        return getattr(self._buttons, button, self._buttons.left)
+
+    def key_down(self, key):
+        self.keyboard.press(self.resolve_key(key) if isinstance(key, str) else key)
+
+    def key_up(self, key):
+        self.keyboard.release(self.resolve_key(key) if isinstance(key, str) else key)
+
+    def mouse_down(self, button):
+        self.mouse.press(self.resolve_button(button) if isinstance(button, str) else button)
+
+    def mouse_up(self, button):
+        self.mouse.release(self.resolve_button(button) if isinstance(button, str) else button)
+
+    def move_to(self, x, y):
+        self.mouse.position = (x, y)
+
+    def move_rel(self, dx, dy):
+        self.mouse.move(dx, dy)
+
+    def scroll(self, dx, dy):
+        self.mouse.scroll(dx, dy)
+
+    def position(self):
+        return self.mouse.position
+
+
+# SendInput常量
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
+KEYEVENTF_EXTENDEDKEY = 0x0001
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_SCANCODE = 0x0008
+MOUSEEVENTF_MOVE = 0x0001
+MOUSEEVENTF_LEFTDOWN = 0x0002
+MOUSEEVENTF_LEFTUP = 0x0004
+MOUSEEVENTF_RIGHTDOWN = 0x0008
+MOUSEEVENTF_RIGHTUP = 0x0010
+MOUSEEVENTF_MIDDLEDOWN = 0x0020
+MOUSEEVENTF_MIDDLEUP = 0x0040
+MOUSEEVENTF_WHEEL = 0x0800
+MOUSEEVENTF_HWHEEL = 0x1000
+MOUSEEVENTF_VIRTUALDESK = 0x4000
+MOUSEEVENTF_ABSOLUTE = 0x8000
+WHEEL_DELTA = 120
+
+# 按钮名称到(按下, 释放)标志的映射
+_BUTTON_FLAGS = {
+    "left": (MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP),
+    "right": (MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP),
+    "middle": (MOUSEEVENTF_MIDDLEDOWN, MOUSEEVENTF_MIDDLEUP),
+}
+
+# 记录的特殊按键名称到虚拟键码的映射
+_VK_CODES = {
+    "backspace": 0x08, "tab": 0x09, "enter": 0x0D, "shift": 0x10, "ctrl": 0x11, "alt": 0x12,
+    "pause": 0x13, "caps_lock": 0x14, "esc": 0x1B, "space": 0x20, "page_up": 0x21,
+    "page_down": 0x22, "end": 0x23, "home": 0x24, "left": 0x25, "up": 0x26, "right": 0x27,
+    "down": 0x28, "print_screen": 0x2C, "insert": 0x2D, "delete": 0x2E, "cmd": 0x5B,
+    "cmd_l": 0x5B, "cmd_r": 0x5C, "menu": 0x5D, "num_lock": 0x90, "scroll_lock": 0x91,
+    "shift_l": 0xA0, "shift_r": 0xA1, "ctrl_l": 0xA2, "ctrl_r": 0xA3, "alt_l": 0xA4,
+    "alt_r": 0xA5, "alt_gr": 0xA5, "media_volume_mute": 0xAD, "media_volume_down": 0xAE,
+    "media_volume_up": 0xAF, "media_next": 0xB0, "media_previous": 0xB1, "media_play_pause": 0xB3,
+}
+_VK_CODES.update({f"f{i}": 0x6F + i for i in range(1, 25)})
+
+# 需要扩展键标志的虚拟键码
+_EXTENDED_VK = {0x21, 0x22, 0x23, 0x24, 0x25, 0x26, 0x27, 0x28, 0x2C, 0x2D, 0x2E,
+                0x5B, 0x5C, 0x5D, 0x90, 0xA3, 0xA5, 0x6F}
+
+
+class SendInputBackend(InputBackend):
+    """直接调用Windows SendInput的后端，按扫描码注入按键，游戏中兼容性最好"""
+
+    name = "sendinput"
+
+    def __init__(self, low_latency=False):
+        if not hasattr(ctypes, "WinDLL"):
+            raise RuntimeError("SendInput后端只能在Windows上使用")
+        self.low_latency = low_latency
+        from ctypes import wintypes
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG), ("mouseData", wintypes.DWORD),
+                        ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD),
+                        ("dwExtraInfo", ctypes.c_size_t)]
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD), ("dwFlags", wintypes.DWORD),
+                        ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+        class HARDWAREINPUT(ctypes.Structure):
+            _fields_ = [("uMsg", wintypes.DWORD), ("wParamL", wintypes.WORD), ("wParamH", wintypes.WORD)]
+
+        class _INPUTUNION(ctypes.Union):
+            _fields_ = [("mi", MOUSEINPUT), ("ki", KEYBDINPUT), ("hi", HARDWAREINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _anonymous_ = ("u",)
+            _fields_ = [("type", wintypes.DWORD), ("u", _INPUTUNION)]
+
+        self.INPUT = INPUT
+        self.user32 = ctypes.WinDLL("user32", use_last_error=True)
+        self.user32.SendInput.argtypes = (wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
+        self.user32.SendInput.restype = wintypes.UINT
+        # 返回SHORT：低字节为虚拟键码，高字节为Shift等状态，无法映射时为-1
+        self.user32.VkKeyScanW.argtypes = (wintypes.WCHAR,)
+        self.user32.VkKeyScanW.restype = ctypes.c_short
+        try:
+            # 使用物理像素坐标，与记录器得到的坐标一致
+            self.user32.SetProcessDPIAware()
+        except Exception:
+            pass
+        self._point = wintypes.POINT()
+        self._key_cache = {}
+        self._button_cache = {}
+
+        # 绝对坐标需要换算到整个虚拟桌面的0~65535
+        self.screen_left = self.user32.GetSystemMetrics(76)
+        self.screen_top = self.user32.GetSystemMetrics(77)
+        self.screen_width = max(1, self.user32.GetSystemMetrics(78) - 1)
+        self.screen_height = max(1, self.user32.GetSystemMetrics(79) - 1)
+
+    def _send(self, *inputs):
+        """一次SendInput调用注入若干事件"""
+        count = len(inputs)
+        if not count:
+            return
+        array = (self.INPUT * count)(*inputs)
+        if self.user32.SendInput(count, array, ctypes.sizeof(self.INPUT)) != count:
+            raise OSError(ctypes.get_last_error(), "SendInput被阻止（可能是权限不足）")
+
+    def resolve_key(self, key):
+        """将按键名称转换为预先构造好的(按下, 释放)INPUT结构"""
+        resolved = self._key_cache.get(key)
+        if resolved is None:
+            resolved = (self._key_input(key, False), self._key_input(key, True))
+            self._key_cache[key] = resolved
+        return resolved
+
+    def resolve_button(self, button):
+        """将按钮名称转换为预先构造好的(按下, 释放)INPUT结构"""
+        resolved = self._button_cache.get(button)
+        if resolved is None:
+            down, up = _BUTTON_FLAGS.get(button, _BUTTON_FLAGS["left"])
+            resolved = (self._mouse_input(down), self._mouse_input(up))
+            self._button_cache[button] = resolved
+        return resolved
+
+    def _key_codes(self, key):
+        """将按键名称转换为(虚拟键码, 扫描码, 标志)"""
+        if len(key) == 1:
+            result = self.user32.VkKeyScanW(key)
+            if result == -1:
+                raise ValueError(f"当前键盘布局无法输入该字符: {key}")
+            vk = result & 0xFF
+        elif key.startswith("<") and key.endswith(">") and key[1:-1].isdigit():
+            vk = int(key[1:-1])
+        else:
+            vk = _VK_CODES.get(key.lower())
+            if vk is None:
+                raise ValueError(f"未知按键: {key}")
+        scan = self.user32.MapVirtualKeyW(vk, 0)
+        flags = KEYEVENTF_EXTENDEDKEY if vk in _EXTENDED_VK else 0
+        if scan:
+            flags |= KEYEVENTF_SCANCODE
+        return vk, scan, flags
+
+    def _key_input(self, key, up):
+        vk, scan, flags = self._key_codes(key)
+        event = self.INPUT(type=INPUT_KEYBOARD)
+        event.ki.wVk = 0 if flags & KEYEVENTF_SCANCODE else vk
+        event.ki.wScan = scan
+        event.ki.dwFlags = flags | (KEYEVENTF_KEYUP if up else 0)
+        return event
+
+    def _mouse_input(self, flags, dx=0, dy=0, data=0):
+        event = self.INPUT(type=INPUT_MOUSE)
+        event.mi.dx = dx
+        event.mi.dy = dy
+        event.mi.mouseData = data & 0xFFFFFFFF
+        event.mi.dwFlags = flags
+        return event
+
+    # 以下_build_*方法把一个事件转换为INPUT结构列表，单个注入和批量注入共用
+
+    def _build_key_down(self, key):
+        return ((self.resolve_key(key) if isinstance(key, str) else key)[0],)
+
+    def _build_key_up(self, key):
+        return ((self.resolve_key(key) if isinstance(key, str) else key)[1],)
+
+    def _build_mouse_down(self, button):
+        return ((self.resolve_button(button) if isinstance(button, str) else button)[0],)
+
+    def _build_mouse_up(self, button):
+        return ((self.resolve_button(button) if isinstance(button, str) else button)[1],)
+
+    def _build_move_to(self, x, y):
+        nx = ((x - self.screen_left) * 65535) // self.screen_width
+        ny = ((y - self.screen_top) * 65535) // self.screen_height
+        return (self._mouse_input(MOUSEEVENTF_MOVE | MOUSEEVENTF_ABSOLUTE | MOUSEEVENTF_VIRTUALDESK,
+                                  nx, ny),)
+
+    def _build_move_rel(self, dx, dy):
+        return (self._mouse_input(MOUSEEVENTF_MOVE, dx, dy),)
+
+    def _build_scroll(self, dx, dy):
+        inputs = []
+        if dy:
+            inputs.append(self._mouse_input(MOUSEEVENTF_WHEEL, data=int(dy * WHEEL_DELTA)))
+        if dx:
+            inputs.append(self._mouse_input(MOUSEEVENTF_HWHEEL, data=int(dx * WHEEL_DELTA)))
+        return inputs
+
+    def key_down(self, key):
+        self._send(*self._build_key_down(key))
+
+    def key_up(self, key):
+        self._send(*self._build_key_up(key))
+
+    def mouse_down(self, button):
+        self._send(*self._build_mouse_down(button))
+
+    def mouse_up(self, button):
+        self._send(*self._build_mouse_up(button))
+
+    def move_to(self, x, y):
+        self._send(*self._build_move_to(x, y))
+
+    def move_rel(self, dx, dy):
+        self._send(*self._build_move_rel(dx, dy))
+
+    def scroll(self, dx, dy):
+        self._send(*self._build_scroll(dx, dy))
+
+    def send_batch(self, events):
+        """整批事件只调用一次SendInput"""
+        inputs = []
+        for name, *args in events:
+            inputs.extend(getattr(self, "_build_" + name)(*args))
+        self._send(*inputs)
+
+    def position(self):
+        self.user32.GetCursorPos(ctypes.byref(self._point))
+        return self._point.x, self._point.y
+
+
+class FakeBackend(InputBackend):
+    """只在内存中记录事件的后端，不需要显示器和输入设备
+
+    每个注入的事件记录为 (perf_counter时间, 事件名, 参数...) 元组，保存在events中；
+    calls统计注入调用的次数（一次send_batch算一次），用于验证批量注入的效果。
+    """
+
+    name = "fake"
+
+    def __init__(self, x=100, y=100, low_latency=False):
+        """初始化
+
+        Args:
+            x, y: 初始鼠标位置（默认不在左上角安全停止的位置）
+            low_latency: 仅作记录，内存后端本身没有额外开销
+        """
+        self.low_latency = low_latency
+        self.x = x
+        self.y = y
+        self.events = []
+        self.calls = 0
+
+    def clear(self):
+        """清空已记录的事件"""
+        self.events = []
+        self.calls = 0
+
+    def _record(self, *event):
+        self.calls += 1
+        self.events.append((time.perf_counter(),) + event)
+
+    def key_down(self, key):
+        self._record("key_down", key)
+
+    def key_up(self, key):
+        self._record("key_up", key)
+
+    def mouse_down(self, button):
+        self._record("mouse_down", button)
+
+    def mouse_up(self, button):
+        self._record("mouse_up", button)
+
+    def move_to(self, x, y):
+        self.x, self.y = x, y
+        self._record("move_to", x, y)
+
+    def move_rel(self, dx, dy):
+        self.x += dx
+        self.y += dy
+        self._record("move_rel", dx, dy)
+
+    def scroll(self, dx, dy):
+        self._record("scroll", dx, dy)
+
+    def send_batch(self, events):
+        """整批事件使用同一个时间戳，只算一次注入调用"""
+        self.calls += 1
+        now = time.perf_counter()
+        for event in events:
+            name = event[0]
+            if name == "move_to":
+                self.x, self.y = event[1], event[2]
+            elif name == "move_rel":
+                self.x += event[1]
+                self.y += event[2]
+            self.events.append((now,) + tuple(event))
+
+    def position(self):
+        return self.x, self.y
+
+
+# 后端名称到类的映射
+BACKENDS = {
+    PyAutoGUIBackend.name: PyAutoGUIBackend,
+    PynputBackend.name: PynputBackend,
+    SendInputBackend.name: SendInputBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+def create_backend(name="pyautogui", low_latency=False):
+    """按名称创建输入后端
+
+    Args:
+        name: 后端名称（pyautogui / pynput / sendinput / fake）
+        low_latency: 是否使用低延迟模式
+
+    Returns:
+        InputBackend: 输入后端
+
+    Raises:
+        ValueError: 未知的后端名称
+    """
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        raise ValueError(f"未知的输入后端: {name}（可用: {', '.join(BACKENDS)}）")
+    return backend_class(low_latency=low_latency)
@@ -6,16 +6,17 @@
 功能：记录和重放键盘鼠标操作，类似于按键精灵
 """
 
-import os
-import sys
-import time
-import threading
-import customtkinter as ctk
-from gui import AnJianApp
 from config_manager import ConfigManager
 
 def main():
-    """主程序入口"""
+    """主程序入口
+    
+    界面库在这里才导入；输入相关的库（pyautogui、pynput、keyboard）不在启动时导入，
+    分别在第一次播放、第一次记录和绑定全局热键时加载（全局热键在窗口显示后于后台线程中加载）
+    """
+    import customtkinter as ctk
+    from gui import AnJianApp
+    
     # 设置主题
     ctk.set_appearance_mode("System")  # 系统主题（自动适应深色/浅色模式）
     ctk.set_default_color_theme("blue")  # 默认颜色主题
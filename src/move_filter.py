@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按键精灵 - 鼠标移动过滤器
+在记录时精简鼠标移动轨迹：最小距离/时间阈值、滑动窗口内的Ramer-Douglas-Peucker简化，
+以及停顿时的抖动合并
+"""
+
+
+def _segment_distance(px, py, ax, ay, bx, by):
+    """点(px, py)到线段(ax, ay)-(bx, by)的距离"""
+    dx = bx - ax
+    dy = by - ay
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return ((px - ax) ** 2 + (py - ay) ** 2) ** 0.5
+    t = ((px - ax) * dx + (py - ay) * dy) / length_sq
+    t = max(0.0, min(1.0, t))
+    cx = ax + t * dx
+    cy = ay + t * dy
+    return ((px - cx) ** 2 + (py - cy) ** 2) ** 0.5
+
+
+def simplify_path(points, epsilon):
+    """Ramer-Douglas-Peucker折线简化
+
+    Args:
+        points: (x, y, t)点列表
+        epsilon: 允许的最大偏离距离（像素）
+
+    Returns:
+        list: 保留的点（始终包含首尾两点）
+    """
+    count = len(points)
+    if count <= 2:
+        return list(points)
+
+    keep = [False] * count
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        ax, ay = points[start][0], points[start][1]
+        bx, by = points[end][0], points[end][1]
+        max_distance = -1.0
+        index = start
+        for i in range(start + 1, end):
+            distance = _segment_distance(points[i][0], points[i][1], ax, ay, bx, by)
+            if distance > max_distance:
+                max_distance = distance
+                index = i
+        if max_distance > epsilon:
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+
+    return [p for p, k in zip(points, keep) if k]
+
+
+class MoveFilter:
+    """记录时使用的鼠标移动过滤器
+
+    add() 接收原始移动事件并返回可以立即输出的点；被阈值过滤掉的最后一个点会在
+    flush() 或停顿结束时补上，保证光标最终停留的位置不会丢失。
+    """
+
+    def __init__(self, min_distance=2, min_interval=0.0, rdp_epsilon=1.0,
+                 window_size=32, idle_time=0.2):
+        """初始化过滤器
+
+        Args:
+            min_distance: 与上一个保留点的最小距离（像素），小于该值的移动被丢弃
+            min_interval: 与上一个保留点的最小时间间隔（秒）
+            rdp_epsilon: RDP简化允许的最大偏离距离（像素），0表示不做简化
+            window_size: RDP滑动窗口的点数
+            idle_time: 超过该时间没有移动视为停顿，停顿前的轨迹会被立即输出
+        """
+        self.min_distance = min_distance
+        self.min_interval = min_interval
+        self.rdp_epsilon = rdp_epsilon
+        self.window_size = max(3, int(window_size))
+        self.idle_time = idle_time
+        self.reset()
+
+    def reset(self):
+        """清空状态和统计"""
+        self.window = []  # 待简化的点，window[0]为已输出的锚点
+        self.pending = None  # 被阈值丢弃的最新一个点
+        self.pending_reason = None  # 该点被计入的丢弃统计项
+        self.last_raw = None
+        self.stats = {
+            "received": 0,  # 收到的移动事件数
+            "emitted": 0,  # 输出的移动事件数
+            "dropped_distance": 0,  # 因距离阈值丢弃
+            "dropped_interval": 0,  # 因时间阈值丢弃
+            "dropped_rdp": 0,  # 被RDP简化掉
+            "coalesced": 0,  # 停顿时位置不变的重复事件
+        }
+
+    def add(self, x, y, t):
+        """处理一个原始移动事件
+
+        Args:
+            x, y: 鼠标坐标
+            t: 事件时间（秒）
+
+        Returns:
+            list: 需要输出的(x, y, t)点
+        """
+        stats = self.stats
+        stats["received"] += 1
+        output = []
+
+        last_raw = self.last_raw
+        self.last_raw = (x, y, t)
+
+        if last_raw is not None:
+            if t - last_raw[2] >= self.idle_time:
+                # 停顿结束：先输出停顿前的轨迹，保证停顿位置和时间被保留
+                output.extend(self.flush())
+            elif last_raw[0] == x and last_raw[1] == y:
+                stats["coalesced"] += 1
+                return output
+
+        if not self.window:
+            # 第一个点直接输出并作为锚点
+            self.window.append((x, y, t))
+            self.pending = None
+            output.append((x, y, t))
+            stats["emitted"] += 1
+            return output
+
+        last = self.window[-1]
+        if ((x - last[0]) ** 2 + (y - last[1]) ** 2) ** 0.5 < self.min_distance:
+            return self._drop((x, y, t), "dropped_distance", output)
+        if t - last[2] < self.min_interval:
+            return self._drop((x, y, t), "dropped_interval", output)
+
+        self.pending = None
+        self.window.append((x, y, t))
+        if len(self.window) >= self.window_size:
+            output.extend(self._simplify_window())
+        return output
+
+    def _drop(self, point, reason, output):
+        """按阈值丢弃一个点，但记住它以便之后补上最终位置"""
+        self.stats[reason] += 1
+        self.pending = point
+        self.pending_reason = reason
+        return output
+
+    def flush(self):
+        """输出所有缓存的点（在其他事件到来前或停止记录时调用）
+
+        Returns:
+            list: 需要输出的(x, y, t)点
+        """
+        if self.pending is not None:
+            # 被阈值丢弃的最后一个点代表光标实际停留的位置
+            self.window.append(self.pending)
+            self.stats[self.pending_reason] -= 1
+            self.pending = None
+        if len(self.window) < 2:
+            return []
+        return self._simplify_window()
+
+    def _simplify_window(self):
+        """对窗口做RDP简化，输出除锚点外保留的点，最后一个点成为新的锚点"""
+        window = self.window
+        if self.rdp_epsilon > 0:
+            kept = simplify_path(window, self.rdp_epsilon)
+        else:
+            kept = list(window)
+        self.stats["dropped_rdp"] += len(window) - len(kept)
+        self.stats["emitted"] += len(kept) - 1
+        self.window = [window[-1]]
+        return kept[1:]
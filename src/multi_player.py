@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按键精灵 - 多脚本并行播放
+同时播放多个脚本：每个脚本有独立的时间线、停止标志和优先级，共享同一个输入后端；
+对同一设备（键盘/鼠标）的注入由设备仲裁器串行化，只用键盘的脚本可以与鼠标脚本并行
+"""
+
+import time
+import threading
+from player import Player
+from scheduler import JitterStats
+from input_backend import create_backend
+from action_buffer import OP_KEY_PRESS, OP_KEY_RELEASE, OP_MOUSE_DOWN, OP_MOUSE_UP
+
+# 设备名称
+DEVICE_KEYBOARD = "keyboard"
+DEVICE_MOUSE = "mouse"
+
+
+def group_devices(group):
+    """一组步骤需要使用的设备
+
+    Args:
+        group: 步骤列表
+
+    Returns:
+        frozenset: 设备名称集合
+    """
+    keyboard = mouse = False
+    for step in group:
+        if step[1] <= OP_KEY_RELEASE:
+            keyboard = True
+        else:
+            mouse = True
+    if keyboard and mouse:
+        return frozenset((DEVICE_KEYBOARD, DEVICE_MOUSE))
+    return frozenset((DEVICE_KEYBOARD,) if keyboard else (DEVICE_MOUSE,))
+
+
+class DeviceArbiter:
+    """设备仲裁器：同一时刻每个设备只允许一个脚本注入
+
+    有多个脚本等待同一设备时，优先级高的先获得；优先级相同时先到先得。
+    所有脚本共享同一个后端，也就只有一个光标：低延迟模式下本地光标位置保存在cursor中，
+    只在占用鼠标期间读写，每个脚本都从上一个脚本留下的位置计算相对位移。
+    按住按键或按钮的脚本在释放之前一直占用该设备（见ArbitratedPlayer），
+    两个脚本各自按住一个设备又等待对方的设备时，正在请求的一方先让出已占用的设备以避免死锁。
+    """
+
+    def __init__(self):
+        """初始化仲裁器"""
+        self._condition = threading.Condition()
+        self._busy = {}  # 正在使用的设备 -> 占用者
+        self._waiting = []  # 等待中的请求: (-优先级, 序号, 设备集合, 占用者)
+        self._counter = 0
+        self.wait_stats = JitterStats()  # 每次获取设备的等待时间
+        self.conflicts = 0  # 需要等待的次数
+        self.cursor = None  # 共享后端的本地光标位置 (x, y)，还没有脚本注入鼠标事件时为None
+
+    def acquire(self, devices, priority=0, owner=None, held=frozenset()):
+        """等待并占用设备
+
+        Args:
+            devices: 设备名称集合
+            priority: 优先级，数值越大越优先
+            owner: 占用者，用于判断互相等待
+            held: 该占用者已经占用的设备
+
+        Returns:
+            frozenset: 等待期间为避免死锁而让出、并已与devices一起重新占用的设备
+        """
+        start = time.perf_counter()
+        yielded = frozenset()
+        with self._condition:
+            self._counter += 1
+            request = (-priority, self._counter, devices, owner)
+            self._waiting.append(request)
+            waited = False
+            while not self._can_run(request):
+                waited = True
+                if held and self._deadlocked(request, held):
+                    # 让出已占用的设备，之后连同请求的设备一起重新获取
+                    for device in held:
+                        self._busy.pop(device, None)
+                    self._waiting.remove(request)
+                    request = (request[0], request[1], devices | held, owner)
+                    self._waiting.append(request)
+                    yielded, held = held, frozenset()
+                    self._condition.notify_all()
+                    continue
+                self._condition.wait()
+            self._waiting.remove(request)
+            for device in request[2]:
+                self._busy[device] = owner
+            if waited:
+                self.conflicts += 1
+            self.wait_stats.add(time.perf_counter() - start)
+        return yielded
+
+    def release(self, devices):
+        """释放设备
+
+        Args:
+            devices: acquire时的设备名称集合
+        """
+        with self._condition:
+            for device in devices:
+                self._busy.pop(device, None)
+            self._condition.notify_all()
+
+    def _can_run(self, request):
+        """设备空闲，且没有更优先的请求在等待其中任何一个设备"""
+        devices = request[2]
+        if any(device in self._busy for device in devices):
+            return False
+        for other in self._waiting:
+            if other < request and not other[2].isdisjoint(devices):
+                return False
+        return True
+
+    def _deadlocked(self, request, held):
+        """请求的设备被其他脚本占用，而这些脚本正在等待本请求已占用的设备"""
+        owners = {self._busy[device] for device in request[2] if device in self._busy}
+        return any(other[3] in owners and not other[2].isdisjoint(held) for other in self._waiting)
+
+
+class ArbitratedPlayer(Player):
+    """每组步骤在注入前先通过设备仲裁器占用所需设备的播放器
+
+    按下按键或鼠标按钮后一直占用该设备，直到对应的释放操作（或播放结束），
+    按住Shift或拖动期间其他脚本不会在中间注入。
+    """
+
+    def __init__(self, arbiter, priority=0, config_manager=None, backend=None):
+        """初始化播放器
+
+        Args:
+            arbiter: 共享的DeviceArbiter
+            priority: 争用设备时的优先级
+            config_manager: 配置管理器
+            backend: 共享的输入后端
+        """
+        super().__init__(config_manager, backend)
+        self.arbiter = arbiter
+        self.priority = priority
+        self.action_count = 0  # 已执行的操作数
+        self.held_keys = set()  # 按下后还没有释放的按键
+        self.held_buttons = set()  # 按下后还没有释放的鼠标按钮
+        self.owned = frozenset()  # 跨组一直占用的设备
+
+    def play(self, *args, **kwargs):
+        try:
+            super().play(*args, **kwargs)
+        finally:
+            # 播放结束或停止时仍按住的键不再阻止其他脚本使用设备
+            self.held_keys.clear()
+            self.held_buttons.clear()
+            if self.owned:
+                self.arbiter.release(self.owned)
+                self.owned = frozenset()
+
+    def _create_scheduler(self, speed=None):
+        # 多个播放线程同时忙等待时，不让出GIL会使彼此的截止时间推迟一个线程切换间隔（约5ms）
+        scheduler = super()._create_scheduler(speed)
+        scheduler.yield_spin = True
+        return scheduler
+
+    def _dispatch(self, group):
+        devices = group_devices(group) | self.owned
+        needed = devices - self.owned
+        if needed:
+            self.arbiter.acquire(needed, self.priority, self, self.owned)
+        keep = frozenset()
+        try:
+            # 低延迟模式的相对位移基于本地光标状态，占用鼠标期间改用仲裁器中共享的光标位置
+            shared_cursor = self.low_latency and DEVICE_MOUSE in devices
+            if shared_cursor and self.arbiter.cursor is not None:
+                self.cursor_x, self.cursor_y = self.arbiter.cursor
+            super()._dispatch(group)
+            if shared_cursor:
+                self.arbiter.cursor = (self.cursor_x, self.cursor_y)
+            keep = self._update_held(group)
+        finally:
+            self.arbiter.release(devices - keep)
+            self.owned = keep
+        self.action_count += len(group)
+
+    def _update_held(self, group):
+        """按一组步骤更新按下状态
+
+        Returns:
+            frozenset: 仍有按键或按钮按住、需要继续占用的设备
+        """
+        for step in group:
+            op = step[1]
+            if op == OP_KEY_PRESS:
+                self.held_keys.add(step[3])
+            elif op == OP_KEY_RELEASE:
+                self.held_keys.discard(step[3])
+            elif op == OP_MOUSE_DOWN:
+                self.held_buttons.add(step[5])
+            elif op == OP_MOUSE_UP:
+                self.held_buttons.discard(step[5])
+        if self.held_keys and self.held_buttons:
+            return frozenset((DEVICE_KEYBOARD, DEVICE_MOUSE))
+        if self.held_keys:
+            return frozenset((DEVICE_KEYBOARD,))
+        return frozenset((DEVICE_MOUSE,)) if self.held_buttons else frozenset()
+
+
+class PlaybackJob:
+    """多脚本播放中的一个脚本"""
+
+    def __init__(self, name, script, player, repeat=1, interval=0.1, start=None, end=None, speed=None):
+        """初始化任务
+
+        Args:
+            name: 任务名称
+            script: 要播放的脚本
+            player: 该任务独占的ArbitratedPlayer（独立的时间线和停止标志）
+            repeat, interval, start, end, speed: 同Player.play
+        """
+        self.name = name
+        self.script = script
+        self.player = player
+        self.repeat = repeat
+        self.interval = interval
+        self.start = start
+        self.end = end
+        self.speed = speed
+        self.thread = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    def run(self, start_delay):
+        """在任务线程中播放"""
+        self.started_at = time.perf_counter() + start_delay
+        try:
+            self.player.play(self.script, self.repeat, self.interval, start_delay=start_delay,
+                             start=self.start, end=self.end, speed=self.speed)
+        except Exception as e:
+            self.error = e
+            print(f"脚本 {self.name} 播放错误: {str(e)}")
+        finally:
+            self.finished_at = time.perf_counter()
+
+    def stop(self):
+        """停止该任务（不影响其他任务）"""
+        self.player.stop_playing()
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+
+class MultiPlayer:
+    """并行播放多个脚本"""
+
+    def __init__(self, config_manager=None, backend=None):
+        """初始化
+
+        Args:
+            config_manager: 配置管理器
+            backend: 所有脚本共享的输入后端，None表示按配置创建
+        """
+        self.config_manager = config_manager
+        self.backend = backend
+        self.arbiter = DeviceArbiter()
+        self.jobs = []
+        self.started_at = None
+
+    def add(self, script, name=None, priority=0, repeat=1, interval=0.1, start=None, end=None, speed=None):
+        """添加一个脚本
+
+        Args:
+            script: 要播放的脚本（同Player.play）
+            name: 任务名称，None表示自动编号
+            priority: 争用设备时的优先级，数值越大越优先
+            repeat, interval, start, end, speed: 同Player.play
+
+        Returns:
+            PlaybackJob: 新任务
+        """
+        if self.backend is None:
+            backend_name = self.config_manager.get_playback_setting("backend") if self.config_manager else None
+            low_latency = bool(self.config_manager and self.config_manager.get_playback_setting("low_latency"))
+            self.backend = create_backend(backend_name or "pyautogui", low_latency=low_latency)
+        player = ArbitratedPlayer(self.arbiter, priority, self.config_manager, self.backend)
+        job = PlaybackJob(name or f"脚本{len(self.jobs) + 1}", script, player,
+                          repeat, interval, start, end, speed)
+        self.jobs.append(job)
+        return job
+
+    def start(self, start_delay=1.0):
+        """在各自的线程中开始播放所有尚未开始的脚本
+
+        Args:
+            start_delay: 开始播放前的等待时间（秒）
+        """
+        self.started_at = time.perf_counter() + start_delay
+        for job in self.jobs:
+            if job.thread is None:
+                job.thread = threading.Thread(target=job.run, args=(start_delay,), daemon=True)
+                job.thread.start()
+
+    def wait(self, timeout=None):
+        """等待所有脚本播放结束
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            bool: 是否全部结束
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for job in self.jobs:
+            if job.thread is not None:
+                job.thread.join(None if deadline is None else max(0.0, deadline - time.perf_counter()))
+        return not self.running
+
+    def play(self, start_delay=1.0):
+        """开始播放并等待全部结束
+
+        Returns:
+            dict: 汇总统计，见summary
+        """
+        self.start(start_delay)
+        self.wait()
+        return self.summary()
+
+    def stop(self, name=None):
+        """停止指定脚本或全部脚本
+
+        Args:
+            name: 任务名称，None表示全部
+        """
+        for job in self.jobs:
+            if name is None or job.name == name:
+                job.stop()
+
+    @property
+    def running(self):
+        return any(job.running for job in self.jobs)
+
+    def summary(self):
+        """汇总统计
+
+        Returns:
+            dict: 各脚本的操作数、耗时和抖动，总操作数、总耗时、总吞吐量（操作/秒），以及设备争用情况
+        """
+        jobs = {}
+        total = 0
+        finished = [job.finished_at for job in self.jobs if job.finished_at is not None]
+        for job in self.jobs:
+            player = job.player
+            elapsed = ((job.finished_at or time.perf_counter()) - job.started_at) if job.started_at else 0.0
+            jobs[job.name] = {
+                "actions": player.action_count,
+                "elapsed": elapsed,
+                "jitter": player.last_stats,
+                "rate": player.last_rate,
+                "error": str(job.error) if job.error else None,
+            }
+            total += player.action_count
+        elapsed = ((max(finished) if finished and not self.running else time.perf_counter())
+                   - self.started_at) if self.started_at else 0.0
+        wait = self.arbiter.wait_stats.summary()
+        return {
+            "jobs": jobs,
+            "actions": total,
+            "elapsed": elapsed,
+            "throughput": total / elapsed if elapsed > 0 else 0.0,
+            "conflicts": self.arbiter.conflicts,
+            "wait_p99": wait["p99"],
+            "wait_max": wait["max"],
+        }
+
+    def format_summary(self):
+        """将汇总统计格式化为可读文本
+
+        Returns:
+            str: 统计文本
+        """
+        s = self.summary()
+        lines = [f"{name}: {job['actions']} 个操作, 耗时 {job['elapsed']:.2f}s"
+                 + (f", 错误: {job['error']}" if job["error"] else "")
+                 for name, job in s["jobs"].items()]
+        lines.append(f"合计 {s['actions']} 个操作, 耗时 {s['elapsed']:.2f}s, 吞吐量 {s['throughput']:.0f} 操作/秒, "
+                     f"设备争用 {s['conflicts']} 次 (等待 p99 {s['wait_p99'] * 1000:.2f}ms / "
+                     f"最大 {s['wait_max'] * 1000:.2f}ms)")
+        return "\n".join(lines)
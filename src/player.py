@@ -8,40 +8,320 @@
 
 import time
 import threading
-import pyautogui
-import keyboard
+from itertools import islice
+from scheduler import Scheduler, BatchStats, clamp_speed
+from tracing import TRACE_PLAY, TRACE_SKIP
+from input_backend import create_backend
+from action_buffer import (
+    ActionBuffer, action_opcode, NO_KEY, OP_KEY_PRESS, OP_KEY_RELEASE, OP_MOUSE_MOVE,
+    OP_MOUSE_DOWN, OP_MOUSE_UP, OP_TYPES, US_PER_SECOND
+)
+
+
+class CompiledScript:
+    """已编译的步骤列表，播放时不再编译（由Player.compile_buffer生成）"""
+    
+    __slots__ = ("steps",)
+    
+    def __init__(self, steps):
+        self.steps = steps
+        
+    def __len__(self):
+        return len(self.steps)
+        
+    def __iter__(self):
+        return iter(self.steps)
+
+
+class StepCache:
+    """与ActionBuffer逐行对应的已编译步骤
+    
+    再次同步时按缓冲区的编辑记录只重新编译被修改和新追加的行，
+    缓冲区被整体修改（generation变化）时才全部重新编译。
+    无法解析的按键行以None占位，保证行号与缓冲区一致。
+    """
+    
+    def __init__(self, player, buffer):
+        """初始化
+        
+        Args:
+            player: 负责编译的播放器（决定后端和处理方法）
+            buffer: 对应的ActionBuffer
+        """
+        self.player = player
+        self.buffer = buffer
+        self.backend = player.backend
+        self.rows = []
+        self.missing = 0  # rows中None的个数
+        self.generation = None
+        self.edit_pos = 0  # 已处理的编辑记录条数
+        self.key_cache = {}
+        self.button_cache = {}
+        self.recompiled = 0  # 最近一次同步重新编译的行数
+        
+    def sync(self):
+        """按缓冲区的修改更新已编译的行
+        
+        Returns:
+            int: 重新编译的行数
+        """
+        buffer = self.buffer
+        rows = self.rows
+        if buffer.generation != self.generation:
+            rows.clear()
+            self.missing = 0
+            self.generation = buffer.generation
+            self.edit_pos = 0
+            
+        # 重放编辑记录：删除的行直接移除，插入的行先占位，全部重放后再按最终行号编译
+        dirty = []
+        for index, removed, inserted in buffer.edits[self.edit_pos:]:
+            if index >= len(rows):
+                # 尚未编译的末尾部分，稍后随追加的行一起编译
+                continue
+            if removed:
+                self.missing -= rows[index:index + removed].count(None)
+                del rows[index:index + removed]
+                dirty = [i - removed if i >= index + removed else i
+                         for i in dirty if not index <= i < index + removed]
+            if inserted:
+                rows[index:index] = [None] * inserted
+                self.missing += inserted
+                dirty = [i + inserted if i >= index else i for i in dirty]
+                dirty.extend(range(index, index + inserted))
+        self.edit_pos = len(buffer.edits)
+        
+        if len(rows) > len(buffer):
+            # 编辑记录与缓冲区不一致（如列数组被直接修改），全部重新编译
+            rows.clear()
+            self.missing = 0
+            dirty = []
+            
+        compile_rows = self.player._buffer_rows
+        for i in dirty:
+            step = next(compile_rows(buffer, i, i + 1, self.key_cache, self.button_cache))
+            if step is not None:
+                rows[i] = step
+                self.missing -= 1
+                
+        start = len(rows)
+        for step in compile_rows(buffer, start, len(buffer), self.key_cache, self.button_cache):
+            rows.append(step)
+            if step is None:
+                self.missing += 1
+                
+        self.recompiled = len(dirty) + len(rows) - start
+        return self.recompiled
+        
+    def steps(self):
+        """当前的步骤列表（独立的副本，之后的编辑不会影响它）"""
+        if self.missing:
+            return [step for step in self.rows if step is not None]
+        return list(self.rows)
+
+
+class HeldState:
+    """按键、鼠标按钮的按下状态和光标位置，用于从脚本中间开始播放时重建状态"""
+    
+    def __init__(self):
+        self.keys = {}  # 按下的按键（已解析），按按下顺序保存
+        self.buttons = {}  # 按下的鼠标按钮（已解析） -> 按下时的坐标
+        self.x = None  # 最后一个鼠标操作的坐标
+        self.y = None
+        
+    def update(self, step):
+        """按一个步骤更新状态"""
+        op = step[1]
+        if op == OP_KEY_PRESS:
+            self.keys[step[3]] = None
+        elif op == OP_KEY_RELEASE:
+            self.keys.pop(step[3], None)
+        else:
+            self.x = step[3]
+            self.y = step[4]
+            if op == OP_MOUSE_DOWN:
+                self.buttons[step[5]] = (step[3], step[4])
+            elif op == OP_MOUSE_UP:
+                self.buttons.pop(step[5], None)
+                
+    def scan(self, steps, start, end):
+        """按步骤列表steps[start:end]更新状态
+        
+        按键状态只与按键/按钮操作有关，占绝大多数的鼠标移动直接跳过；
+        光标位置只需从后向前找到最后一个鼠标操作。
+        """
+        update = self.update
+        for step in islice(steps, start, end):
+            if step[1] != OP_MOUSE_MOVE:
+                update(step)
+        for i in range(end - 1, start - 1, -1):
+            if steps[i][1] >= OP_MOUSE_MOVE:
+                self.x = steps[i][3]
+                self.y = steps[i][4]
+                break
+                
+    def restore_steps(self, action_time, handlers):
+        """恢复该状态的步骤：按下仍处于按下状态的按钮和按键，再移动到最后的光标位置
+        
+        按钮在按下时的坐标处按下，光标移动放在最后，从拖动中间开始播放时光标停在最后记录的位置
+        
+        Args:
+            action_time: 步骤的时间
+            handlers: 按操作码索引的处理方法
+            
+        Returns:
+            list: 步骤列表
+        """
+        steps = []
+        for button, (x, y) in self.buttons.items():
+            steps.append((action_time, OP_MOUSE_DOWN, handlers[OP_MOUSE_DOWN], x, y, button))
+        for key in self.keys:
+            steps.append((action_time, OP_KEY_PRESS, handlers[OP_KEY_PRESS], key))
+        if self.x is not None:
+            steps.append((action_time, OP_MOUSE_MOVE, handlers[OP_MOUSE_MOVE], self.x, self.y))
+        return steps
+        
+    def release_steps(self, action_time, handlers):
+        """释放所有仍处于按下状态的按键和按钮的步骤（后按下的先释放）
+        
+        Args:
+            action_time: 步骤的时间
+            handlers: 按操作码索引的处理方法
+            
+        Returns:
+            list: 步骤列表
+        """
+        steps = []
+        for key in reversed(list(self.keys)):
+            steps.append((action_time, OP_KEY_RELEASE, handlers[OP_KEY_RELEASE], key))
+        for button in reversed(list(self.buttons)):
+            steps.append((action_time, OP_MOUSE_UP, handlers[OP_MOUSE_UP], self.x, self.y, button))
+        return steps
+
+
+def _bisect_steps(steps, action_time):
+    """在按时间排序的步骤列表中查找第一个时间不早于action_time的位置"""
+    lo, hi = 0, len(steps)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if steps[mid][0] < action_time:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
 
-# 设置pyautogui的安全特性
-pyautogui.FAILSAFE = True  # 将鼠标移动到屏幕左上角将中断程序
-pyautogui.PAUSE = 0.01  # 每次PyAutoGUI函数调用后暂停的秒数
 
 class Player:
     """重放记录的操作的类"""
     
-    def __init__(self, config_manager=None):
-        """初始化播放器"""
+    scheduler_class = Scheduler  # 播放使用的调度器类型
+    
+    def __init__(self, config_manager=None, backend=None):
+        """初始化播放器
+        
+        Args:
+            config_manager: 配置管理器
+            backend: 输入后端，None表示在第一次播放时按配置创建
+        """
         self.playing = False
         self.stop_event = threading.Event()
         self.config_manager = config_manager
+        self.backend = backend
+        self.scheduler = None
+        self.last_stats = None  # 最近一次播放的抖动统计
+        self.last_rate = None  # 最近一次播放的实际倍速
+        
+        # 倍速和最大间隔由调度器应用，不修改脚本中的时间
+        self.speed = clamp_speed(config_manager.get_playback_setting("speed") if config_manager else 1.0)
+        self.max_gap = config_manager.get_playback_setting("max_gap") if config_manager else None
+        
+        # 低延迟模式：光标位置保存在本地，不再每次移动前查询，安全角按固定间隔检查
+        self.low_latency = bool(config_manager and config_manager.get_playback_setting("low_latency"))
+        self.failsafe_interval = (config_manager.get_playback_setting("failsafe_interval")
+                                  if config_manager else 0.05)
+        self.failsafe_triggered = False
+        self.cursor_x = 0
+        self.cursor_y = 0
+        self._next_failsafe_check = 0.0
+        
+        # 低延迟模式下，截止时间相差不超过batch_window秒的操作合并为一批，一次注入调用完成
+        self.batch_window = (config_manager.get_playback_setting("batch_window")
+                             if config_manager else 0.001)
+        self.batch_stats = BatchStats()
+        self.last_batch_stats = None  # 最近一次播放的批量注入统计
+        
+        # 按操作码索引的分派表：普通模式直接执行，低延迟模式转换为后端事件
+        self._run_handlers = (self._run_key_press, self._run_key_release, self._run_mouse_move,
+                              self._run_mouse_down, self._run_mouse_up, self._run_mouse_scroll)
+        self._emit_handlers = (self._emit_key_press, self._emit_key_release, self._emit_mouse_move,
+                               self._emit_mouse_down, self._emit_mouse_up, self._emit_mouse_scroll)
+        self._step_cache = None  # 最近一次compile_buffer的逐行编译结果
+        self.tracer = None  # 设置为tracing.Tracer时记录每组操作的截止时间和执行耗时
+        
+    def _create_backend(self):
+        """根据配置创建输入后端"""
+        name = "pyautogui"
+        if self.config_manager:
+            name = self.config_manager.get_playback_setting("backend") or name
+        return create_backend(name, low_latency=self.low_latency)
+        
+    def _create_scheduler(self, speed=None):
+        """根据配置创建调度器
+        
+        Args:
+            speed: 本次播放的倍速，None表示使用配置中的倍速
+        """
+        speed = self.speed if speed is None else speed
+        if self.config_manager:
+            return self.scheduler_class(
+                lateness_policy=self.config_manager.get_playback_setting("lateness_policy"),
+                spin_threshold=self.config_manager.get_playback_setting("spin_threshold"),
+                skip_threshold=self.config_manager.get_playback_setting("skip_threshold"),
+                stop_event=self.stop_event,
+                speed=speed,
+                max_gap=self.max_gap
+            )
+        return self.scheduler_class(stop_event=self.stop_event, speed=speed, max_gap=self.max_gap)
         
-    def play(self, script, repeat=1, interval=0.1, record_stop_key=False):
+    def play(self, script, repeat=1, interval=0.1, record_stop_key=False, start_delay=1.0,
+             start=None, end=None, speed=None):
         """播放脚本
         
         Args:
-            script: 要播放的脚本（操作列表）
+            script: 要播放的脚本（操作列表、ActionBuffer、CompiledScript，
+                或ScriptStream等可重复迭代的脚本源）
             repeat: 重复次数
             interval: 每次重复之间的间隔（秒）
             record_stop_key: 是否在播放结束后录制停止快捷键
+            start_delay: 开始播放前的等待时间（秒）
+            start: 只播放时间不早于该值的操作（脚本时间，秒），None表示从头开始
+            end: 只播放时间早于该值的操作（脚本时间，秒），None表示播放到结尾
+            speed: 播放倍速（0.1到50），None表示使用配置中的倍速
         """
         if not script:
             return
             
+        # 一次性迭代器在第二轮时已经耗尽，重复播放需要可重复迭代的脚本源
+        if repeat > 1 and iter(script) is script:
+            raise ValueError("单次迭代器无法重复播放，请传入可重复迭代的脚本源")
+            
+        if self.backend is None:
+            self.backend = self._create_backend()
+            
+        # 先编译并创建调度器，出错时不改变播放状态
+        compiled = self._compile_for_play(script, start, end)
+        scheduler = self._create_scheduler(speed)
+        
         self.playing = True
         self.stop_event.clear()
+        self.failsafe_triggered = False
+        self.scheduler = scheduler
+        self.batch_stats.reset()
         
         try:
             # 等待一小段时间，让用户有机会切换到目标窗口
-            time.sleep(1)
+            if start_delay > 0:
+                time.sleep(start_delay)
             
             # 重复执行指定次数
             for _ in range(repeat):
@@ -49,7 +329,12 @@ class Player:
                     break
                     
                 # 执行一次脚本
-                self._play_once(script)
+                if compiled is not None:
+                    self._play_once(compiled)
+                elif start is not None or end is not None:
+                    self._play_once(self._seek_stream(self.iter_steps(script), start, end))
+                else:
+                    self._play_once(self.iter_steps(script))
                 
                 # 如果不是最后一次重复，则等待指定的间隔
                 if _ < repeat - 1 and not self.stop_event.is_set():
@@ -60,7 +345,37 @@ class Player:
                 self._simulate_stop_hotkey()
         finally:
             self.playing = False
+            self.last_stats = self.scheduler.stats.summary()
+            self.last_rate = self.scheduler.effective_rate()
+            rate = f", 实际倍速 {self.last_rate:.2f}x" if self.last_rate else ""
+            print(f"播放统计: {self.scheduler.stats.format_summary()}{rate}")
+            if self.low_latency:
+                self.last_batch_stats = self.batch_stats.summary()
+                print(f"注入统计: {self.batch_stats.format_summary()}")
             
+    def _compile_for_play(self, script, start, end):
+        """播放前编译脚本并截取播放范围
+        
+        内存中的脚本在播放前编译一次，重复播放时不再解析操作和按键；
+        流式脚本源边读边编译，避免一次性载入，此时返回None。
+        
+        Args:
+            script: 要播放的脚本
+            start, end: 播放范围，见play
+            
+        Returns:
+            list: 步骤列表，流式脚本源返回None
+        """
+        if isinstance(script, CompiledScript):
+            compiled = script.steps
+        elif isinstance(script, (list, tuple, ActionBuffer)):
+            compiled = self.compile(script)
+        else:
+            return None
+        if start is not None or end is not None:
+            compiled = self.seek(compiled, start, end)
+        return compiled
+        
     def _simulate_stop_hotkey(self):
         """模拟按下停止快捷键"""
         if not self.config_manager:
@@ -73,8 +388,7 @@ class Player:
             
         try:
             # 模拟按下停止快捷键
-            # 使用keyboard库模拟按键，因为它支持组合键
-            keyboard.press_and_release(stop_hotkey.replace("-", "+").lower())
+            self.backend.press_hotkey(stop_hotkey)
             
             # 添加一个小延迟，确保快捷键被处理
             time.sleep(0.1)
@@ -85,128 +399,398 @@ class Player:
         """停止播放"""
         self.stop_event.set()
         
-    def _play_once(self, script):
-        """执行一次脚本
+    def compile(self, script):
+        """把脚本编译为步骤列表
         
         Args:
-            script: 要播放的脚本（操作列表）
+            script: 操作序列（字典列表、ActionBuffer等）
+            
+        Returns:
+            list: 步骤元组列表，见iter_steps
         """
-        if not script:
-            return
+        return list(self.iter_steps(script))
+        
+    def compile_buffer(self, buffer):
+        """编译ActionBuffer，复用上一次对同一缓冲区的编译结果，只重新编译被编辑过的行
+        
+        Args:
+            buffer: 操作缓冲区
             
-        # 获取第一个操作的时间作为基准
-        base_time = script[0].get("time", 0)
-        last_time = base_time
+        Returns:
+            CompiledScript: 可直接传给play的步骤列表
+        """
+        if self.backend is None:
+            self.backend = self._create_backend()
+        cache = self._step_cache
+        if cache is None or cache.buffer is not buffer or cache.backend is not self.backend:
+            cache = self._step_cache = StepCache(self, buffer)
+        cache.sync()
+        return CompiledScript(cache.steps())
         
-        # 按时间顺序执行每个操作
-        for action in script:
-            if self.stop_event.is_set():
-                break
-                
-            # 计算需要等待的时间
-            current_time = action.get("time", 0)
-            wait_time = current_time - last_time
+    def seek(self, steps, start=None, end=None):
+        """截取时间范围[start, end)内的步骤，并重建范围开始时的按键状态
+        
+        开头插入恢复步骤：移动到范围之前最后的光标位置，按下此时仍按住的按钮和按键；
+        末尾插入释放步骤：释放范围结束时仍按住的按键和按钮，避免部分播放后按键卡住。
+        
+        Args:
+            steps: 按时间排序的步骤列表（compile的结果）
+            start: 开始时间（脚本时间，秒），None表示从头开始
+            end: 结束时间（脚本时间，秒，不含），None表示到结尾
             
-            # 等待适当的时间
-            if wait_time > 0:
-                time.sleep(wait_time)
-                
-            # 执行操作
-            self._execute_action(action)
+        Returns:
+            list: 新的步骤列表
+        """
+        first = _bisect_steps(steps, start) if start is not None else 0
+        last = max(first, _bisect_steps(steps, end)) if end is not None else len(steps)
+        if first == 0 and last == len(steps):
+            return steps
+        if first == last:
+            return []
+        handlers = self._emit_handlers if self.low_latency else self._run_handlers
+        
+        state = HeldState()
+        state.scan(steps, 0, first)
+        start_time = start if start is not None else steps[first][0]
+        result = state.restore_steps(start_time, handlers)
+        
+        result.extend(steps[first:last])
+        state.scan(steps, first, last)
+        # 被截断时在结束时间释放（原脚本中的释放在此之后），否则紧接最后一个操作释放
+        end_time = end if last < len(steps) else (steps[last - 1][0] if last else start_time)
+        result.extend(state.release_steps(end_time, handlers))
+        return result
+        
+    def _seek_stream(self, steps, start, end):
+        """seek的流式版本：逐个读取步骤，不需要预先编译整个脚本
+        
+        Args:
+            steps: 按时间排序的步骤迭代器
+            start: 开始时间，None表示从头开始
+            end: 结束时间（不含），None表示到结尾
             
-            # 更新上一次操作的时间
-            last_time = current_time
+        Yields:
+            tuple: 步骤
+        """
+        handlers = self._emit_handlers if self.low_latency else self._run_handlers
+        state = HeldState()
+        started = False
+        last_time = start
+        for step in steps:
+            if start is not None and step[0] < start:
+                state.update(step)
+                continue
+            if end is not None and step[0] >= end:
+                last_time = end
+                break
+            if not started:
+                yield from state.restore_steps(start if start is not None else step[0], handlers)
+                started = True
+            state.update(step)
+            last_time = step[0]
+            yield step
+        if started:
+            yield from state.release_steps(last_time, handlers)
             
-    def _execute_action(self, action):
-        """执行单个操作
+    def iter_steps(self, script):
+        """逐个把操作转换为步骤元组，按键和按钮已由当前后端解析
+        
+        步骤格式（第二项为action_buffer中的操作码，第三项为按当前模式绑定的处理方法）:
+            (时间, OP_KEY_PRESS/OP_KEY_RELEASE, 处理方法, 按键)
+            (时间, OP_MOUSE_MOVE, 处理方法, x, y)
+            (时间, OP_MOUSE_DOWN/OP_MOUSE_UP, 处理方法, x, y, 按钮)
+            (时间, OP_MOUSE_SCROLL, 处理方法, x, y, dx, dy)
+        没有键名或键名无法被后端解析的按键操作会被丢弃。
         
         Args:
-            action: 要执行的操作
+            script: 可迭代的操作序列
+            
+        Yields:
+            tuple: 步骤
         """
-        action_type = action.get("type", "")
+        backend = self.backend
+        key_cache = {}
+        button_cache = {}
+        handlers = self._emit_handlers if self.low_latency else self._run_handlers
         
-        if action_type == "key_press":
-            key = action.get("key", "")
-            if key:
-                try:
-                    pyautogui.keyDown(key)
-                except Exception as e:
-                    print(f"按键按下错误: {key} - {str(e)}")
-                    
-        elif action_type == "key_release":
-            key = action.get("key", "")
-            if key:
-                try:
-                    pyautogui.keyUp(key)
-                except Exception as e:
-                    print(f"按键释放错误: {key} - {str(e)}")
-                    
-        elif action_type == "mouse_move":
-            x = action.get("x", 0)
-            y = action.get("y", 0)
+        if isinstance(script, ActionBuffer):
+            for step in self._buffer_rows(script, 0, len(script), key_cache, button_cache):
+                if step is not None:
+                    yield step
+            return
             
-            # 获取当前鼠标位置
-            current_x, current_y = pyautogui.position()
+        for action in script:
+            op = action_opcode(action)
+            if op is None:
+                continue
+            current_time = action.get("time", 0)
+            if op == OP_MOUSE_MOVE:
+                yield (current_time, op, handlers[op], action.get("x", 0), action.get("y", 0))
+            elif op == OP_KEY_PRESS or op == OP_KEY_RELEASE:
+                key = self._resolve(key_cache, backend.resolve_key, action.get("key", ""))
+                if key is not None:
+                    yield (current_time, op, handlers[op], key)
+            elif op == OP_MOUSE_DOWN or op == OP_MOUSE_UP:
+                button = self._resolve(button_cache, backend.resolve_button, action.get("button", "left"))
+                yield (current_time, op, handlers[op], action.get("x", 0), action.get("y", 0), button)
+            else:
+                yield (current_time, op, handlers[op], action.get("x", 0), action.get("y", 0),
+                       action.get("dx", 0), action.get("dy", 0))
+                       
+    def _buffer_rows(self, buffer, start, end, key_cache, button_cache):
+        """逐行把缓冲区[start, end)编译为步骤，按键无法解析的行产生None
+        
+        Args:
+            buffer: ActionBuffer
+            start, end: 行范围
+            key_cache, button_cache: 按名称缓存的后端解析结果
             
-            # 计算相对移动
-            dx = x - current_x
-            dy = y - current_y
+        Yields:
+            tuple: 步骤或None
+        """
+        backend = self.backend
+        handlers = self._emit_handlers if self.low_latency else self._run_handlers
+        keys = buffer.keys
+        columns = (buffer.times, buffer.ops, buffer.key_ids, buffer.xs, buffer.ys, buffer.dxs, buffer.dys)
+        if start != 0 or end != len(buffer):
+            columns = [column[start:end] for column in columns]
             
-            try:
-                # 使用相对移动而不是绝对位置移动
-                # 这对于游戏中的视角控制更有效
-                if dx != 0 or dy != 0:
-                    # 使用dragRel模拟鼠标拖拽，这在游戏中更有效
-                    pyautogui.dragRel(dx, dy, duration=0.01, button='middle')
-                    
-                    # 备选方法：使用鼠标按下状态下的移动
-                    # pyautogui.mouseDown(button='right')  # 按下右键
-                    # pyautogui.moveRel(dx, dy)  # 相对移动
-                    # pyautogui.mouseUp(button='right')  # 释放右键
-            except Exception as e:
-                print(f"鼠标移动错误: {x},{y} - {str(e)}")
-                
-        elif action_type == "mouse_click":
-            x = action.get("x", 0)
-            y = action.get("y", 0)
-            button = action.get("button", "left")
-            pressed = action.get("pressed", False)
-            
-            # 将pynput的按钮名称转换为pyautogui的按钮名称
-            if button == "left":
-                button_name = "left"
-            elif button == "right":
-                button_name = "right"
-            elif button == "middle":
-                button_name = "middle"
+        # 直接读取列数组，每个键表项只解析一次；步骤中的时间换算为秒
+        for time_us, op, key_id, x, y, dx, dy in zip(*columns):
+            current_time = time_us / US_PER_SECOND
+            if op == OP_MOUSE_MOVE:
+                yield (current_time, op, handlers[op], x, y)
+            elif op == OP_KEY_PRESS or op == OP_KEY_RELEASE:
+                key = self._resolve(key_cache, backend.resolve_key,
+                                    keys[key_id] if key_id != NO_KEY else "")
+                yield (current_time, op, handlers[op], key) if key is not None else None
+            elif op == OP_MOUSE_DOWN or op == OP_MOUSE_UP:
+                button = self._resolve(button_cache, backend.resolve_button,
+                                       keys[key_id] if key_id != NO_KEY else "left")
+                yield (current_time, op, handlers[op], x, y, button)
             else:
-                button_name = "left"  # 默认为左键
+                yield (current_time, op, handlers[op], x, y, dx, dy)
                 
+    def _resolve(self, cache, resolve, name):
+        """通过后端解析按键或按钮名称，结果按名称缓存，无法解析时返回None"""
+        try:
+            return cache[name]
+        except KeyError:
+            pass
+        value = None
+        if name:
             try:
-                # 移动到位置
-                pyautogui.moveTo(x, y)
-                
-                # 按下或释放
-                if pressed:
-                    pyautogui.mouseDown(button=button_name)
-                else:
-                    pyautogui.mouseUp(button=button_name)
+                value = resolve(name)
             except Exception as e:
-                print(f"鼠标点击错误: {x},{y},{button},{pressed} - {str(e)}")
-                
-        elif action_type == "mouse_scroll":
-            x = action.get("x", 0)
-            y = action.get("y", 0)
-            dx = action.get("dx", 0)
-            dy = action.get("dy", 0)
+                print(f"无法解析按键: {name} - {str(e)}")
+        cache[name] = value
+        return value
+        
+    def _play_once(self, steps):
+        """执行一次脚本
+        
+        Args:
+            steps: 步骤序列（compile的结果或iter_steps生成器）
+        """
+        for group, group_time in self._groups(steps):
+            self._run_group(group, group_time)
             
-            try:
-                # 移动到位置
-                pyautogui.moveTo(x, y)
+    def _groups(self, steps):
+        """把步骤分成按同一截止时间执行的组，停止后不再产生
+        
+        第一个步骤的时间作为调度器时间线的基准；未启用批量注入时每组只有一个步骤。
+        
+        Args:
+            steps: 步骤序列
+            
+        Yields:
+            tuple: (步骤列表, 组内第一个步骤的时间)
+        """
+        scheduler = self.scheduler
+        started = False
+        window = None
+        if self.low_latency:
+            self._sync_cursor(time.perf_counter())
+            if self.batch_window is not None and self.batch_window >= 0:
+                # 合并窗口是实际时间，换算为脚本时间
+                window = self.batch_window * scheduler.speed
+        
+        group = []
+        group_time = 0
+        for step in steps:
+            if self.stop_event.is_set():
+                return
                 
-                # 滚动
-                # pyautogui的scroll函数正值向上滚动，负值向下滚动
-                # 而pynput的dy正值向上滚动，负值向下滚动，所以直接使用
-                pyautogui.scroll(int(dy * 10))  # 乘以一个系数使滚动更明显
-            except Exception as e:
-                print(f"鼠标滚轮错误: {x},{y},{dx},{dy} - {str(e)}")
+            current_time = step[0]
+            if not started:
+                # 第一个操作的时间作为时间线的基准
+                scheduler.start(current_time)
+                started = True
+                
+            if group and window is not None and current_time - group_time <= window:
+                group.append(step)
+                continue
+                
+            if group:
+                yield group, group_time
+            group = [step]
+            group_time = current_time
+            
+        if group and not self.stop_event.is_set():
+            yield group, group_time
+            
+    def _run_group(self, group, group_time):
+        """等待到一组步骤的截止时间后执行
+        
+        Args:
+            group: 步骤列表
+            group_time: 组内第一个步骤的时间
+        """
+        # 按绝对截止时间执行每一组步骤，执行本身的耗时不会累积成漂移；
+        # 迟到的鼠标移动可按策略跳过（整组都是鼠标移动时才跳过）
+        skippable = all(step[1] == OP_MOUSE_MOVE for step in group)
+        if not self.scheduler.wait(group_time, skippable=skippable):
+            if self.tracer is not None:
+                self._trace_skip(group)
+            return
+            
+        # 执行操作
+        if self.tracer is None:
+            self._dispatch(group)
+        else:
+            self._traced_dispatch(group)
+            
+    def _traced_dispatch(self, group):
+        """执行一组步骤，并记录截止时间、开始时刻、执行耗时和组内操作数"""
+        start = time.perf_counter()
+        self._dispatch(group)
+        self.tracer.record(TRACE_PLAY, OP_TYPES[group[0][1]], self.scheduler.last_deadline,
+                           start, time.perf_counter() - start, size=len(group))
+        
+    def _trace_skip(self, group):
+        """记录一组因迟到被跳过的步骤（被停止时不记录）"""
+        if not self.stop_event.is_set():
+            self.tracer.record(TRACE_SKIP, OP_TYPES[group[0][1]], self.scheduler.last_deadline,
+                               time.perf_counter(), 0.0, size=len(group))
+        
+    def _dispatch(self, group):
+        """按分派表执行一组步骤
+        
+        Args:
+            group: 步骤列表
+        """
+        if not self.low_latency:
+            for step in group:
+                try:
+                    step[2](step)
+                except Exception as e:
+                    print(f"执行操作错误: {OP_TYPES[step[1]]} {step[3:]} - {str(e)}")
+            return
+            
+        now = time.perf_counter()
+        if now >= self._next_failsafe_check and not self._sync_cursor(now):
+            return
+            
+        events = []
+        for step in group:
+            step[2](step, events)
+        if not events:
+            return
+            
+        start = time.perf_counter()
+        try:
+            self.backend.send_batch(events)
+        except Exception as e:
+            print(f"注入错误: {events} - {str(e)}")
+        self.batch_stats.add(len(group), time.perf_counter() - start)
+        
+    def _sync_cursor(self, now):
+        """查询真实光标位置：同步本地光标状态，并检查安全角
+        
+        Args:
+            now: 当前perf_counter时间
+            
+        Returns:
+            bool: 光标在屏幕左上角时返回False并停止播放
+        """
+        self._next_failsafe_check = now + self.failsafe_interval
+        try:
+            self.cursor_x, self.cursor_y = self.backend.position()
+        except Exception as e:
+            print(f"获取鼠标位置错误: {str(e)}")
+            return True
+        # 与PyAutoGUI的安全功能一致只检查(0, 0)：主显示器左侧或上方的显示器坐标为负数
+        if self.cursor_x == 0 and self.cursor_y == 0:
+            print("鼠标位于屏幕左上角，安全停止播放")
+            self.failsafe_triggered = True
+            self.stop_event.set()
+            return False
+        return True
+        
+    # 普通模式：每个步骤直接调用后端
+    
+    def _run_key_press(self, step):
+        self.backend.key_down(step[3])
+        
+    def _run_key_release(self, step):
+        self.backend.key_up(step[3])
+        
+    def _run_mouse_move(self, step):
+        backend = self.backend
+        
+        # 获取当前鼠标位置，计算相对移动
+        current_x, current_y = backend.position()
+        dx = step[3] - current_x
+        dy = step[4] - current_y
+        
+        # 使用相对移动而不是绝对位置移动，这对于游戏中的视角控制更有效
+        if dx != 0 or dy != 0:
+            backend.move_rel(dx, dy)
+            
+    def _run_mouse_down(self, step):
+        self.backend.move_to(step[3], step[4])
+        self.backend.mouse_down(step[5])
+        
+    def _run_mouse_up(self, step):
+        self.backend.move_to(step[3], step[4])
+        self.backend.mouse_up(step[5])
+        
+    def _run_mouse_scroll(self, step):
+        # pynput记录的dy正值向上滚动，与后端约定一致
+        self.backend.move_to(step[3], step[4])
+        self.backend.scroll(step[5], step[6])
+        
+    # 低延迟模式：不查询光标位置，鼠标移动转换为相对于本地光标状态的位移，
+    # 本地状态每隔failsafe_interval秒由_sync_cursor用真实位置校正
+    
+    def _emit_key_press(self, step, events):
+        events.append(("key_down", step[3]))
+        
+    def _emit_key_release(self, step, events):
+        events.append(("key_up", step[3]))
+        
+    def _emit_mouse_move(self, step, events):
+        dx = step[3] - self.cursor_x
+        dy = step[4] - self.cursor_y
+        if dx != 0 or dy != 0:
+            events.append(("move_rel", dx, dy))
+            self.cursor_x = step[3]
+            self.cursor_y = step[4]
+            
+    def _emit_position(self, step, events):
+        if step[3] != self.cursor_x or step[4] != self.cursor_y:
+            events.append(("move_to", step[3], step[4]))
+            self.cursor_x = step[3]
+            self.cursor_y = step[4]
+            
+    def _emit_mouse_down(self, step, events):
+        self._emit_position(step, events)
+        events.append(("mouse_down", step[5]))
+        
+    def _emit_mouse_up(self, step, events):
+        self._emit_position(step, events)
+        events.append(("mouse_up", step[5]))
+        
+    def _emit_mouse_scroll(self, step, events):
+        self._emit_position(step, events)
+        events.append(("scroll", step[5], step[6]))
@@ -3,12 +3,168 @@
 
 """
 按键精灵 - 记录器
-负责记录用户的键盘和鼠标操作
+负责记录用户的键盘和鼠标操作。
+系统钩子线程中的事件处理方法只把事件作为元组放入定长的环形队列，
+按键名称的格式化、停止键判断、鼠标移动过滤和回调都在单独的消费者线程中完成，
+回调再慢也不会拖住系统的低级钩子
 """
 
 import time
 import threading
-from pynput import keyboard, mouse
+from move_filter import MoveFilter
+from tracing import TRACE_RECORD
+from action_buffer import (
+    OP_KEY_PRESS, OP_KEY_RELEASE, OP_MOUSE_MOVE, OP_MOUSE_DOWN, OP_MOUSE_UP, OP_MOUSE_SCROLL, US_PER_SECOND
+)
+
+# 消费者线程检查事件队列的间隔（秒）
+CONSUMER_INTERVAL = 0.005
+
+class EventRing:
+    """多生产者、单消费者的定长环形队列
+    
+    生产者（键盘和鼠标钩子线程）只在短暂持有锁时写入一个预先分配的槽位；
+    队列已满时丢弃新事件并计数，不会阻塞钩子。
+    """
+    
+    def __init__(self, capacity=65536):
+        """初始化队列
+        
+        Args:
+            capacity: 最多积压的事件数
+        """
+        self.capacity = max(1, int(capacity))
+        self._slots = [None] * self.capacity
+        self._head = 0  # 累计写入的事件数
+        self._tail = 0  # 累计取出的事件数（只由消费者修改）
+        self._lock = threading.Lock()
+        self.overflow = 0  # 队列已满被丢弃的事件数
+        self.max_depth = 0  # 最大积压的事件数
+        
+    def put(self, event):
+        """放入一个事件（在钩子线程中调用）
+        
+        Args:
+            event: 事件元组
+            
+        Returns:
+            bool: 队列已满时返回False
+        """
+        with self._lock:
+            depth = self._head - self._tail
+            if depth >= self.capacity:
+                self.overflow += 1
+                return False
+            self._slots[self._head % self.capacity] = event
+            self._head += 1
+            if depth >= self.max_depth:
+                self.max_depth = depth + 1
+        return True
+        
+    def drain(self):
+        """取出当前积压的全部事件（只能由一个消费者调用）
+        
+        Returns:
+            list: 按放入顺序排列的事件
+        """
+        head = self._head
+        tail = self._tail
+        if head == tail:
+            return []
+        capacity = self.capacity
+        start = tail % capacity
+        end = head % capacity
+        if start < end:
+            events = self._slots[start:end]
+        else:
+            events = self._slots[start:] + self._slots[:end]
+        # 取出之后才推进读位置，生产者在此之前不会覆盖这些槽位
+        self._tail = head
+        return events
+        
+    def __len__(self):
+        return self._head - self._tail
+        
+    @property
+    def received(self):
+        """累计收到的事件数（包括被丢弃的）"""
+        return self._head + self.overflow
+
+def key_identity(key, key_name):
+    """按键状态机中区分不同键的标识
+    
+    优先使用虚拟键码：按住Shift时按下'a'、释放'A'是同一个键
+    
+    Args:
+        key: pynput的键
+        key_name: 格式化后的键名
+        
+    Returns:
+        int或str: 虚拟键码，没有时为键名
+    """
+    vk = getattr(key, "vk", None)
+    if vk is None:
+        # 特殊键（Key枚举）的键码在value中
+        vk = getattr(getattr(key, "value", None), "vk", None)
+    return key_name if vk is None else vk
+
+class KeyState:
+    """逐键的按下/释放状态机
+    
+    记录每个键是否按住：按住期间系统自动重复产生的按下事件被过滤，
+    不同的键互不影响，快速连按或交叠按下的键都完整保留。每个事件只做一次字典操作。
+    """
+    
+    def __init__(self):
+        """初始化状态机"""
+        self.held = {}  # 键标识 -> 按下时的键名
+        self.stats = {"pressed": 0, "released": 0, "repeats": 0, "orphan_releases": 0, "auto_released": 0}
+        
+    def press(self, ident, key_name):
+        """处理按下事件
+        
+        Args:
+            ident: 键标识，见key_identity
+            key_name: 键名
+            
+        Returns:
+            bool: 是否需要记录（该键已按住时为自动重复，返回False）
+        """
+        if ident in self.held:
+            self.stats["repeats"] += 1
+            return False
+        self.held[ident] = key_name
+        self.stats["pressed"] += 1
+        return True
+        
+    def release(self, ident, key_name):
+        """处理释放事件
+        
+        Args:
+            ident: 键标识，见key_identity
+            key_name: 键名
+            
+        Returns:
+            str: 要记录的键名，沿用按下时的键名，保证回放时按下和释放的是同一个键
+        """
+        name = self.held.pop(ident, None)
+        if name is None:
+            # 记录开始前就已按住的键，释放仍然保留，回放时无害
+            self.stats["orphan_releases"] += 1
+            return key_name
+        self.stats["released"] += 1
+        return name
+        
+    def release_all(self):
+        """清空按住的键
+        
+        Returns:
+            list: 仍按住的键名，按按下顺序排列
+        """
+        names = list(self.held.values())
+        self.held.clear()
+        self.stats["auto_released"] += len(names)
+        return names
 
 class Recorder:
     """记录用户键盘和鼠标操作的类"""
@@ -16,14 +172,21 @@ class Recorder:
     def __init__(self, config_manager=None):
         """初始化记录器"""
         self.recording = False
-        self.start_time = 0
+        self.start_ns = 0  # 记录开始时的perf_counter_ns
         self.keyboard_listener = None
         self.mouse_listener = None
         self.callback = None
         self.config_manager = config_manager
         self.stop_key = None
-        self.last_key_time = 0
-        self.key_threshold = 0.05  # 50毫秒内的按键被视为同一个操作
+        self.key_state = KeyState()  # 逐键的按下状态，过滤自动重复
+        self.key_stats = None  # 最近一次记录的按键状态统计
+        self.move_filter = None
+        self.move_filter_stats = None  # 最近一次记录的鼠标移动过滤统计
+        self.events = EventRing(self._event_buffer_size())  # 钩子线程与消费者线程之间的事件队列
+        self.event_stats = None  # 最近一次记录的事件队列统计
+        self.consumer = None
+        self._consumer_stop = threading.Event()
+        self.tracer = None  # 设置为tracing.Tracer时记录每个输入事件的处理耗时
         
     def start_recording(self, callback=None):
         """开始记录
@@ -35,8 +198,12 @@ class Recorder:
             return
             
         self.recording = True
-        self.start_time = time.time()
+        self.start_ns = time.perf_counter_ns()
         self.callback = callback
+        self.move_filter = self._create_move_filter()
+        self.key_state = KeyState()
+        self.events = EventRing(self._event_buffer_size())
+        self._start_consumer()
         
         # 获取停止录制的快捷键
         if self.config_manager:
@@ -44,18 +211,24 @@ class Recorder:
         else:
             self.stop_key = "F9"  # 默认值
         
+        # pynput只在真正开始监听时导入，没有显示器时也可以直接调用各个事件处理方法
+        from pynput import keyboard, mouse
+        
+        # 启用追踪时用记录耗时的包装函数代替事件处理方法，未启用时没有额外开销
+        handlers = self._listener_handlers()
+        
         # 启动键盘监听器
         self.keyboard_listener = keyboard.Listener(
-            on_press=self._on_key_press,
-            on_release=self._on_key_release
+            on_press=handlers["key_press"],
+            on_release=handlers["key_release"]
         )
         self.keyboard_listener.start()
         
         # 启动鼠标监听器
         self.mouse_listener = mouse.Listener(
-            on_move=self._on_mouse_move,
-            on_click=self._on_mouse_click,
-            on_scroll=self._on_mouse_scroll
+            on_move=handlers["mouse_move"],
+            on_click=handlers["mouse_click"],
+            on_scroll=handlers["mouse_scroll"]
         )
         self.mouse_listener.start()
         
@@ -75,47 +248,169 @@ class Recorder:
             self.mouse_listener.stop()
             self.mouse_listener = None
             
-    def _get_current_time(self):
-        """获取当前时间（相对于记录开始的时间）"""
-        return time.time() - self.start_time
-        
-    def _on_key_press(self, key):
-        """键盘按键按下事件处理
+        # 停止消费者线程，并在当前线程中处理剩余的事件
+        self._stop_consumer()
         
-        Args:
-            key: 按下的键
-        """
-        if not self.recording:
-            return
+        # 输出过滤器中缓存的最后一段轨迹
+        if self.move_filter:
+            self._flush_moves()
+            self.move_filter_stats = dict(self.move_filter.stats)
             
-        try:
-            # 尝试获取字符
-            char = key.char
-            key_name = char
-        except AttributeError:
-            # 特殊键
-            key_name = str(key).replace("Key.", "")
+        # 停止时仍按住的键（例如组合停止键中的修饰键）补上释放，回放后不会卡住
+        self._release_held_keys()
+        self.key_stats = dict(self.key_state.stats)
             
-        # 检查是否是停止录制的快捷键
-        if self._is_stop_key(key_name):
-            # 如果是停止键，不记录这个按键
-            return
+    def _event_buffer_size(self):
+        """事件队列的容量"""
+        if self.config_manager:
+            return self.config_manager.get_recording_setting("event_buffer_size")
+        return 65536
+        
+    def _start_consumer(self):
+        """启动消费者线程"""
+        self._consumer_stop.clear()
+        self.consumer = threading.Thread(target=self._consume, daemon=True)
+        self.consumer.start()
+        
+    def _stop_consumer(self):
+        """停止消费者线程，处理剩余的事件并保存队列统计"""
+        if self.consumer:
+            self._consumer_stop.set()
+            self.consumer.join()
+            self.consumer = None
+        self.drain()
+        events = self.events
+        self.event_stats = {"received": events.received, "overflow": events.overflow,
+                            "max_depth": events.max_depth}
+        if events.overflow:
+            print(f"记录事件队列已满，丢弃了 {events.overflow} 个事件")
             
-        # 检查按键时间间隔，避免重复记录
-        current_time = self._get_current_time()
-        if current_time - self.last_key_time < self.key_threshold:
-            return
+    def _consume(self):
+        """消费者线程：定时取出钩子放入队列的事件并处理"""
+        while not self._consumer_stop.wait(CONSUMER_INTERVAL):
+            self.drain()
             
-        self.last_key_time = current_time
+    def drain(self):
+        """处理队列中积压的事件：格式化、过滤并交给回调
+        
+        由消费者线程定时调用；消费者线程未运行时（停止记录后、或直接调用事件处理方法时）可以在调用线程中处理
+        
+        Returns:
+            int: 处理的事件数
+        """
+        events = self.events.drain()
+        for event in events:
+            try:
+                self._process(event)
+            except Exception as e:
+                print(f"处理记录事件错误: {event} - {str(e)}")
+        return len(events)
+        
+    def _process(self, event):
+        """处理一个事件元组
+        
+        Args:
+            event: (操作码, 时间（微秒）, ...)，见各事件处理方法
+        """
+        op = event[0]
+        # 操作字典中的时间是秒，由整数微秒换算而来，存入缓冲区时可以无误差地还原
+        current_time = event[1] / US_PER_SECOND
+        if op == OP_MOUSE_MOVE:
+            self._process_move(event[2], event[3], current_time)
+        elif op <= OP_KEY_RELEASE:
+            self._process_key(op, event[2], current_time)
+        elif op == OP_MOUSE_SCROLL:
+            self._process_scroll(event[2], event[3], event[4], event[5], current_time)
+        else:
+            self._process_click(event[2], event[3], event[4], op == OP_MOUSE_DOWN, current_time)
             
+    def _listener_handlers(self):
+        """监听器使用的事件处理函数
+        
+        Returns:
+            dict: 事件名称 -> 处理函数
+        """
+        handlers = {
+            "key_press": self._on_key_press,
+            "key_release": self._on_key_release,
+            "mouse_move": self._on_mouse_move,
+            "mouse_click": self._on_mouse_click,
+            "mouse_scroll": self._on_mouse_scroll,
+        }
+        if self.tracer is not None:
+            handlers = {name: self._traced(name, handler) for name, handler in handlers.items()}
+        return handlers
+        
+    def _traced(self, name, handler):
+        """包装事件处理函数，记录每次调用的开始时刻和耗时"""
+        tracer = self.tracer
+        
+        def traced(*args):
+            start = time.perf_counter()
+            try:
+                return handler(*args)
+            finally:
+                tracer.record(TRACE_RECORD, name, None, start, time.perf_counter() - start, len(self.events))
+                
+        return traced
+        
+    def _create_move_filter(self):
+        """根据配置创建鼠标移动过滤器，未启用时返回None"""
+        if not self.config_manager:
+            return MoveFilter()
+        if not self.config_manager.get_recording_setting("move_filter"):
+            return None
+        return MoveFilter(
+            min_distance=self.config_manager.get_recording_setting("min_move_distance"),
+            min_interval=self.config_manager.get_recording_setting("min_move_interval"),
+            rdp_epsilon=self.config_manager.get_recording_setting("rdp_epsilon"),
+            window_size=self.config_manager.get_recording_setting("rdp_window"),
+            idle_time=self.config_manager.get_recording_setting("idle_time")
+        )
+        
+    def _emit_move(self, x, y, t):
+        """输出一个鼠标移动操作"""
         action = {
-            "type": "key_press",
-            "key": key_name,
-            "time": current_time
+            "type": "mouse_move",
+            "x": x,
+            "y": y,
+            "time": t
         }
         
+        self._deliver(action)
+        
+    def _deliver(self, action):
+        """把记录的操作交给回调（在消费者线程中调用）"""
         if self.callback:
-            self.callback(action)
+            try:
+                self.callback(action)
+            except Exception as e:
+                print(f"记录回调错误: {str(e)}")
+                
+    def _flush_moves(self):
+        """在其他操作之前输出过滤器中缓存的鼠标移动，保持操作顺序"""
+        if not self.move_filter:
+            return
+        for point in self.move_filter.flush():
+            self._emit_move(*point)
+            
+    def _get_current_time(self):
+        """获取当前时间（相对于记录开始的整数微秒）
+        
+        使用单调的高精度计时器，不受系统时间调整影响
+        """
+        return (time.perf_counter_ns() - self.start_ns) // 1000
+        
+    # 系统钩子线程中的事件处理方法：只记录时间并放入队列
+    
+    def _on_key_press(self, key):
+        """键盘按键按下事件处理
+        
+        Args:
+            key: 按下的键
+        """
+        if self.recording:
+            self.events.put((OP_KEY_PRESS, self._get_current_time(), key))
             
     def _on_key_release(self, key):
         """键盘按键释放事件处理
@@ -123,9 +418,53 @@ class Recorder:
         Args:
             key: 释放的键
         """
-        if not self.recording:
-            return
+        if self.recording:
+            self.events.put((OP_KEY_RELEASE, self._get_current_time(), key))
+            
+    def _on_mouse_move(self, x, y):
+        """鼠标移动事件处理
+        
+        Args:
+            x: 鼠标X坐标
+            y: 鼠标Y坐标
+        """
+        if self.recording:
+            self.events.put((OP_MOUSE_MOVE, self._get_current_time(), x, y))
             
+    def _on_mouse_click(self, x, y, button, pressed):
+        """鼠标点击事件处理
+        
+        Args:
+            x: 鼠标X坐标
+            y: 鼠标Y坐标
+            button: 按下的按钮
+            pressed: 是否按下（True为按下，False为释放）
+        """
+        if self.recording:
+            self.events.put((OP_MOUSE_DOWN if pressed else OP_MOUSE_UP, self._get_current_time(), x, y, button))
+            
+    def _on_mouse_scroll(self, x, y, dx, dy):
+        """鼠标滚轮事件处理
+        
+        Args:
+            x: 鼠标X坐标
+            y: 鼠标Y坐标
+            dx: 水平滚动量
+            dy: 垂直滚动量
+        """
+        if self.recording:
+            self.events.put((OP_MOUSE_SCROLL, self._get_current_time(), x, y, dx, dy))
+            
+    # 消费者线程中的处理方法
+    
+    def _process_key(self, op, key, current_time):
+        """处理按键按下或释放
+        
+        Args:
+            op: OP_KEY_PRESS 或 OP_KEY_RELEASE
+            key: 按下或释放的键
+            current_time: 事件时间
+        """
         try:
             # 尝试获取字符
             char = key.char
@@ -139,21 +478,31 @@ class Recorder:
             # 如果是停止键，不记录这个按键
             return
             
-        # 检查按键时间间隔，避免重复记录
-        current_time = self._get_current_time()
-        if current_time - self.last_key_time < self.key_threshold:
-            return
-            
-        self.last_key_time = current_time
+        # 逐键判断：按住不放时系统重复发送的按下事件只保留第一次，不同的键互不影响
+        ident = key_identity(key, key_name)
+        if op == OP_KEY_PRESS:
+            if not self.key_state.press(ident, key_name):
+                return
+        else:
+            key_name = self.key_state.release(ident, key_name)
             
         action = {
-            "type": "key_release",
+            "type": "key_press" if op == OP_KEY_PRESS else "key_release",
             "key": key_name,
             "time": current_time
         }
         
-        if self.callback:
-            self.callback(action)
+        self._flush_moves()
+        self._deliver(action)
+        
+    def _release_held_keys(self):
+        """为仍按住的键输出释放操作（时间为当前时间）"""
+        names = self.key_state.release_all()
+        if not names:
+            return
+        current_time = self._get_current_time() / US_PER_SECOND
+        for key_name in names:
+            self._deliver({"type": "key_release", "key": key_name, "time": current_time})
             
     def _is_stop_key(self, key_name):
         """检查是否是停止录制的快捷键
@@ -184,41 +533,32 @@ class Recorder:
             # 对于单个键，直接比较
             return key_name.lower() == self.stop_key.lower()
             
-    def _on_mouse_move(self, x, y):
-        """鼠标移动事件处理
+    def _process_move(self, x, y, current_time):
+        """处理鼠标移动
         
         Args:
             x: 鼠标X坐标
             y: 鼠标Y坐标
+            current_time: 事件时间
         """
-        if not self.recording:
+        if not self.move_filter:
+            self._emit_move(x, y, current_time)
             return
             
-        # 为了避免记录过多的移动事件，可以设置一个最小间隔
-        # 或者记录关键点（例如每隔一段时间或距离记录一次）
-        # 这里简化处理，记录所有移动
-        action = {
-            "type": "mouse_move",
-            "x": x,
-            "y": y,
-            "time": self._get_current_time()
-        }
-        
-        if self.callback:
-            self.callback(action)
+        # 高回报率鼠标每秒产生上千个移动事件，经过滤器精简后再输出
+        for point in self.move_filter.add(x, y, current_time):
+            self._emit_move(*point)
             
-    def _on_mouse_click(self, x, y, button, pressed):
-        """鼠标点击事件处理
+    def _process_click(self, x, y, button, pressed, current_time):
+        """处理鼠标点击
         
         Args:
             x: 鼠标X坐标
             y: 鼠标Y坐标
             button: 按下的按钮
             pressed: 是否按下（True为按下，False为释放）
+            current_time: 事件时间
         """
-        if not self.recording:
-            return
-            
         button_name = str(button).replace("Button.", "")
         
         action = {
@@ -227,32 +567,30 @@ class Recorder:
             "pressed": pressed,
             "x": x,
             "y": y,
-            "time": self._get_current_time()
+            "time": current_time
         }
         
-        if self.callback:
-            self.callback(action)
-            
-    def _on_mouse_scroll(self, x, y, dx, dy):
-        """鼠标滚轮事件处理
+        self._flush_moves()
+        self._deliver(action)
+        
+    def _process_scroll(self, x, y, dx, dy, current_time):
+        """处理鼠标滚轮
         
         Args:
             x: 鼠标X坐标
             y: 鼠标Y坐标
             dx: 水平滚动量
             dy: 垂直滚动量
+            current_time: 事件时间
         """
-        if not self.recording:
-            return
-            
         action = {
             "type": "mouse_scroll",
             "x": x,
             "y": y,
             "dx": dx,
             "dy": dy,
-            "time": self._get_current_time()
+            "time": current_time
         }
         
-        if self.callback:
-            self.callback(action)
+        self._flush_moves()
+        self._deliver(action)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按键精灵 - 调度器
+以绝对截止时间（time.perf_counter）安排每个操作的执行时刻，避免累计漂移
+"""
+
+import time
+import threading
+from array import array
+
+# 迟到处理策略
+LATENESS_CATCH_UP = "catch_up"  # 迟到的操作立即执行，后续操作按原时间线追赶
+LATENESS_SKIP = "skip"  # 迟到超过阈值的可跳过操作（鼠标移动）直接丢弃
+LATENESS_STRETCH = "stretch"  # 迟到时整体顺延时间线，保持后续操作之间的间隔
+LATENESS_POLICIES = (LATENESS_CATCH_UP, LATENESS_SKIP, LATENESS_STRETCH)
+
+# 播放倍速范围
+MIN_SPEED = 0.1
+MAX_SPEED = 50.0
+
+
+def clamp_speed(speed):
+    """把倍速限制在MIN_SPEED到MAX_SPEED之间，无效值视为1倍速"""
+    try:
+        speed = float(speed)
+    except (TypeError, ValueError):
+        return 1.0
+    if speed != speed:  # NaN
+        return 1.0
+    return min(MAX_SPEED, max(MIN_SPEED, speed))
+
+
+class JitterStats:
+    """统计每个操作的实际执行时间相对截止时间的偏差"""
+
+    def __init__(self):
+        """初始化统计"""
+        self.reset()
+
+    def reset(self):
+        """清空统计数据"""
+        self.samples = array("d")
+        self.skipped = 0
+
+    def add(self, lateness):
+        """记录一次执行的迟到时间（秒）"""
+        self.samples.append(lateness)
+
+    def add_skipped(self):
+        """记录一次被跳过的操作"""
+        self.skipped += 1
+
+    def summary(self):
+        """汇总统计结果
+
+        Returns:
+            dict: 包含执行数、跳过数以及迟到时间的平均值、分位数和最大值（秒）
+        """
+        count = len(self.samples)
+        if not count:
+            return {"count": 0, "skipped": self.skipped, "mean": 0.0,
+                    "p50": 0.0, "p99": 0.0, "max": 0.0}
+
+        ordered = sorted(self.samples)
+        return {
+            "count": count,
+            "skipped": self.skipped,
+            "mean": sum(ordered) / count,
+            "p50": ordered[int(0.50 * (count - 1))],
+            "p99": ordered[int(0.99 * (count - 1))],
+            "max": ordered[-1],
+        }
+
+    def format_summary(self):
+        """将统计结果格式化为可读文本
+
+        Returns:
+            str: 统计文本
+        """
+        s = self.summary()
+        return (f"执行 {s['count']} 个操作, 跳过 {s['skipped']} 个, "
+                f"抖动 平均 {s['mean'] * 1000:.2f}ms / p50 {s['p50'] * 1000:.2f}ms / "
+                f"p99 {s['p99'] * 1000:.2f}ms / 最大 {s['max'] * 1000:.2f}ms")
+
+
+class BatchStats:
+    """统计批量注入：每批的操作数分布和每次注入调用的耗时"""
+
+    def __init__(self):
+        """初始化统计"""
+        self.reset()
+
+    def reset(self):
+        """清空统计数据"""
+        self.histogram = {}  # 每批操作数 -> 批次数
+        self.latency = JitterStats()  # 每次注入调用的耗时
+
+    def add(self, size, latency):
+        """记录一次批量注入
+
+        Args:
+            size: 这一批的操作数
+            latency: 注入调用的耗时（秒）
+        """
+        self.histogram[size] = self.histogram.get(size, 0) + 1
+        self.latency.add(latency)
+
+    def summary(self):
+        """汇总统计结果
+
+        Returns:
+            dict: 批次数、操作数、操作数分布，以及注入耗时的平均值、分位数和最大值（秒）
+        """
+        latency = self.latency.summary()
+        return {
+            "batches": latency["count"],
+            "actions": sum(size * count for size, count in self.histogram.items()),
+            "histogram": dict(sorted(self.histogram.items())),
+            "mean": latency["mean"],
+            "p50": latency["p50"],
+            "p99": latency["p99"],
+            "max": latency["max"],
+        }
+
+    def format_summary(self):
+        """将统计结果格式化为可读文本
+
+        Returns:
+            str: 统计文本
+        """
+        s = self.summary()
+        histogram = ", ".join(f"{size}:{count}" for size, count in s["histogram"].items())
+        return (f"注入 {s['batches']} 批 / {s['actions']} 个操作 (每批操作数 {histogram or '-'}), "
+                f"注入耗时 p50 {s['p50'] * 1e6:.1f}us / p99 {s['p99'] * 1e6:.1f}us / "
+                f"最大 {s['max'] * 1e6:.1f}us")
+
+
+class Scheduler:
+    """基于绝对截止时间的调度器
+
+    先用可被停止事件打断的睡眠等待大部分时间，剩余的最后一小段用忙等待补齐，
+    既不浪费CPU，又能获得亚毫秒级的精度。
+    倍速和最大间隔只改变脚本时间到截止时间的映射，不修改脚本中的时间。
+    """
+
+    def __init__(self, lateness_policy=LATENESS_CATCH_UP, spin_threshold=0.002,
+                 skip_threshold=0.05, stop_event=None, speed=1.0, max_gap=None):
+        """初始化调度器
+
+        Args:
+            lateness_policy: 迟到处理策略（catch_up / skip / stretch）
+            spin_threshold: 截止时间前改为忙等待的时间（秒）
+            skip_threshold: skip策略下，迟到超过该值的可跳过操作将被丢弃（秒）
+            stop_event: 用于中断等待的停止事件
+            speed: 播放倍速（0.1到50），脚本中的时间间隔除以该值
+            max_gap: 按倍速换算后两个操作之间的最大等待时间（秒），超出部分被跳过，None表示不限制
+        """
+        if lateness_policy not in LATENESS_POLICIES:
+            lateness_policy = LATENESS_CATCH_UP
+        self.lateness_policy = lateness_policy
+        self.spin_threshold = spin_threshold
+        self.skip_threshold = skip_threshold
+        self.stop_event = stop_event or threading.Event()
+        self.stats = JitterStats()
+        self.yield_spin = False  # 忙等待时让出GIL（多个播放线程同时忙等待时避免互相阻塞）
+        self.speed = clamp_speed(speed)
+        self.max_gap = max_gap if max_gap is None or max_gap >= 0 else None
+        self.origin = 0.0
+        self.base_time = 0.0
+        self._last_time = None  # 上一个操作的脚本时间
+        self.last_deadline = None  # 最近一次计算的截止时间（供追踪使用）
+        # 实际倍速统计：已结束的各轮累计的脚本时长和实际时长，以及当前一轮的起止时刻
+        self._script_total = 0.0
+        self._wall_total = 0.0
+        self._run_start = None
+        self._run_end = None
+
+    def start(self, base_time):
+        """开始一轮新的时间线
+
+        Args:
+            base_time: 脚本中第一个操作的时间，对应当前时刻
+        """
+        self._finish_run()
+        self.base_time = base_time
+        self._last_time = base_time
+        self.origin = time.perf_counter()
+        self._run_start = self.origin
+        self._run_end = None
+
+    def _finish_run(self):
+        """把上一轮的脚本时长和实际时长计入累计值"""
+        if self._run_start is not None and self._run_end is not None:
+            self._script_total += self._last_time - self.base_time
+            self._wall_total += self._run_end - self._run_start
+        self._run_start = None
+
+    def effective_rate(self):
+        """实际倍速：已执行部分的脚本时长除以实际耗时（不含重复之间的间隔）
+
+        Returns:
+            float: 实际倍速，尚无可统计的时长时返回None
+        """
+        script_time = self._script_total
+        wall_time = self._wall_total
+        if self._run_start is not None and self._run_end is not None:
+            script_time += self._last_time - self.base_time
+            wall_time += self._run_end - self._run_start
+        if script_time <= 0 or wall_time <= 0:
+            return None
+        return script_time / wall_time
+
+    def wait(self, action_time, skippable=False):
+        """等待到操作的截止时间
+
+        Args:
+            action_time: 操作在脚本中的时间
+            skippable: 该操作在迟到时是否允许被跳过
+
+        Returns:
+            bool: True表示应执行该操作，False表示应跳过（或已被停止）
+        """
+        deadline = self.deadline(action_time)
+        if not self._wait_until(deadline):
+            return False
+        return self._arrived(deadline, skippable)
+
+    def deadline(self, action_time):
+        """计算操作在perf_counter时间轴上的截止时间（按顺序对每个操作调用一次）
+
+        Args:
+            action_time: 操作在脚本中的时间
+
+        Returns:
+            float: 截止时间
+        """
+        if self._last_time is not None and self.max_gap is not None:
+            gap = (action_time - self._last_time) / self.speed
+            if gap > self.max_gap:
+                # 把超出最大间隔的部分从时间线上去掉，后续操作整体提前
+                self.origin -= gap - self.max_gap
+        self._last_time = action_time
+
+        self.last_deadline = self.origin + (action_time - self.base_time) / self.speed
+        return self.last_deadline
+
+    def _arrived(self, deadline, skippable):
+        """到达截止时间后按迟到策略决定是否执行，并记录统计
+
+        Args:
+            deadline: 截止时间
+            skippable: 该操作在迟到时是否允许被跳过
+
+        Returns:
+            bool: 是否应执行该操作
+        """
+        lateness = time.perf_counter() - deadline
+        if lateness > 0:
+            if self.lateness_policy == LATENESS_STRETCH:
+                # 顺延整个时间线，后续操作保持原有间隔
+                self.origin += lateness
+            elif (self.lateness_policy == LATENESS_SKIP and skippable
+                  and lateness > self.skip_threshold):
+                self.stats.add_skipped()
+                return False
+
+        self.stats.add(lateness)
+        self._run_end = time.perf_counter()
+        return True
+
+    def _wait_until(self, deadline):
+        """混合睡眠/忙等待直到截止时间
+
+        Args:
+            deadline: perf_counter时间轴上的截止时间
+
+        Returns:
+            bool: 是否正常到达截止时间（False表示被停止）
+        """
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return not self.stop_event.is_set()
+            if remaining > self.spin_threshold:
+                # 粗等待：睡到截止时间前一小段，期间可被停止事件打断
+                if self.stop_event.wait(remaining - self.spin_threshold):
+                    return False
+            else:
+                # 精等待：忙等待剩余的时间
+                if self.yield_spin:
+                    while time.perf_counter() < deadline:
+                        time.sleep(0)
+                else:
+                    while time.perf_counter() < deadline:
+                        pass
+                return not self.stop_event.is_set()
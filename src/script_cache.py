@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按键精灵 - 脚本缓存
+按内容哈希（文本脚本）或路径+修改时间+大小（脚本文件）缓存解析后的操作缓冲区，
+内存中按LRU淘汰并限制总字节数，可选地持久化到磁盘缓存目录，重新打开大脚本时无需再次解析
+"""
+
+import os
+import json
+import struct
+import hashlib
+from array import array
+from collections import OrderedDict
+from action_buffer import ActionBuffer
+
+# 磁盘缓存文件格式: 文件头 + JSON元数据 + 各列数组的原始字节
+CACHE_MAGIC = b"AJSC"
+CACHE_VERSION = 3  # 版本2起时间列为整数微秒；版本3起带注释的脚本不再缓存。旧的缓存文件视为未命中
+CACHE_EXTENSION = ".ajsc"
+_HEADER = struct.Struct("<4sHI")  # 魔数、版本号、元数据长度
+
+# 缓冲区中需要缓存的列
+_COLUMNS = ("ops", "times", "xs", "ys", "dxs", "dys", "key_ids")
+
+
+def _buffer_size(buffer):
+    """估算缓冲区在缓存中占用的字节数（列数组加键表）"""
+    return buffer.nbytes() + sum(len(key) + 64 for key in buffer.keys)
+
+
+class ScriptCache:
+    """解析结果缓存
+
+    缓存中保存的是独立的副本，取出时也返回副本，调用方可以随意修改返回的缓冲区。
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, cache_dir=None, max_disk_bytes=1024 * 1024 * 1024):
+        """初始化缓存
+
+        Args:
+            max_bytes: 内存缓存的最大字节数，超出时淘汰最久未使用的条目
+            cache_dir: 磁盘缓存目录，None表示不使用磁盘缓存
+            max_disk_bytes: 磁盘缓存目录的最大字节数，超出时删除最旧的缓存文件
+        """
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()  # 键 -> (缓冲区, 字节数)
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def file_key(self, file_path):
+        """根据文件的绝对路径、修改时间和大小生成缓存键
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            str: 缓存键
+        """
+        stat = os.stat(file_path)
+        ident = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+        return "f" + hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+    def text_key(self, text):
+        """根据脚本文本内容生成缓存键
+
+        Args:
+            text: 脚本文本
+
+        Returns:
+            str: 缓存键
+        """
+        return "t" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """查找缓存（先内存后磁盘）
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            ActionBuffer: 缓存的缓冲区副本，未命中时返回None
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0].copy()
+
+        buffer = self._load_disk(key)
+        if buffer is not None:
+            self.disk_hits += 1
+            self._store(key, buffer.copy())
+            return buffer
+
+        self.misses += 1
+        return None
+
+    def put(self, key, buffer):
+        """加入缓存（保存副本，同时写入磁盘缓存）
+
+        Args:
+            key: 缓存键
+            buffer: 要缓存的缓冲区
+        """
+        self._store(key, buffer.copy())
+        self._save_disk(key, buffer)
+
+    def load_file(self, file_path, loader):
+        """通过缓存加载脚本文件
+
+        Args:
+            file_path: 文件路径
+            loader: 未命中时调用的加载函数，参数为文件路径，返回(ActionBuffer, 是否可缓存)
+
+        Returns:
+            ActionBuffer: 操作缓冲区
+        """
+        key = self.file_key(file_path)
+        buffer = self.get(key)
+        if buffer is None:
+            buffer, cacheable = loader(file_path)
+            if cacheable:
+                self.put(key, buffer)
+        return buffer
+
+    def load_text(self, text, parser):
+        """通过缓存解析脚本文本
+
+        Args:
+            text: 脚本文本
+            parser: 未命中时调用的解析函数，参数为文本，返回(ActionBuffer, 是否可缓存)
+
+        Returns:
+            ActionBuffer: 操作缓冲区
+        """
+        key = self.text_key(text)
+        buffer = self.get(key)
+        if buffer is None:
+            buffer, cacheable = parser(text)
+            if cacheable:
+                self.put(key, buffer)
+        return buffer
+
+    def clear(self):
+        """清空内存缓存（磁盘缓存保留）"""
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self):
+        """缓存统计
+
+        Returns:
+            dict: 条目数、占用字节数、命中/磁盘命中/未命中/淘汰次数
+        """
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _store(self, key, buffer):
+        """放入内存缓存并按LRU淘汰超出容量的条目"""
+        size = _buffer_size(buffer)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= old[1]
+        self._entries[key] = (buffer, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+            self.evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_EXTENSION)
+
+    def _load_disk(self, key):
+        """从磁盘缓存读取，文件不存在或格式不符时返回None"""
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                magic, version, meta_len = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != CACHE_MAGIC or version != CACHE_VERSION:
+                    return None
+                meta = json.loads(f.read(meta_len).decode("utf-8"))
+                buffer = ActionBuffer()
+                for name, typecode, count in meta["columns"]:
+                    column = array(typecode)
+                    if column.itemsize != meta["itemsizes"][name]:
+                        # 不同平台上的数组项大小不同，视为未命中
+                        return None
+                    column.frombytes(f.read(column.itemsize * count))
+                    if len(column) != count:
+                        return None
+                    setattr(buffer, name, column)
+                buffer.keys = meta["keys"]
+                buffer._key_index = {name: i for i, name in enumerate(buffer.keys)}
+            os.utime(path)  # 更新访问时间，清理时优先删除最久未用的文件
+            return buffer
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"读取脚本缓存错误: {str(e)}")
+            return None
+
+    def _save_disk(self, key, buffer):
+        """写入磁盘缓存（先写临时文件再替换，避免留下不完整的缓存）"""
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            columns = [getattr(buffer, name) for name in _COLUMNS]
+            meta = json.dumps({
+                "columns": [[name, column.typecode, len(column)] for name, column in zip(_COLUMNS, columns)],
+                "itemsizes": {name: column.itemsize for name, column in zip(_COLUMNS, columns)},
+                "keys": buffer.keys,
+            }, ensure_ascii=False).encode("utf-8")
+            path = self._disk_path(key)
+            temp_path = path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, len(meta)))
+                f.write(meta)
+                for column in columns:
+                    column.tofile(f)
+            os.replace(temp_path, path)
+            self._prune_disk()
+        except Exception as e:
+            print(f"写入脚本缓存错误: {str(e)}")
+
+    def _prune_disk(self):
+        """磁盘缓存超出容量时删除最久未使用的文件"""
+        files = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(CACHE_EXTENSION):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(path)
+            total -= size
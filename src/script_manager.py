@@ -7,15 +7,211 @@
 """
 
 import os
+import re
 import json
+import math
 import time
+from collections import namedtuple
+from action_buffer import (ActionBuffer, to_us, NO_KEY, US_PER_SECOND, OP_KEY_PRESS, OP_KEY_RELEASE,
+                           OP_MOUSE_MOVE, OP_MOUSE_DOWN, OP_MOUSE_UP, OP_MOUSE_SCROLL)
+from binary_script import BinaryScriptReader, write_binary
+
+# 二进制脚本文件扩展名
+BINARY_EXTENSION = ".ajsb"
+
+# 脚本行语法: [时间] 操作类型: 参数
+# 以多行模式对整段文本单遍匹配，每一行恰好产生一次匹配：
+# 合法的操作行匹配前面的分支，其余行（空行、注释、错误行）由最后的 bad 分支吸收
+# 数字只做宽松匹配以避免回溯，合法性由转换时检查
+_NUM = r"[-+]?[\d.]+(?:[eE][-+]?\d+)?"
+_SEP = r"[ \t]*"
+_LINE_RE = re.compile(
+    r"^" + _SEP + r"\[" + _SEP + r"(" + _NUM + r")" + _SEP + r"\]" + _SEP + r"(?:"
+    r"KEY_(PRESS|RELEASE)" + _SEP + r":" + _SEP + r"([^\r\n]*?)"
+    r"|MOUSE_MOVE" + _SEP + r":" + _SEP + r"(" + _NUM + r")" + _SEP + r"," + _SEP + r"(" + _NUM + r")"
+    r"|MOUSE_(DOWN|UP)" + _SEP + r":" + _SEP + r"([^\r\n]*?)[ \t]+at[ \t]+"
+    r"(" + _NUM + r")" + _SEP + r"," + _SEP + r"(" + _NUM + r")"
+    r"|MOUSE_SCROLL_(UP|DOWN)" + _SEP + r":" + _SEP + r"(?:(\d+)[ \t]+)?at[ \t]+"
+    r"(" + _NUM + r")" + _SEP + r"," + _SEP + r"(" + _NUM + r")"
+    r")" + _SEP + r"\r?$"
+    r"|^([^\n]*)$",
+    re.MULTILINE
+)
+_HEAD_RE = re.compile(r"\s*\[\s*(?P<time>[^\]]*)\]\s*(?P<type>[^:\s]*)")
+
+# 解析错误: 行号（从1开始）、行内容、错误说明
+ParseError = namedtuple("ParseError", ["line_no", "line", "message"])
+
+
+class ParseReport:
+    """一次解析的结果报告"""
+    
+    def __init__(self):
+        self.errors = []  # ParseError列表
+        self.monotonic = True  # 输入是否已按时间排序
+        self.last_time = float("-inf")  # 最后一个操作的时间
+        self.line_count = 0
+        self.action_count = 0  # 已解析出的操作数
+        # 注释和无法解析的行: (之前的操作数, 行内容)，保存时原样写回对应位置
+        self.extra_lines = []
+
+
+def _convert_slow(m):
+    """按兼容小数坐标的方式转换一次匹配，数字无效时返回None"""
+    (time_str, key_op, key, mx, my, click_op, button,
+     cx, cy, scroll_op, amount, sx, sy, bad) = m.groups()
+    try:
+        action_time = float(time_str)
+        if not math.isfinite(action_time):
+            return None
+        if mx is not None:
+            return {"type": "mouse_move", "x": int(float(mx)), "y": int(float(my)), "time": action_time}
+        elif key_op is not None:
+            return {
+                "type": "key_press" if key_op == "PRESS" else "key_release",
+                "key": key,
+                "time": action_time
+            }
+        elif click_op is not None:
+            return {
+                "type": "mouse_click",
+                "button": button,
+                "pressed": click_op == "DOWN",
+                "x": int(float(cx)),
+                "y": int(float(cy)),
+                "time": action_time
+            }
+        return {
+            "type": "mouse_scroll",
+            "x": int(float(sx)),
+            "y": int(float(sy)),
+            "dx": 0,
+            "dy": _scroll_amount(scroll_op, amount),
+            "time": action_time
+        }
+    except ValueError:
+        return None
+
+
+def _scroll_amount(direction, amount):
+    """根据滚动方向和可选的格数计算滚动量"""
+    steps = int(amount) if amount else 1
+    return steps if direction == "UP" else -steps
+
+
+def _describe_error(line):
+    """为无法匹配语法的行生成错误说明"""
+    head = _HEAD_RE.match(line)
+    if head is None:
+        return "缺少时间戳"
+    try:
+        action_time = float(head.group("time"))
+    except ValueError:
+        return f"无效的时间戳: {head.group('time').strip()}"
+    if not math.isfinite(action_time):
+        return f"无效的时间戳: {head.group('time').strip()}（必须是有限的数值）"
+    action_type = head.group("type")
+    if action_type not in ("KEY_PRESS", "KEY_RELEASE", "MOUSE_MOVE", "MOUSE_DOWN", "MOUSE_UP",
+                           "MOUSE_SCROLL_UP", "MOUSE_SCROLL_DOWN"):
+        return f"未知的操作类型: {action_type}"
+    return f"{action_type} 的参数格式错误"
+
+
+def remap_extra_lines(extra_lines, edits):
+    """按缓冲区的编辑记录更新注释和无法解析的行的位置
+    
+    插入行之前的注释留在原处，被删除的行之后的注释移到删除位置，原地替换的行不影响注释。
+    
+    Args:
+        extra_lines: (之前的操作数, 行内容)列表，格式同 ParseReport.extra_lines
+        edits: ActionBuffer.edits 中的(位置, 删除行数, 插入行数)记录
+        
+    Returns:
+        list: 更新位置后的列表
+    """
+    for index, removed, inserted in edits:
+        delta = inserted - removed
+        extra_lines = [
+            (count if count <= index else index if count < index + removed else count + delta, line)
+            for count, line in extra_lines
+        ]
+    return extra_lines
+
+
+class ScriptStream:
+    """从文件增量解析操作的可重复迭代脚本源
+    
+    每次迭代都会重新打开文件并逐块解析，内存占用与脚本长度无关，
+    可以直接交给Player播放，重复播放时从文件头重新读取。
+    """
+    
+    def __init__(self, manager, file_path, chunk_size=1 << 20):
+        """初始化脚本源
+        
+        Args:
+            manager: 用于解析的ScriptManager
+            file_path: 脚本文件路径（文本或.ajsb二进制脚本）
+            chunk_size: 每次读取的文本字符数
+        """
+        self.manager = manager
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.report = ParseReport()
+        
+    def __iter__(self):
+        # 流式读取无法排序，乱序的操作会按文件中的顺序播放（report.monotonic为False）
+        self.report = ParseReport()
+        if self.manager.is_binary_script(self.file_path):
+            with BinaryScriptReader(self.file_path) as reader:
+                yield from reader
+            return
+            
+        with open(self.file_path, "r", encoding="utf-8") as f:
+            pending = ""
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                    
+                # 只解析完整的行，不完整的最后一行留到下一块
+                chunk = pending + chunk
+                end = chunk.rfind("\n") + 1
+                pending = chunk[end:]
+                if end:
+                    yield from self.manager._iter_actions(
+                        chunk[:end], self.report, self.report.line_count + 1
+                    )
+                    
+            if pending:
+                yield from self.manager._iter_actions(pending, self.report, self.report.line_count + 1)
+
 
 class ScriptManager:
     """脚本管理类"""
     
-    def __init__(self):
-        """初始化脚本管理器"""
-        pass
+    def __init__(self, cache=None):
+        """初始化脚本管理器
+        
+        Args:
+            cache: 可选的ScriptCache，用于复用未修改的脚本的解析结果
+        """
+        self.cache = cache
+        self.last_report = ParseReport()
+        
+    def format_time(self, seconds):
+        """格式化时间戳：毫秒整数倍的时间保持原有的3位小数，否则使用6位小数（微秒）
+        
+        两种写法都能被原有的解析器读取
+        
+        Args:
+            seconds: 时间（秒）
+            
+        Returns:
+            str: 时间文本
+        """
+        if to_us(seconds) % 1000:
+            return f"{seconds:.6f}"
+        return f"{seconds:.3f}"
         
     def format_action(self, action):
         """将操作格式化为可读的文本
@@ -27,7 +223,7 @@ class ScriptManager:
             str: 格式化后的文本
         """
         action_type = action.get("type", "")
-        time_str = f"{action.get('time', 0):.3f}"
+        time_str = self.format_time(action.get("time", 0))
         
         if action_type == "key_press":
             key = action.get("key", "")
@@ -55,6 +251,10 @@ class ScriptManager:
             dx = action.get("dx", 0)
             dy = action.get("dy", 0)
             direction = "UP" if dy > 0 else "DOWN"
+            # 合并后的多格滚动记录格数，单格滚动保持原有格式
+            steps = abs(int(dy))
+            if steps > 1:
+                return f"[{time_str}] MOUSE_SCROLL_{direction}: {steps} at {x}, {y}"
             return f"[{time_str}] MOUSE_SCROLL_{direction}: at {x}, {y}"
             
         return f"[{time_str}] UNKNOWN: {action}"
@@ -62,117 +262,265 @@ class ScriptManager:
     def parse_script(self, script_text):
         """解析脚本文本为操作序列
         
+        无法解析的行不会中断解析，而是记录在 last_report.errors 中。
+        
         Args:
             script_text: 要解析的脚本文本
             
         Returns:
             list: 操作序列
         """
+        self.last_report = ParseReport()
         if not script_text:
             return []
             
-        actions = []
-        lines = script_text.strip().split("\n")
+        actions = list(self._iter_actions(script_text, self.last_report))
+        
+        # 按时间排序（输入已经有序时跳过）
+        if not self.last_report.monotonic:
+            actions.sort(key=lambda x: x.get("time", 0))
+        
+        return actions
+        
+    def parse_to_buffer(self, script_text):
+        """解析脚本文本为列式操作缓冲区
+        
+        Args:
+            script_text: 要解析的脚本文本
+            
+        Returns:
+            ActionBuffer: 按时间排序的操作缓冲区
+        """
+        if self.cache is not None and script_text:
+            self.last_report = ParseReport()
+            return self.cache.load_text(script_text, self._parse_cacheable)
+        return self._parse_cacheable(script_text)[0]
+        
+    def _parse_cacheable(self, script_text):
+        """解析脚本文本，并说明结果是否可以缓存
+        
+        有解析错误或注释时不缓存：缓存中只有操作，命中时无法再报告错误或写回这些行；
+        乱序的脚本也不缓存，命中缓存时 last_report.monotonic 因此总是准确的
+        
+        Args:
+            script_text: 要解析的脚本文本
+            
+        Returns:
+            tuple: (ActionBuffer, 是否可缓存)
+        """
+        self.last_report = ParseReport()
+        buffer = ActionBuffer()
+        if not script_text:
+            return buffer, False
+            
+        self._fill_buffer(script_text, self.last_report, buffer)
+        if not self.last_report.monotonic:
+            buffer.sort_by_time()
         
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith("#"):
+        return buffer, not self.last_report.extra_lines and self.last_report.monotonic
+        
+    def parse_line(self, line):
+        """解析单行脚本（编辑单行时只重新解析该行）
+        
+        Args:
+            line: 脚本行
+            
+        Returns:
+            dict: 操作
+            
+        Raises:
+            ValueError: 该行不是合法的操作
+        """
+        report = ParseReport()
+        actions = list(self._iter_actions(line.strip(), report))
+        if not actions:
+            raise ValueError(report.errors[0].message if report.errors else "空行")
+        return actions[0]
+        
+    @property
+    def last_errors(self):
+        """最近一次解析产生的错误列表"""
+        return self.last_report.errors
+        
+    def _iter_actions(self, text, report, first_line_no=1):
+        """单遍解析脚本文本，依次产生操作字典（不排序）
+        
+        Args:
+            text: 脚本文本（可以是较大文件中由完整的行组成的一段）
+            report: 用于收集错误和有序性的解析报告
+            first_line_no: text第一行的行号
+            
+        Yields:
+            dict: 操作
+        """
+        errors = report.errors
+        extra_lines = report.extra_lines
+        isfinite = math.isfinite
+        action_count = report.action_count
+        last_time = report.last_time
+        monotonic = report.monotonic
+        line_no = first_line_no - 1
+        
+        for line_no, m in enumerate(_LINE_RE.finditer(text), first_line_no):
+            (time_str, key_op, key, mx, my, click_op, button,
+             cx, cy, scroll_op, amount, sx, sy, bad) = m.groups()
+            
+            if time_str is None:
+                # 空行直接忽略，注释保留，其余行记录为错误（同样保留）
+                stripped = bad.strip()
+                if stripped:
+                    extra_lines.append((action_count, bad.rstrip("\r")))
+                    if not stripped.startswith("#"):
+                        errors.append(ParseError(line_no, stripped, _describe_error(stripped)))
                 continue
                 
             try:
-                # 解析时间戳
-                time_start = line.find("[") + 1
-                time_end = line.find("]")
-                if time_start <= 0 or time_end <= 0:
-                    continue
-                    
-                time_str = line[time_start:time_end].strip()
                 action_time = float(time_str)
-                
-                # 解析操作类型和参数
-                action_part = line[time_end + 1:].strip()
-                if not action_part:
-                    continue
-                    
-                # 分割操作类型和参数
-                parts = action_part.split(":", 1)
-                if len(parts) != 2:
-                    continue
-                    
-                action_type = parts[0].strip()
-                params_str = parts[1].strip()
-                
-                # 根据操作类型解析参数
-                if action_type == "KEY_PRESS":
-                    key = params_str
-                    actions.append({
-                        "type": "key_press",
+                if not isfinite(action_time):
+                    # 如1e999，交给慢速路径记录为错误
+                    raise ValueError(time_str)
+                if mx is not None:
+                    action = {"type": "mouse_move", "x": int(mx), "y": int(my), "time": action_time}
+                elif key_op is not None:
+                    action = {
+                        "type": "key_press" if key_op == "PRESS" else "key_release",
                         "key": key,
                         "time": action_time
-                    })
-                    
-                elif action_type == "KEY_RELEASE":
-                    key = params_str
-                    actions.append({
-                        "type": "key_release",
-                        "key": key,
+                    }
+                elif click_op is not None:
+                    action = {
+                        "type": "mouse_click",
+                        "button": button,
+                        "pressed": click_op == "DOWN",
+                        "x": int(cx),
+                        "y": int(cy),
                         "time": action_time
-                    })
-                    
-                elif action_type == "MOUSE_MOVE":
-                    coords = params_str.split(",")
-                    if len(coords) == 2:
-                        x = int(float(coords[0].strip()))
-                        y = int(float(coords[1].strip()))
-                        actions.append({
-                            "type": "mouse_move",
-                            "x": x,
-                            "y": y,
-                            "time": action_time
-                        })
-                        
-                elif action_type in ["MOUSE_DOWN", "MOUSE_UP"]:
-                    # 格式: MOUSE_DOWN: left at 100, 200
-                    parts = params_str.split(" at ")
-                    if len(parts) == 2:
-                        button = parts[0].strip()
-                        coords = parts[1].split(",")
-                        if len(coords) == 2:
-                            x = int(float(coords[0].strip()))
-                            y = int(float(coords[1].strip()))
-                            actions.append({
-                                "type": "mouse_click",
-                                "button": button,
-                                "pressed": action_type == "MOUSE_DOWN",
-                                "x": x,
-                                "y": y,
-                                "time": action_time
-                            })
-                            
-                elif action_type in ["MOUSE_SCROLL_UP", "MOUSE_SCROLL_DOWN"]:
-                    # 格式: MOUSE_SCROLL_UP: at 100, 200
-                    parts = params_str.split(" at ")
-                    if len(parts) == 2:
-                        coords = parts[1].split(",")
-                        if len(coords) == 2:
-                            x = int(float(coords[0].strip()))
-                            y = int(float(coords[1].strip()))
-                            dy = 1 if action_type == "MOUSE_SCROLL_UP" else -1
-                            actions.append({
-                                "type": "mouse_scroll",
-                                "x": x,
-                                "y": y,
-                                "dx": 0,
-                                "dy": dy,
-                                "time": action_time
-                            })
-            except Exception as e:
-                print(f"解析行错误: {line} - {str(e)}")
+                    }
+                else:
+                    action = {
+                        "type": "mouse_scroll",
+                        "x": int(sx),
+                        "y": int(sy),
+                        "dx": 0,
+                        "dy": _scroll_amount(scroll_op, amount),
+                        "time": action_time
+                    }
+            except ValueError:
+                # 带小数的坐标走慢速路径，仍无法转换的数字记录为错误
+                action = _convert_slow(m)
+                if action is None:
+                    stripped = m.group(0).strip()
+                    extra_lines.append((action_count, m.group(0).rstrip("\r")))
+                    errors.append(ParseError(line_no, stripped, _describe_error(stripped)))
+                    continue
+                action_time = action["time"]
                 
-        # 按时间排序
-        actions.sort(key=lambda x: x.get("time", 0))
+            if action_time < last_time:
+                monotonic = False
+            last_time = action_time
+            action_count += 1
+            yield action
+            
+        # 文本以换行结尾时，最后的空匹配不算作一行
+        if text.endswith("\n"):
+            line_no -= 1
+        report.line_count = line_no
+        report.action_count = action_count
+        report.last_time = last_time
+        report.monotonic = monotonic
         
-        return actions
+    def _fill_buffer(self, text, report, buffer):
+        """单遍解析脚本文本，直接把匹配到的字段追加到缓冲区的各列（不排序）
+        
+        与 _iter_actions 的解析规则相同，但不为每个操作创建字典，
+        载入较大的脚本时省去了创建字典再逐个转换为列数据的开销。
+        
+        Args:
+            text: 脚本文本
+            report: 用于收集错误和有序性的解析报告
+            buffer: 要追加到的ActionBuffer
+        """
+        errors = report.errors
+        extra_lines = report.extra_lines
+        isfinite = math.isfinite
+        action_count = report.action_count
+        last_time = report.last_time
+        monotonic = report.monotonic
+        line_no = 0
+        
+        ops = buffer.ops.append
+        times = buffer.times.append
+        key_ids = buffer.key_ids.append
+        xs = buffer.xs.append
+        ys = buffer.ys.append
+        dxs = buffer.dxs.append
+        dys = buffer.dys.append
+        key_index = buffer._key_index
+        intern_key = buffer.intern_key
+        
+        for line_no, m in enumerate(_LINE_RE.finditer(text), 1):
+            (time_str, key_op, key, mx, my, click_op, button,
+             cx, cy, scroll_op, amount, sx, sy, bad) = m.groups()
+            
+            if time_str is None:
+                stripped = bad.strip()
+                if stripped:
+                    extra_lines.append((action_count, bad.rstrip("\r")))
+                    if not stripped.startswith("#"):
+                        errors.append(ParseError(line_no, stripped, _describe_error(stripped)))
+                continue
+                
+            try:
+                action_time = float(time_str)
+                if not isfinite(action_time):
+                    raise ValueError(time_str)
+                # 先完成所有转换再追加，转换失败时各列保持等长
+                if mx is not None:
+                    op, key_id, x, y, dy = OP_MOUSE_MOVE, NO_KEY, int(mx), int(my), 0
+                elif key_op is not None:
+                    key_id = key_index.get(key)
+                    if key_id is None:
+                        key_id = intern_key(key)
+                    op, x, y, dy = OP_KEY_PRESS if key_op == "PRESS" else OP_KEY_RELEASE, 0, 0, 0
+                elif click_op is not None:
+                    x, y = int(cx), int(cy)
+                    key_id = key_index.get(button)
+                    if key_id is None:
+                        key_id = intern_key(button)
+                    op, dy = OP_MOUSE_DOWN if click_op == "DOWN" else OP_MOUSE_UP, 0
+                else:
+                    op, key_id, x, y = OP_MOUSE_SCROLL, NO_KEY, int(sx), int(sy)
+                    dy = _scroll_amount(scroll_op, amount)
+            except ValueError:
+                # 带小数的坐标走慢速路径，仍无法转换的数字记录为错误
+                action = _convert_slow(m)
+                if action is None:
+                    stripped = m.group(0).strip()
+                    extra_lines.append((action_count, m.group(0).rstrip("\r")))
+                    errors.append(ParseError(line_no, stripped, _describe_error(stripped)))
+                    continue
+                action_time = action["time"]
+                buffer.append(action)
+            else:
+                ops(op)
+                times(round(action_time * US_PER_SECOND))
+                key_ids(key_id)
+                xs(x)
+                ys(y)
+                dxs(0)
+                dys(dy)
+                
+            if action_time < last_time:
+                monotonic = False
+            last_time = action_time
+            action_count += 1
+            
+        if text.endswith("\n"):
+            line_no -= 1
+        report.line_count = line_no
+        report.action_count = action_count
+        report.last_time = last_time
+        report.monotonic = monotonic
         
     def save_script(self, file_path, script_text):
         """保存脚本到文件
@@ -184,6 +532,57 @@ class ScriptManager:
         with open(file_path, "w", encoding="utf-8") as f:
             f.write(script_text)
             
+    def save_actions(self, file_path, actions, chunk_size=10000, extra_lines=()):
+        """将操作序列格式化后分块写入文本脚本，不需要先拼出完整文本
+        
+        Args:
+            file_path: 文件路径
+            actions: 操作序列
+            chunk_size: 每次写入的行数
+            extra_lines: 要原样写回的注释和无法解析的行，格式同 ParseReport.extra_lines，
+                每行写在第(之前的操作数)个操作之前
+        """
+        extra = iter(extra_lines)
+        pending = next(extra, None)
+        with open(file_path, "w", encoding="utf-8") as f:
+            lines = []
+            for index, action in enumerate(actions):
+                while pending is not None and pending[0] <= index:
+                    lines.append(pending[1])
+                    pending = next(extra, None)
+                lines.append(self.format_action(action))
+                if len(lines) >= chunk_size:
+                    f.write("\n".join(lines) + "\n")
+                    lines = []
+            while pending is not None:
+                lines.append(pending[1])
+                pending = next(extra, None)
+            if lines:
+                f.write("\n".join(lines) + "\n")
+                
+    def load_actions(self, file_path):
+        """加载脚本文件（文本或二进制）为操作缓冲区
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            ActionBuffer: 按时间排序的操作缓冲区，文本脚本的解析错误记录在 last_report 中
+        """
+        if self.is_binary_script(file_path):
+            self.last_report = ParseReport()
+            with self.load_binary(file_path) as reader:
+                return reader.to_buffer()
+        if self.cache is not None:
+            # 文件未修改时直接使用缓存，不再读取和解析文件
+            self.last_report = ParseReport()
+            return self.cache.load_file(file_path, self._load_text_cacheable)
+        return self.parse_to_buffer(self.load_script(file_path))
+        
+    def _load_text_cacheable(self, file_path):
+        """读取并解析文本脚本文件（缓存未命中时使用）"""
+        return self._parse_cacheable(self.load_script(file_path))
+        
     def load_script(self, file_path):
         """从文件加载脚本
         
@@ -196,6 +595,78 @@ class ScriptManager:
         with open(file_path, "r", encoding="utf-8") as f:
             return f.read()
             
+    def open_stream(self, file_path):
+        """打开脚本文件作为流式脚本源，不预先解析整个文件
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            ScriptStream: 可重复迭代的脚本源
+        """
+        return ScriptStream(self, file_path)
+        
+    def is_binary_script(self, file_path):
+        """根据扩展名判断是否为二进制脚本
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            bool: 是否为二进制脚本
+        """
+        return os.path.splitext(file_path)[1].lower() == BINARY_EXTENSION
+        
+    def save_binary(self, file_path, actions):
+        """将操作序列保存为二进制脚本
+        
+        Args:
+            file_path: 文件路径
+            actions: ActionBuffer或操作序列
+        """
+        write_binary(file_path, actions)
+        
+    def load_binary(self, file_path):
+        """通过mmap打开二进制脚本，记录在迭代时才解码
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            BinaryScriptReader: 可重复迭代的脚本读取器
+        """
+        return BinaryScriptReader(file_path)
+        
+    def binary_to_text(self, file_path):
+        """读取二进制脚本并格式化为文本
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            str: 脚本文本
+        """
+        with self.load_binary(file_path) as reader:
+            return "\n".join(self.format_action(action) for action in reader) + "\n"
+            
+    def convert_text_to_binary(self, text_path, binary_path):
+        """将文本脚本转换为二进制脚本
+        
+        Args:
+            text_path: 文本脚本路径
+            binary_path: 二进制脚本路径
+        """
+        self.save_binary(binary_path, self.parse_to_buffer(self.load_script(text_path)))
+        
+    def convert_binary_to_text(self, binary_path, text_path):
+        """将二进制脚本转换为文本脚本
+        
+        Args:
+            binary_path: 二进制脚本路径
+            text_path: 文本脚本路径
+        """
+        self.save_script(text_path, self.binary_to_text(binary_path))
+        
     def export_to_json(self, actions, file_path):
         """将操作序列导出为JSON格式
         
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按键精灵 - 脚本优化器
+对解析后的操作序列做离线优化：去除冗余的鼠标移动和按键事件、合并连续滚动、压缩长时间空闲
+"""
+
+
+class ScriptOptimizer:
+    """脚本优化类"""
+
+    def __init__(self, scroll_merge_gap=0.1, max_idle=None):
+        """初始化优化器
+
+        Args:
+            scroll_merge_gap: 同一位置同方向的滚动间隔不超过该值（秒）时合并
+            max_idle: 操作之间的最大空闲时间（秒），超出部分被压缩，None表示不压缩
+        """
+        self.scroll_merge_gap = scroll_merge_gap
+        self.max_idle = max_idle
+        self.report = None
+
+    def optimize(self, actions, max_idle=None):
+        """优化操作序列并打印优化前后的对比报告
+
+        Args:
+            actions: 按时间排序的操作序列（ScriptManager.parse_script的结果）
+            max_idle: 覆盖初始化时设置的最大空闲时间
+
+        Returns:
+            list: 优化后的操作序列（新的字典列表，不修改原序列）
+        """
+        if max_idle is None:
+            max_idle = self.max_idle
+
+        result = [dict(action) for action in actions]
+        removed = {}
+        result = self._remove_redundant_keys(result, removed)
+        result = self._remove_redundant_moves(result, removed)
+        result = self._merge_scrolls(result, removed)
+        if max_idle is not None:
+            result = self._compress_idle(result, max_idle)
+
+        self.report = {
+            "before_count": len(actions),
+            "after_count": len(result),
+            "before_duration": self._duration(actions),
+            "after_duration": self._duration(result),
+            "removed": removed,
+        }
+        print(self.format_report())
+        return result
+
+    def format_report(self):
+        """将最近一次优化的报告格式化为文本
+
+        Returns:
+            str: 报告文本
+        """
+        report = self.report
+        if not report:
+            return "尚未优化"
+        details = ", ".join(f"{name} {count}" for name, count in report["removed"].items() if count)
+        return (f"操作数 {report['before_count']} → {report['after_count']}, "
+                f"时长 {report['before_duration']:.3f}s → {report['after_duration']:.3f}s"
+                + (f" ({details})" if details else ""))
+
+    def _duration(self, actions):
+        """操作序列的总时长"""
+        if not actions:
+            return 0.0
+        return actions[-1].get("time", 0) - actions[0].get("time", 0)
+
+    def _remove_redundant_keys(self, actions, removed):
+        """去除空操作的按键事件：已按下的键再次按下、未按下的键被释放"""
+        held = set()
+        result = []
+        count = 0
+        for action in actions:
+            action_type = action.get("type")
+            if action_type == "key_press":
+                key = action.get("key", "")
+                if key in held:
+                    count += 1
+                    continue
+                held.add(key)
+            elif action_type == "key_release":
+                key = action.get("key", "")
+                if key not in held:
+                    count += 1
+                    continue
+                held.discard(key)
+            result.append(action)
+        removed["冗余按键"] = count
+        return result
+
+    def _remove_redundant_moves(self, actions, removed):
+        """去除重复坐标的鼠标移动，以及紧接在同坐标点击之前的移动（点击本身会移动到该位置）"""
+        result = []
+        last_mouse = None  # 上一个保留的鼠标操作在result中的下标
+        count = 0
+        for action in actions:
+            action_type = action.get("type")
+            if action_type == "mouse_move":
+                if last_mouse is not None:
+                    previous = result[last_mouse]
+                    if previous.get("x") == action.get("x") and previous.get("y") == action.get("y"):
+                        count += 1
+                        continue
+            elif action_type == "mouse_click":
+                # 向前删除同坐标、且与点击之间没有其他鼠标操作的移动
+                while (last_mouse is not None and result[last_mouse].get("type") == "mouse_move"
+                       and result[last_mouse].get("x") == action.get("x")
+                       and result[last_mouse].get("y") == action.get("y")):
+                    del result[last_mouse]
+                    count += 1
+                    last_mouse = self._last_mouse_index(result, last_mouse)
+            if action_type in ("mouse_move", "mouse_click", "mouse_scroll"):
+                last_mouse = len(result)
+            result.append(action)
+        removed["冗余移动"] = count
+        return result
+
+    def _last_mouse_index(self, actions, end):
+        """在actions[:end]中查找最后一个鼠标操作的下标"""
+        for i in range(end - 1, -1, -1):
+            if actions[i].get("type", "").startswith("mouse_"):
+                return i
+        return None
+
+    def _merge_scrolls(self, actions, removed):
+        """合并同一位置、同方向、时间相近的连续滚动"""
+        result = []
+        count = 0
+        for action in actions:
+            if action.get("type") == "mouse_scroll" and result:
+                previous = result[-1]
+                if (previous.get("type") == "mouse_scroll"
+                        and previous.get("x") == action.get("x")
+                        and previous.get("y") == action.get("y")
+                        and (previous.get("dy", 0) > 0) == (action.get("dy", 0) > 0)
+                        and action.get("time", 0) - previous.get("time", 0) <= self.scroll_merge_gap):
+                    previous["dx"] = previous.get("dx", 0) + action.get("dx", 0)
+                    previous["dy"] = previous.get("dy", 0) + action.get("dy", 0)
+                    count += 1
+                    continue
+            result.append(action)
+        removed["合并滚动"] = count
+        return result
+
+    def _compress_idle(self, actions, max_idle):
+        """将超过max_idle的空闲间隔压缩为max_idle，后续操作整体前移"""
+        shift = 0.0
+        last_time = None
+        for action in actions:
+            current_time = action.get("time", 0)
+            if last_time is not None and current_time - last_time > max_idle:
+                shift += current_time - last_time - max_idle
+            last_time = current_time
+            action["time"] = round(current_time - shift, 6)
+        return actions
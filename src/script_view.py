@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按键精灵 - 虚拟化脚本视图
+直接显示ActionBuffer中的操作，只格式化和绘制可见的行，
+编辑单行时只重新解析该行，适合几十万行以上的脚本
+"""
+
+import tkinter as tk
+import tkinter.font as tkfont
+import customtkinter as ctk
+from tkinter import messagebox
+from action_buffer import ActionBuffer
+
+
+class ScriptView(ctk.CTkFrame):
+    """虚拟化的脚本列表
+
+    操作:
+        单击选中行，方向键/PageUp/PageDown/Home/End移动选中行
+        双击或回车编辑选中行，Insert在选中行之后插入新行，Delete删除选中行
+    """
+
+    def __init__(self, master, script_manager, font=("Consolas", 12), **kwargs):
+        """初始化脚本视图
+
+        Args:
+            master: 父控件
+            script_manager: 用于格式化和解析单行的ScriptManager
+            font: 显示字体
+        """
+        super().__init__(master, **kwargs)
+        self.script_manager = script_manager
+        self.buffer = ActionBuffer()
+        self.top = 0  # 第一个可见行的下标
+        self.selected = None  # 选中行的下标
+        self.modified = False  # 内容是否被编辑过（打开或保存后重置）
+        self.on_change = None  # 内容被编辑后的回调
+
+        self._font = tkfont.Font(family=font[0], size=font[1])
+        self._row_height = self._font.metrics("linespace") + 2
+        self._editor = None
+        self._editor_window = None
+        self._edit_index = None
+        self._edit_new = False
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        self._text_color = self._apply_appearance_mode(ctk.ThemeManager.theme["CTkTextbox"]["text_color"])
+        self._select_color = self._apply_appearance_mode(ctk.ThemeManager.theme["CTkButton"]["fg_color"])
+        self.canvas = tk.Canvas(
+            self,
+            highlightthickness=0,
+            takefocus=True,
+            bg=self._apply_appearance_mode(ctk.ThemeManager.theme["CTkTextbox"]["fg_color"])
+        )
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        canvas = self.canvas
+        canvas.bind("<Configure>", lambda e: self.render())
+        canvas.bind("<Button-1>", self._on_click)
+        canvas.bind("<Double-Button-1>", lambda e: self.edit_row(self.selected))
+        canvas.bind("<MouseWheel>", lambda e: self.yview("scroll", -3 if e.delta > 0 else 3, "units"))
+        canvas.bind("<Button-4>", lambda e: self.yview("scroll", -3, "units"))
+        canvas.bind("<Button-5>", lambda e: self.yview("scroll", 3, "units"))
+        canvas.bind("<Up>", lambda e: self._move_selection(-1))
+        canvas.bind("<Down>", lambda e: self._move_selection(1))
+        canvas.bind("<Prior>", lambda e: self._move_selection(-self.visible_rows()))
+        canvas.bind("<Next>", lambda e: self._move_selection(self.visible_rows()))
+        canvas.bind("<Home>", lambda e: self.select(0))
+        canvas.bind("<End>", lambda e: self.select(len(self.buffer) - 1))
+        canvas.bind("<Return>", lambda e: self.edit_row(self.selected))
+        canvas.bind("<Delete>", lambda e: self.delete_selected())
+        canvas.bind("<Insert>", lambda e: self.insert_row())
+
+    def set_buffer(self, buffer):
+        """显示新的操作缓冲区
+
+        Args:
+            buffer: ActionBuffer
+        """
+        self._cancel_edit()
+        self.buffer = buffer
+        self.top = 0
+        self.selected = None
+        self.modified = False
+        self.render()
+
+    def clear(self):
+        """清空视图"""
+        self.set_buffer(ActionBuffer())
+
+    def visible_rows(self):
+        """当前高度下可以显示的行数"""
+        return max(1, self.canvas.winfo_height() // self._row_height)
+
+    def refresh(self, follow_end=False):
+        """缓冲区内容变化后重新绘制
+
+        Args:
+            follow_end: 是否滚动到末尾（记录时使用）
+        """
+        if follow_end:
+            self.top = max(0, len(self.buffer) - self.visible_rows())
+        self.render()
+
+    def render(self):
+        """只格式化并绘制可见的行"""
+        canvas = self.canvas
+        canvas.delete("rows")
+        count = len(self.buffer)
+        rows = self.visible_rows()
+        self.top = max(0, min(self.top, count - rows))
+
+        width = canvas.winfo_width()
+        number_width = len(str(count)) + 1
+        format_action = self.script_manager.format_action
+        y = 0
+        for index in range(self.top, min(self.top + rows + 1, count)):
+            if index == self.selected:
+                canvas.create_rectangle(0, y, width, y + self._row_height, fill=self._select_color,
+                                        width=0, tags="rows")
+            text = f"{index + 1:>{number_width}}  {format_action(self.buffer[index])}"
+            canvas.create_text(4, y + 1, text=text, anchor="nw", font=self._font,
+                               fill=self._text_color, tags="rows")
+            y += self._row_height
+
+        if count:
+            self.scrollbar.set(self.top / count, min(1.0, (self.top + rows) / count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def yview(self, *args):
+        """滚动条回调，参数格式与Tk的yview相同"""
+        count = len(self.buffer)
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * count)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self.visible_rows()
+            self.top += step
+        self._cancel_edit()
+        self.render()
+
+    def see(self, index):
+        """滚动使指定行可见"""
+        rows = self.visible_rows()
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + rows:
+            self.top = index - rows + 1
+
+    def select(self, index):
+        """选中指定行并滚动到该行"""
+        count = len(self.buffer)
+        if not count:
+            return
+        self.selected = max(0, min(index, count - 1))
+        self.see(self.selected)
+        self.render()
+
+    def _move_selection(self, step):
+        self.select((self.selected if self.selected is not None else self.top) + step)
+
+    def _on_click(self, event):
+        self.canvas.focus_set()
+        self._cancel_edit()
+        index = self.top + event.y // self._row_height
+        if index < len(self.buffer):
+            self.select(index)
+
+    def jump_to_time(self, time):
+        """选中第一个时间不早于time的操作
+
+        Args:
+            time: 时间（秒）
+
+        Returns:
+            int: 选中行的下标，没有操作时返回None
+        """
+        if not self.buffer:
+            return None
+        self.select(min(self.buffer.index_at_time(time), len(self.buffer) - 1))
+        return self.selected
+
+    def edit_row(self, index):
+        """在指定行上打开单行编辑框"""
+        if index is None or index >= len(self.buffer):
+            return
+        self._open_editor(index, self.script_manager.format_action(self.buffer[index]), False)
+
+    def insert_row(self):
+        """在选中行之后插入新行，默认沿用选中行的时间"""
+        if self.selected is not None and self.buffer:
+            index = self.selected + 1
+            time = self.buffer.time_at(self.selected)
+        else:
+            index = len(self.buffer)
+            time = self.buffer.time_at(-1) if self.buffer else 0.0
+        self._open_editor(index, f"[{self.script_manager.format_time(time)}] ", True)
+
+    def delete_selected(self):
+        """删除选中行"""
+        if self.selected is None or self.selected >= len(self.buffer):
+            return
+        self.buffer.delete(self.selected)
+        if self.selected >= len(self.buffer):
+            self.selected = len(self.buffer) - 1 if self.buffer else None
+        self._changed()
+
+    def _open_editor(self, index, text, is_new):
+        self._cancel_edit()
+        self.see(index)
+        self.render()
+        self._edit_index = index
+        self._edit_new = is_new
+        editor = tk.Entry(self.canvas, font=self._font)
+        editor.insert(0, text)
+        editor.bind("<Return>", lambda e: self._commit_edit())
+        editor.bind("<Escape>", lambda e: self._cancel_edit())
+        y = (index - self.top) * self._row_height
+        self._editor_window = self.canvas.create_window(0, y, anchor="nw", window=editor,
+                                                        width=self.canvas.winfo_width())
+        self._editor = editor
+        editor.focus_set()
+        editor.icursor("end")
+
+    def _commit_edit(self):
+        """只重新解析被编辑的这一行，并按时间放回缓冲区"""
+        try:
+            action = self.script_manager.parse_line(self._editor.get())
+        except ValueError as e:
+            messagebox.showerror("错误", f"第{self._edit_index + 1}行格式错误: {str(e)}")
+            return
+        # 时间没有越过相邻的行时留在原来的位置，同一时间的组合键保持原有顺序
+        if self._edit_new:
+            self.selected = self.buffer.insert_sorted(action, self._edit_index)
+        else:
+            self.selected = self.buffer.replace(self._edit_index, action)
+        self._cancel_edit()
+        self.canvas.focus_set()
+        self.see(self.selected)
+        self._changed()
+
+    def _cancel_edit(self):
+        if self._editor is not None:
+            self.canvas.delete(self._editor_window)
+            self._editor.destroy()
+            self._editor = None
+            self._editor_window = None
+            self._edit_index = None
+
+    def _changed(self):
+        self.modified = True
+        self.render()
+        if self.on_change:
+            self.on_change()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按键精灵 - 播放和记录追踪
+可选的追踪层：把每组播放操作的截止时间、实际执行时刻、执行耗时和组内操作数，
+以及记录器每个事件的处理耗时和队列深度写入固定容量的环形缓冲区，
+可以导出为Chrome追踪格式（chrome://tracing 或 Perfetto 打开）并汇总迟到时间的分位数。
+未启用时播放器和记录器只多一次属性判断
+"""
+
+import os
+import json
+import time
+import threading
+from scheduler import JitterStats
+
+# 事件类别
+TRACE_PLAY = "play"  # 执行了一组播放操作
+TRACE_SKIP = "skip"  # 一组鼠标移动因迟到被跳过
+TRACE_RECORD = "record"  # 记录器处理了一个输入事件
+
+# 默认容量（事件数），超出后覆盖最早的事件
+DEFAULT_CAPACITY = 65536
+
+
+class Tracer:
+    """追踪事件的环形缓冲区
+
+    每个事件是一个元组: (类别, 名称, 截止时间, 开始时刻, 耗时, 队列深度, 组内操作数, 线程ID)，
+    时间都在perf_counter时间轴上（秒），没有截止时间、队列深度或组内操作数的事件对应字段为None。
+    同一个Tracer可以由多个播放器和记录器共享（例如多脚本并行播放）。
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """初始化追踪器
+
+        Args:
+            capacity: 最多保留的事件数
+        """
+        self.capacity = max(1, int(capacity))
+        self._events = [None] * self.capacity  # 预先分配，记录时不再扩容
+        # 多个线程同时记录时，分配位置、写入事件和更新计数在同一个锁内完成，
+        # 计数不会被较慢的线程改小，也不会计入还没有写入的位置
+        self._lock = threading.Lock()
+        self._count = 0  # 累计记录的事件数
+        self.origin = time.perf_counter()  # 导出时的时间零点
+
+    def record(self, category, name, deadline, start, duration, depth=None, size=None):
+        """记录一个事件
+
+        Args:
+            category: 事件类别（TRACE_PLAY / TRACE_SKIP / TRACE_RECORD）
+            name: 事件名称（操作类型）
+            deadline: 计划的截止时间，没有时为None
+            start: 实际开始执行的时刻
+            duration: 执行耗时（秒）
+            depth: 记录器的队列深度，没有时为None
+            size: 播放时组内的操作数，没有时为None
+        """
+        event = (category, name, deadline, start, duration, depth, size, threading.get_ident())
+        with self._lock:
+            count = self._count
+            self._events[count % self.capacity] = event
+            self._count = count + 1
+
+    def clear(self):
+        """清空已记录的事件（不要在记录的同时调用）"""
+        self._events = [None] * self.capacity
+        self._count = 0
+        self.origin = time.perf_counter()
+
+    @property
+    def dropped(self):
+        """因缓冲区已满被覆盖的事件数"""
+        return max(0, self._count - self.capacity)
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def events(self):
+        """按记录顺序返回缓冲区中的事件
+
+        Returns:
+            list: 事件元组列表
+        """
+        with self._lock:
+            count = self._count
+            events = list(self._events)
+        if count <= self.capacity:
+            return [event for event in events[:count] if event is not None]
+        split = count % self.capacity
+        return [event for event in events[split:] + events[:split] if event is not None]
+
+    def summary(self):
+        """汇总统计
+
+        Returns:
+            dict: 播放的迟到时间（开始时刻减截止时间）和执行耗时的分位数、跳过的组数，
+                记录事件的处理耗时分位数和最大队列深度，以及被覆盖的事件数（时间单位为秒）
+        """
+        lateness = JitterStats()
+        duration = JitterStats()
+        record = JitterStats()
+        skipped = 0
+        max_depth = 0
+        for category, _, deadline, start, elapsed, depth, _, _ in self.events():
+            if category == TRACE_PLAY:
+                lateness.add(start - deadline)
+                duration.add(elapsed)
+            elif category == TRACE_SKIP:
+                skipped += 1
+            else:
+                record.add(elapsed)
+                if depth is not None and depth > max_depth:
+                    max_depth = depth
+        return {
+            "lateness": lateness.summary(),
+            "duration": duration.summary(),
+            "skipped": skipped,
+            "record": record.summary(),
+            "max_depth": max_depth,
+            "dropped": self.dropped,
+        }
+
+    def format_summary(self):
+        """将汇总统计格式化为可读文本
+
+        Returns:
+            str: 统计文本
+        """
+        s = self.summary()
+        lateness = s["lateness"]
+        duration = s["duration"]
+        lines = []
+        if lateness["count"] or s["skipped"]:
+            lines.append(f"播放 {lateness['count']} 组 (跳过 {s['skipped']} 组): "
+                         f"迟到 p50 {lateness['p50'] * 1000:.3f}ms / p99 {lateness['p99'] * 1000:.3f}ms / "
+                         f"最大 {lateness['max'] * 1000:.3f}ms, "
+                         f"执行耗时 p50 {duration['p50'] * 1e6:.1f}us / p99 {duration['p99'] * 1e6:.1f}us")
+        record = s["record"]
+        if record["count"]:
+            lines.append(f"记录 {record['count']} 个事件: 处理耗时 p50 {record['p50'] * 1e6:.1f}us / "
+                         f"p99 {record['p99'] * 1e6:.1f}us / 最大 {record['max'] * 1e6:.1f}us, "
+                         f"最大队列深度 {s['max_depth']}")
+        if s["dropped"]:
+            lines.append(f"缓冲区已满，最早的 {s['dropped']} 个事件已被覆盖")
+        return "\n".join(lines) or "没有追踪事件"
+
+    def chrome_trace(self):
+        """转换为Chrome追踪事件格式
+
+        每个事件是一个完整事件（ph为X），截止时间、迟到时间、队列深度和组内操作数放在args中；
+        记录事件的队列深度另外输出为计数器（ph为C），在时间线上显示为曲线。
+
+        Returns:
+            dict: 可直接序列化为JSON的追踪数据
+        """
+        pid = os.getpid()
+        origin = self.origin
+        trace_events = []
+        for category, name, deadline, start, duration, depth, size, tid in self.events():
+            ts = (start - origin) * 1e6
+            args = {}
+            if deadline is not None:
+                args["deadline_us"] = round((deadline - origin) * 1e6, 3)
+                args["lateness_us"] = round((start - deadline) * 1e6, 3)
+            if depth is not None:
+                args["depth"] = depth
+            if size is not None:
+                args["size"] = size
+            trace_events.append({
+                "name": name, "cat": category, "ph": "X", "pid": pid, "tid": tid,
+                "ts": round(ts, 3), "dur": round(duration * 1e6, 3), "args": args,
+            })
+            if category == TRACE_RECORD and depth is not None:
+                trace_events.append({
+                    "name": "记录队列深度", "ph": "C", "pid": pid, "tid": tid,
+                    "ts": round(ts, 3), "args": {"depth": depth},
+                })
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def save_chrome_trace(self, file_path):
+        """导出Chrome追踪JSON文件
+
+        Args:
+            file_path: 文件路径
+        """
+        # json.dumps使用C编码器，比json.dump逐块写入快一个数量级
+        data = json.dumps(self.chrome_trace(), ensure_ascii=False)
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(data)